@@ -1,7 +1,7 @@
 import numpy as np
 
 
-def nationality_to_alpha2_code(text, nationalities):
+def nationality_to_alpha2_code(text, nationalities, as_list=False):
     """Create ISO 3166-1 alpha-2 country codes from nationalities.
 
     Use the nationality to find ISO 3166-1 alpha-2
@@ -15,10 +15,14 @@ def nationality_to_alpha2_code(text, nationalities):
         text (str): Text containing nationalities.
         nationalities (pandas.Dataframe): Dataframe of
             nationalities data.
+        as_list (bool, optional): Defaults to False. Whether to
+            return the codes as a list instead of a pipe separated
+            string, e.g. for `write_interim_table`.
 
     Returns:
-        `str` or `numpy.nan`: Pipe separated list of ISO 3166-1
-            alpha-2 country codes if found, otherwise numpy.nan.
+        `str`, `list` of `str` or `numpy.nan`: Pipe separated list
+            (or list) of ISO 3166-1 alpha-2 country codes if found,
+            otherwise numpy.nan.
     """
 
     if isinstance(text, float):
@@ -69,5 +73,7 @@ def nationality_to_alpha2_code(text, nationalities):
 
     alpha2_codes = list(alpha2_codes)
     alpha2_codes.sort()
+    if as_list:
+        return alpha2_codes
     alpha2_codes = '|'.join(alpha2_codes)
     return alpha2_codes
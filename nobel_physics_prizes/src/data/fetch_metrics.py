@@ -0,0 +1,203 @@
+import collections
+import json
+import threading
+import time
+
+import numpy as np
+
+
+class FetchMetrics:
+    """Collect the throughput, latency and errors of fetched URLs.
+
+    The fetch functions (e.g. `fetch_json_data`) record every response or
+    error in the collector and drive their progress bar through it. If the
+    progress bar has the fetch metric widgets of `progress_bar` (with
+    `fetch_metrics=True`), the request rate and error count are rendered on
+    it. A collector can be passed to several fetch functions to sum their
+    metrics, and `summary` exports them, e.g. to compare runs with different
+    `max_workers` and `timeout`.
+    """
+
+    def __init__(self):
+        self.num_requests = 0
+        self.num_errors = 0
+        self.num_retries = 0
+        self.num_bytes = 0
+        self.num_cache_hits = 0
+        self.num_cache_misses = 0
+        self.status_counts = collections.Counter()
+        self.latencies = []
+        self.values = {}
+        self._elapsed = 0.0
+        self._start = None
+        self._progress = 0
+        self._progress_bar = None
+        self._lock = threading.Lock()
+
+    def start(self, progress_bar=None):
+        """Start timing a fetch.
+
+        Args:
+            progress_bar (progressbar.ProgressBar, optional): Defaults to None.
+                Progress bar of the fetch, started here.
+        """
+
+        with self._lock:
+            self._start = time.perf_counter()
+            self._progress = 0
+            self._progress_bar = progress_bar
+        if progress_bar:
+            progress_bar.start()
+
+    def finish(self):
+        """Stop timing a fetch and finish its progress bar."""
+
+        with self._lock:
+            if self._start is not None:
+                self._elapsed += time.perf_counter() - self._start
+                self._start = None
+            progress_bar, self._progress_bar = self._progress_bar, None
+        if progress_bar:
+            progress_bar.finish()
+
+    def record(self, response=None, error=None, retry=False, num_items=1):
+        """Record a response or an error.
+
+        Args:
+            response (requests.Response, optional): Defaults to None. Response, if
+                any. Record it after its body is read so that the bytes read are
+                counted.
+            error (Exception, optional): Defaults to None. Error of the request,
+                if any.
+            retry (bool, optional): Defaults to False. Whether the request will be
+                retried. Retried requests are counted but do not advance the
+                progress bar.
+            num_items (int, optional): Defaults to 1. Number of items fetched by
+                the request, e.g. the number of titles of a batch, by which the
+                progress bar advances.
+        """
+
+        if response is None and error is not None:
+            response = getattr(error, 'response', None)
+
+        with self._lock:
+            self.num_requests += 1
+            if retry:
+                self.num_retries += 1
+            elif error is not None:
+                self.num_errors += 1
+            if response is not None:
+                self.status_counts[response.status_code] += 1
+                self.num_bytes += _response_bytes(response)
+                if response.elapsed is not None:
+                    self.latencies.append(response.elapsed.total_seconds())
+            if retry:
+                return
+            self._progress += num_items
+            progress = self._progress
+            progress_bar = self._progress_bar
+            variables = self._variables(progress_bar)
+
+        if progress_bar:
+            progress_bar.update(progress, **variables)
+
+    def record_cache(self, num_hits, num_misses):
+        """Record the lookups of a cache of responses.
+
+        Args:
+            num_hits (int): Number of URLs found in the cache.
+            num_misses (int): Number of URLs not found in the cache.
+        """
+
+        with self._lock:
+            self.num_cache_hits += num_hits
+            self.num_cache_misses += num_misses
+
+    def set_value(self, name, value):
+        """Record a value in the summary, e.g. a setting of the fetch.
+
+        Args:
+            name (str): Name of the value.
+            value: JSON serializable value.
+        """
+
+        with self._lock:
+            self.values[name] = value
+
+    @property
+    def elapsed(self):
+        """float: Time spent fetching in seconds."""
+
+        with self._lock:
+            if self._start is None:
+                return self._elapsed
+            return self._elapsed + time.perf_counter() - self._start
+
+    def summary(self):
+        """Summarize the metrics.
+
+        Returns:
+            dict: Number of requests, errors and retries, status code counts,
+                number of 429 and 5xx responses, bytes read, elapsed time,
+                requests and bytes per second, 50th, 90th and 99th percentile
+                latency in milliseconds (up to the response headers), cache
+                hits and hit ratio, and the recorded values.
+        """
+
+        elapsed = self.elapsed
+        with self._lock:
+            latencies = 1000 * np.array(self.latencies)
+            percentiles = (np.percentile(latencies, [50, 90, 99]).tolist()
+                           if len(latencies) else [None] * 3)
+            num_lookups = self.num_cache_hits + self.num_cache_misses
+            return dict(
+                num_requests=self.num_requests,
+                num_errors=self.num_errors,
+                num_retries=self.num_retries,
+                status_counts={str(status_code): count for status_code, count
+                               in sorted(self.status_counts.items())},
+                num_429=self.status_counts[429],
+                num_5xx=sum(count for status_code, count in self.status_counts.items()
+                            if status_code >= 500),
+                num_bytes=self.num_bytes,
+                elapsed=elapsed,
+                requests_per_second=self.num_requests / elapsed if elapsed else None,
+                bytes_per_second=self.num_bytes / elapsed if elapsed else None,
+                latency_p50_ms=percentiles[0],
+                latency_p90_ms=percentiles[1],
+                latency_p99_ms=percentiles[2],
+                num_cache_hits=self.num_cache_hits,
+                cache_hit_ratio=(self.num_cache_hits / num_lookups
+                                 if num_lookups else None),
+                values=dict(self.values))
+
+    def save(self, path):
+        """Save the summary to a JSON file.
+
+        Args:
+            path (str): Path of the JSON file.
+        """
+
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.summary(), file, indent=1)
+
+    def _variables(self, progress_bar):
+        names = getattr(progress_bar, 'variables', {})
+        variables = {}
+        if 'requests_per_second' in names:
+            elapsed = self._elapsed + (time.perf_counter() - self._start
+                                       if self._start is not None else 0.0)
+            variables['requests_per_second'] = (self.num_requests / elapsed
+                                                if elapsed else 0.0)
+        if 'errors' in names:
+            variables['errors'] = self.num_errors
+        return variables
+
+
+def _response_bytes(response):
+    # bytes read from the connection, which are fewer than the content length
+    # if the body was not read to the end
+    try:
+        return int(response.raw.tell())
+    except (AttributeError, TypeError, ValueError):
+        return int(response.headers.get('Content-Length', 0))
@@ -0,0 +1,296 @@
+import email.utils
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_TIMEOUT = 30
+"""int: Default timeout.
+
+The timeout in seconds of the requests of a session that do not set their own
+timeout.
+"""
+
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """An `HTTPAdapter` with a default timeout.
+
+    `requests` has no session-wide timeout, so the adapter sets the timeout of
+    the requests sent without one.
+
+    Args:
+        timeout (float or tuple, optional): Defaults to `DEFAULT_TIMEOUT`. Timeout
+            in seconds, or a (connect, read) tuple of timeouts.
+        **kwargs: Arguments of `HTTPAdapter`, e.g. `pool_maxsize`.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = self.timeout
+        return super().send(request, timeout=timeout, **kwargs)
+
+
+def create_session(pool_maxsize=20, host_pool_sizes=None, pool_connections=10,
+                   max_retries=0, backoff_factor=0.5, status_forcelist=(),
+                   timeout=DEFAULT_TIMEOUT, user_agent=None):
+    """Create a `requests` session with pooled keep-alive connections.
+
+    Pass the session to `get_redirect_urls`, `fetch_json_data`,
+    `get_redirected_titles` and `get_linked_article_titles` so that the
+    connections to DBpedia and Wikipedia opened by one stage are reused by the
+    next ones. The session can be shared by threads. `requests` only speaks
+    HTTP/1.1, so connections are reused with keep-alive rather than HTTP/2
+    multiplexing.
+
+    Args:
+        pool_maxsize (int, optional): Defaults to 20. Maximum number of
+            connections kept open to each host. It should be at least the
+            number of threads making requests to the host.
+        host_pool_sizes (dict, optional): Defaults to None. The keys are URL
+            prefixes, e.g. 'http://dbpedia.org', and the values are the
+            `pool_maxsize` of the hosts with the prefix.
+        pool_connections (int, optional): Defaults to 10. Number of hosts whose
+            connection pools are kept.
+        max_retries (int, optional): Defaults to 0. Maximum number of times a
+            request that fails to connect or read is retried. The functions
+            of `wiki_utils` retry timeouts, connection errors, 429 and 5xx
+            responses themselves, so the retries of a session passed to them
+            add up with theirs. `get_redirect_urls` and `fetch_json_data` only
+            retry 429 and 503 responses, when given a `concurrency`, so set it
+            for them to retry timeouts and connection errors.
+        backoff_factor (float, optional): Defaults to 0.5. Backoff factor of the
+            retries: the delay before the nth retry is backoff_factor * 2 **
+            (n - 1) seconds.
+        status_forcelist (tuple of `int`, optional): Defaults to (). Status
+            codes to retry, e.g. (429, 503). By default they are returned so
+            that the callers can back off without blocking a worker thread.
+        timeout (float or tuple, optional): Defaults to `DEFAULT_TIMEOUT`.
+            Timeout of the requests that do not set their own timeout.
+        user_agent (str, optional): Defaults to None. User agent header. If None
+            then the `requests` default is used.
+
+    Returns:
+        requests.Session: Session.
+    """
+
+    # urllib3 also retries the 413, 429 and 503 responses with a Retry-After
+    # header if it is respected, so it is only respected with a status forcelist
+    retry = Retry(total=max_retries, connect=max_retries, read=max_retries,
+                  status=max_retries, backoff_factor=backoff_factor,
+                  status_forcelist=status_forcelist, allowed_methods=None,
+                  respect_retry_after_header=bool(status_forcelist),
+                  raise_on_status=False)
+
+    session = requests.Session()
+    for prefix in ['http://', 'https://']:
+        session.mount(prefix, TimeoutHTTPAdapter(
+            timeout=timeout, pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize, max_retries=retry))
+    for prefix, host_pool_maxsize in (host_pool_sizes or {}).items():
+        session.mount(prefix, TimeoutHTTPAdapter(
+            timeout=timeout, pool_connections=1, pool_maxsize=host_pool_maxsize,
+            max_retries=retry))
+    if user_agent:
+        session.headers['User-Agent'] = user_agent
+    return session
+
+
+def get_shared_session():
+    """Get the session shared by the fetch functions of the process.
+
+    The session is created with the `create_session` defaults on first use. It
+    is used by the fetch functions called without a session.
+
+    Returns:
+        requests.Session: Shared session.
+    """
+
+    global _shared_session
+
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = create_session()
+        return _shared_session
+
+
+class AdaptiveConcurrency:
+    """Adapt the number of requests in flight to a server (AIMD).
+
+    The concurrency is increased additively, by about one request per window
+    of `concurrency` successful requests, while the latency and error rate of
+    the responses are healthy. It is decreased multiplicatively when the
+    server throttles a request (429 or 503 response), at most once per window
+    so that the requests already in flight when the server started throttling
+    do not collapse it. A `Retry-After` header also pauses new requests until
+    it expires.
+
+    Pass it to `get_redirect_urls` or `fetch_json_data` instead of tuning
+    `max_workers` and `timeout` by hand.
+
+    Args:
+        initial_concurrency (int, optional): Defaults to 2. Initial number of
+            requests in flight.
+        min_concurrency (int, optional): Defaults to 1. Minimum number of
+            requests in flight.
+        max_concurrency (int, optional): Defaults to 20. Maximum number of
+            requests in flight, also the number of worker threads.
+        latency_target (float, optional): Defaults to None. Latency in seconds
+            above which the concurrency is not increased. If None then the
+            latency is not checked.
+        max_error_rate (float, optional): Defaults to 0.05. Rate of failed
+            requests (timeouts, connection errors and 5xx responses), as an
+            exponentially weighted average, above which the concurrency is not
+            increased.
+        decrease_factor (float, optional): Defaults to 0.5. Factor by which the
+            concurrency is multiplied when a request is throttled.
+        max_retries (int, optional): Defaults to 5. Maximum number of times a
+            throttled request is retried.
+        backoff (float, optional): Defaults to 1.0. Delay in seconds before
+            retrying a throttled request without a `Retry-After` header. It
+            doubles with each retry.
+        max_backoff (float, optional): Defaults to 60.0. Maximum delay in seconds
+            before a retry, also the maximum `Retry-After` honoured.
+    """
+
+    THROTTLE_STATUS_CODES = (429, 503)
+
+    def __init__(self, initial_concurrency=2, min_concurrency=1, max_concurrency=20,
+                 latency_target=None, max_error_rate=0.05, decrease_factor=0.5,
+                 max_retries=5, backoff=1.0, max_backoff=60.0):
+        if not 1 <= min_concurrency <= initial_concurrency <= max_concurrency:
+            raise ValueError('The concurrencies must satisfy 1 <= min_concurrency <= '
+                             'initial_concurrency <= max_concurrency.')
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_target = latency_target
+        self.max_error_rate = max_error_rate
+        self.decrease_factor = decrease_factor
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.limit = float(initial_concurrency)
+        self.error_rate = 0.0
+        self.history = [(0.0, initial_concurrency)]
+        self._created = time.monotonic()
+        self._last_decrease = float('-inf')
+        self._paused_until = float('-inf')
+        self._lock = threading.Lock()
+
+    @property
+    def concurrency(self):
+        """int: Number of requests allowed in flight."""
+
+        return int(self.limit)
+
+    @property
+    def max_concurrency_reached(self):
+        """int: Highest number of requests allowed in flight so far."""
+
+        return max(concurrency for _, concurrency in self.history)
+
+    def pause_time(self):
+        """Get the time left until new requests may be sent.
+
+        Returns:
+            float: Time in seconds, 0 if requests may be sent now.
+        """
+
+        return max(0.0, self._paused_until - time.monotonic())
+
+    def on_success(self, latency=None):
+        """Record a successful request.
+
+        Args:
+            latency (float, optional): Defaults to None. Latency of the request
+                in seconds.
+        """
+
+        with self._lock:
+            self.error_rate *= 0.9
+            if (self.error_rate > self.max_error_rate or
+                    (self.latency_target is not None and latency is not None and
+                     latency > self.latency_target)):
+                return
+            self._set_limit(min(self.max_concurrency, self.limit + 1.0 / self.limit))
+
+    def on_error(self):
+        """Record a failed request that was not throttled."""
+
+        with self._lock:
+            self.error_rate = 0.9 * self.error_rate + 0.1
+
+    def on_throttle(self, sent_time, retry_after=None):
+        """Record a throttled request and back off.
+
+        Args:
+            sent_time (float): `time.monotonic` time the request was sent at.
+                The concurrency is not decreased again for requests sent before
+                the last decrease.
+            retry_after (float, optional): Defaults to None. `Retry-After` delay in
+                seconds. New requests are paused until it expires.
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            if retry_after is not None:
+                self._paused_until = max(self._paused_until,
+                                         now + min(retry_after, self.max_backoff))
+            if sent_time <= self._last_decrease:
+                return
+            self._last_decrease = now
+            self._set_limit(max(self.min_concurrency, self.limit * self.decrease_factor))
+
+    def retry_delay(self, attempt, retry_after=None):
+        """Get the delay before retrying a throttled request.
+
+        Args:
+            attempt (int): Number of times the request was sent.
+            retry_after (float, optional): Defaults to None. `Retry-After` delay in
+                seconds.
+
+        Returns:
+            float: Delay in seconds.
+        """
+
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        return min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+
+    def _set_limit(self, limit):
+        concurrency = int(self.limit)
+        self.limit = limit
+        if int(limit) != concurrency:
+            self.history.append((time.monotonic() - self._created, int(limit)))
+
+
+def parse_retry_after(response):
+    """Parse the `Retry-After` header of a response.
+
+    Args:
+        response (requests.Response): Response.
+
+    Returns:
+        float: Delay in seconds, or None if the response has no valid
+            `Retry-After` header.
+    """
+
+    retry_after = response.headers.get('Retry-After')
+    if not retry_after:
+        return None
+    if retry_after.strip().isdigit():
+        return float(retry_after)
+    try:
+        date = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
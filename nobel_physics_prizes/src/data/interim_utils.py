@@ -0,0 +1,172 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import parquet
+
+LIST_SEPARATOR = '|'
+"""str: List separator.
+
+The separator of the values of the multi-valued fields in the interim CSV
+files, e.g. 'Physics|Chemistry'.
+"""
+
+VOCABULARY_METADATA_KEY = b'entity_vocabulary'
+"""bytes: Vocabulary metadata key.
+
+The key of the Parquet schema metadata storing the names of the entity
+vocabulary of the list columns encoded as IDs.
+"""
+
+
+def write_interim_table(data, path, list_columns=None, vocabulary=None):
+    """Write interim data as a Parquet file with list columns.
+
+    The multi-valued fields are stored as list<string> columns instead of
+    strings of values separated by `LIST_SEPARATOR`, so that they are not
+    joined and split again by every step reading them. Parquet dictionary
+    encodes the strings, which are repeated a lot, e.g. the universities
+    and countries.
+
+    Args:
+        data (pandas.DataFrame or list of `dict`): Interim data, e.g. the
+            imputed physicists or places. The values of the list columns are
+            lists or strings of values separated by `LIST_SEPARATOR`.
+        path (str): Path of the Parquet file to write.
+        list_columns (list of `str`, optional): Defaults to None. Columns to
+            store as lists, e.g. `PHYSICISTS_IMPUTE_KEYS`. If None then they
+            are inferred with `infer_list_columns`.
+        vocabulary (EntityVocabulary, optional): Defaults to None. If given,
+            the list columns are stored as list<int32> columns of the IDs of
+            the names, which are added to the vocabulary, and the vocabulary
+            is stored in the metadata of the file.
+
+    Returns:
+        list of `str`: The list columns written.
+    """
+
+    frame = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+    if list_columns is None:
+        list_columns = infer_list_columns(frame)
+    list_columns = [column for column in frame if column in set(list_columns)]
+
+    arrays = []
+    for column in frame:
+        if column in list_columns and vocabulary is not None:
+            ids = vocabulary.encode_lists(frame[column].map(_to_list))
+            arrays.append(pa.array([ids_in_cell if isinstance(ids_in_cell, np.ndarray)
+                                    else None for ids_in_cell in ids],
+                                   type=pa.list_(pa.int32())))
+        elif column in list_columns:
+            arrays.append(pa.array(frame[column].map(_to_list).tolist(),
+                                   type=pa.list_(pa.string())))
+        else:
+            arrays.append(pa.Array.from_pandas(frame[column]))
+
+    metadata = None
+    if vocabulary is not None:
+        metadata = {VOCABULARY_METADATA_KEY: json.dumps(
+            vocabulary.names, ensure_ascii=False).encode('utf-8')}
+    table = pa.Table.from_arrays(arrays, names=[str(column) for column in frame],
+                                 metadata=metadata)
+    parquet.write_table(table, path)
+    return list_columns
+
+
+def read_interim_table(path, columns=None, join_lists=False, as_ids=False):
+    """Read interim data from a Parquet file written by `write_interim_table`.
+
+    Args:
+        path (str): Path of the Parquet file.
+        columns (list of `str`, optional): Defaults to None. Columns to read.
+            If None then all columns are read.
+        join_lists (bool, optional): Defaults to False. Whether to join the
+            values of the list columns with `LIST_SEPARATOR`, like in the
+            interim CSV files.
+        as_ids (bool, optional): Defaults to False. Whether to return the list
+            columns stored as IDs as int32 arrays of IDs instead of names. Read
+            their vocabulary with `read_interim_vocabulary`.
+
+    Returns:
+        pandas.DataFrame: Interim data. The values of the list columns are
+            lists of `str`, or strings if `join_lists`, or arrays of IDs if
+            `as_ids`, and missing values are `numpy.nan`.
+    """
+
+    table = parquet.read_table(path, columns=columns)
+    frame = table.to_pandas()
+    names = None
+    metadata = table.schema.metadata or {}
+    if VOCABULARY_METADATA_KEY in metadata:
+        names = np.array(json.loads(metadata[VOCABULARY_METADATA_KEY].decode('utf-8')),
+                         dtype=object)
+
+    for field in table.schema:
+        if pa.types.is_list(field.type) and pa.types.is_integer(field.type.value_type):
+            if as_ids or names is None:
+                frame[field.name] = frame[field.name].map(
+                    lambda ids: ids.astype('int32') if ids is not None else np.nan)
+                continue
+            frame[field.name] = frame[field.name].map(
+                lambda ids: names[ids] if ids is not None else None)
+        if pa.types.is_string(field.type):
+            # missing strings are None, but numpy.nan in the CSV files
+            frame[field.name] = frame[field.name].where(
+                frame[field.name].notna(), np.nan)
+        if not pa.types.is_list(field.type):
+            continue
+        if join_lists:
+            frame[field.name] = frame[field.name].map(
+                lambda values: (LIST_SEPARATOR.join(values) if values is not None
+                                else np.nan))
+        else:
+            frame[field.name] = frame[field.name].map(
+                lambda values: list(values) if values is not None else np.nan)
+    return frame
+
+
+def infer_list_columns(frame):
+    """Infer the list columns of interim data.
+
+    Args:
+        frame (pandas.DataFrame): Interim data.
+
+    Returns:
+        list of `str`: The columns containing lists or strings with
+            `LIST_SEPARATOR`.
+    """
+
+    return [column for column in frame.select_dtypes(include='object')
+            if frame[column].map(
+                lambda value: isinstance(value, list) or
+                (isinstance(value, str) and LIST_SEPARATOR in value)).any()]
+
+
+def convert_interim_csv(csv_path, path, list_columns=None):
+    """Convert an interim CSV file to a Parquet file with list columns.
+
+    Args:
+        csv_path (str): Path of the interim CSV file, e.g.
+            'data/interim/physicists.csv'.
+        path (str): Path of the Parquet file to write.
+        list_columns (list of `str`, optional): Defaults to None. Columns to
+            store as lists. If None then they are inferred with
+            `infer_list_columns`.
+
+    Returns:
+        list of `str`: The list columns written.
+    """
+
+    return write_interim_table(pd.read_csv(csv_path), path,
+                               list_columns=list_columns)
+
+
+def _to_list(value):
+    if isinstance(value, (list, np.ndarray)):
+        return [str(val) for val in value]
+    if isinstance(value, str):
+        return value.split(LIST_SEPARATOR)
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    return [str(value)]
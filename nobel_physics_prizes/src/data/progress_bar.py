@@ -2,7 +2,7 @@ import progressbar
 
 
 def progress_bar(num_urls_to_check, banner_text_begin='Fetching: ',
-                 banner_text_end=' urls', marker='█'):
+                 banner_text_end=' urls', marker='█', fetch_metrics=False):
     """Create a progress bar for tracking the progress of tasks.
 
     Args:
@@ -12,6 +12,8 @@ def progress_bar(num_urls_to_check, banner_text_begin='Fetching: ',
         banner_text_end (str, optional): Defaults to 'Fetching: '. Banner text
             to show at the end of the banner on the progress bar.
         marker (str, optional): Defaults to '█'. Marker to show the progress.
+        fetch_metrics (bool, optional): Defaults to False. Whether to show the
+            request rate and number of errors recorded by a `FetchMetrics`.
 
     Returns:
         progress_bar (progressbar.ProgressBar, optional): Defaults to None.
@@ -27,7 +29,16 @@ def progress_bar(num_urls_to_check, banner_text_begin='Fetching: ',
         ' ', progressbar.Timer(),
         ' ', progressbar.ETA()
     ]
+    if fetch_metrics:
+        widgets += [
+            ' ', progressbar.Variable('requests_per_second', format='{formatted_value} req/s',
+                                      width=6, precision=4),
+            # the count is rendered as is: the default formatting renders 0 as '-'
+            ' ', progressbar.Variable('errors', format='{value} errors')
+        ]
 
     bar = progressbar.ProgressBar(max_value=num_urls_to_check,
                                   widgets=widgets, redirect_stdout=True)
+    if fetch_metrics:
+        bar.variables['errors'] = 0
     return bar
@@ -1,13 +1,20 @@
+import collections
+import hashlib
+import heapq
 import time
-from concurrent.futures import as_completed
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from random import random
 from urllib import parse
 
 import pandas as pd
-import progressbar
 import requests
 from requests_futures.sessions import FuturesSession
 
+from src.data.fetch_metrics import FetchMetrics
+from src.data.http_utils import get_shared_session, parse_retry_after
+from src.data.progress_bar import progress_bar as create_progress_bar
+from src.pipeline.instrumentation_utils import instrument
+
 DBPEDIA_RESOURCE_URL = 'http://dbpedia.org/resource/'
 """str: DBpedia resource URL.
 
@@ -22,18 +29,28 @@ The URL path that all DBpedia JSON data are contained in.
 These do not redirect.
 """
 
+DBPEDIA_NAMESPACES = ['Category:']
+"""list of `str`: DBpedia namespaces.
+
+Namespace prefixes of DBpedia resource names whose title is capitalized
+separately from the prefix.
+"""
+
 
 def get_redirect_urls(urls_to_check, url_cache_path=None, max_workers=2,
-                      timeout=10, progress_bar=None):
+                      timeout=10, progress_bar=None, session=None,
+                      metrics=None, concurrency=None):
     """Get redirect urls using a `requests` head request.
 
-    If a `url_cache_path` is provided and a URL in the `urls_to_check` is
-    found in the cache, then the request is skipped and the values from
-    the cache are returned. This function also uses exponential backoff
-    if a too many requests exception (429) is encountered.
+    The URLs are deduplicated by their canonical URL (see `canonicalize_url`)
+    so that each resource is requested once. If a `url_cache_path` is provided
+    and the canonical URL of a URL in the `urls_to_check` is found in the
+    cache, then the request is skipped and the values from the cache are
+    returned.
 
     Args:
-        urls_to_check (list of `str`): List of urls to request.
+        urls_to_check (list of `str`): List of quoted urls to request, e.g.
+            from `construct_resource_urls`.
         url_cache_path (str, optional): Defaults to None. Path of the csv file
             where the URL cache of known mappings is located.
         max_workers (int, optional): Defaults to 2. Number of workers to
@@ -42,55 +59,72 @@ def get_redirect_urls(urls_to_check, url_cache_path=None, max_workers=2,
             any request.
         progress_bar (progressbar.ProgressBar, optional): Defaults to None.
             Progress bar.
+        session (requests.Session, optional): Defaults to None. Session used for
+            the requests, e.g. created by `create_session`. If None then the
+            shared session of `get_shared_session` is used.
+        metrics (FetchMetrics, optional): Defaults to None. Metrics collector
+            fed with every response, e.g. to export the request rate, latency
+            and errors of the fetch.
+        concurrency (AdaptiveConcurrency, optional): Defaults to None. If given,
+            the number of requests in flight is adapted by it instead of being
+            `max_workers`, and throttled requests are retried. The concurrency
+            reached is recorded in `metrics`.
 
     Returns:
         dict: Dictionary of URL mappings.
 
-        The keys are the original URLs and the values are the redirected URLs.
-        Both the URLs are returned quoted.
+        The keys are the canonical original URLs and the values are the
+        redirected URLs. Both the URLs are returned unquoted, which is also
+        the format of the URL cache.
 
     """
 
-    urls = urls_to_check.copy()
+    index = UrlIndex(urls_to_check, quoted=True)
     redirect_urls = {}
     if url_cache_path:
         cache = pd.read_csv(url_cache_path)
-        redirect_urls = dict(zip(cache.url, cache.redirect_url))
-        redirect_urls_quoted = [quote_url(url) for url in redirect_urls.keys()]
-        urls = list(set(urls_to_check) - set(redirect_urls_quoted))
+        redirect_urls = {canonicalize_url(url): redirect_url for url, redirect_url
+                         in zip(cache.url, cache.redirect_url)}
+    urls = [quote_url(url) for url in index if url not in redirect_urls]
 
-    futures = {}
-    with FuturesSession(max_workers=max_workers) as session:
-        if progress_bar:
-            progress_bar.start()
+    metrics = metrics or FetchMetrics()
+    if url_cache_path:
+        metrics.record_cache(len(index) - len(urls), len(urls))
 
-        for url in urls:
-            future = session.head(url, timeout=timeout, allow_redirects=True)
-            futures[future] = url
+    if concurrency:
+        max_workers = concurrency.max_concurrency
+    # the session's pools are sized by `create_session`, FuturesSession only
+    # resizes them, dropping their connections, when it creates the executor
+    with ThreadPoolExecutor(max_workers=max_workers) as executor, \
+            FuturesSession(session=session or get_shared_session(),
+                           executor=executor) as futures_session:
+        metrics.start(progress_bar)
 
-        num_iters = 0
-        for future in as_completed(futures):
+        def request(url):
+            return futures_session.head(url, timeout=timeout, allow_redirects=True)
+
+        for url, response, error in _iter_responses(urls, request, concurrency, metrics):
             try:
-                response = future.result()
+                if error:
+                    raise error
                 response.raise_for_status()
                 if response.status_code == requests.codes.ok:
-                    url = parse.unquote(futures[future])
-                    redirect_urls[url] = parse.unquote(response.url)
+                    redirect_urls[canonicalize_url(url, quoted=True)] = parse.unquote(
+                        response.url)
             except requests.exceptions.RequestException as err:
                 print(err)
+                error = err
+            metrics.record(response, error)
 
-            num_iters += 1
-            if progress_bar:
-                progress_bar.update(num_iters)
-
-        if progress_bar:
-            progress_bar.finish()
+        metrics.finish()
 
     return redirect_urls
 
 
+@instrument(count='urls_to_fetch')
 def fetch_json_data(urls_to_fetch, max_workers=2, timeout=10,
-                    progress_bar=None):
+                    progress_bar=None, session=None, metrics=None,
+                    concurrency=None):
     """Fetch JSON data from a list of URLs.
 
     Args:
@@ -101,6 +135,16 @@ def fetch_json_data(urls_to_fetch, max_workers=2, timeout=10,
             any request.
         progress_bar (progressbar.ProgressBar, optional): Defaults to None.
             Progress bar.
+        session (requests.Session, optional): Defaults to None. Session used for
+            the requests, e.g. created by `create_session`. If None then the
+            shared session of `get_shared_session` is used.
+        metrics (FetchMetrics, optional): Defaults to None. Metrics collector
+            fed with every response, e.g. to export the request rate, latency
+            and errors of the fetch.
+        concurrency (AdaptiveConcurrency, optional): Defaults to None. If given,
+            the number of requests in flight is adapted by it instead of being
+            `max_workers`, and throttled requests are retried. The concurrency
+            reached is recorded in `metrics`.
 
     Returns:
         dict: A dictionary of JSON data.
@@ -110,43 +154,112 @@ def fetch_json_data(urls_to_fetch, max_workers=2, timeout=10,
 
     """
 
-    futures = {}
-    with FuturesSession(max_workers=max_workers) as session:
-        if progress_bar:
-            progress_bar.start()
+    metrics = metrics or FetchMetrics()
+    if concurrency:
+        max_workers = concurrency.max_concurrency
+    # the session's pools are sized by `create_session`, FuturesSession only
+    # resizes them, dropping their connections, when it creates the executor
+    with ThreadPoolExecutor(max_workers=max_workers) as executor, \
+            FuturesSession(session=session or get_shared_session(),
+                           executor=executor) as futures_session:
+        metrics.start(progress_bar)
 
-        for url in urls_to_fetch:
-            future = session.get(url, timeout=timeout,
-                                 hooks=dict(response=_parse_json))
-            futures[future] = url
+        def request(url):
+            return futures_session.get(url, timeout=timeout,
+                                       hooks=dict(response=_parse_json))
 
         data = {}
-        num_iters = 0
-        for future in as_completed(futures):
+        for url, response, error in _iter_responses(urls_to_fetch, request, concurrency,
+                                                    metrics):
             try:
-                response = future.result()
+                if error:
+                    raise error
                 response.raise_for_status()
-                data[futures[future]] = response.data
+                data[url] = response.data
             except requests.exceptions.RequestException as err:
                 print(err)
+                error = err
+            metrics.record(response, error)
 
-            num_iters += 1
-            if progress_bar:
-                progress_bar.update(num_iters)
-
-        if progress_bar:
-            progress_bar.finish()
+        metrics.finish()
 
     return data
 
 
+def _iter_responses(urls, request, concurrency, metrics):
+    # yield the url, response and error of each request as they complete
+    if not concurrency:
+        futures = {request(url): url for url in urls}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except requests.exceptions.RequestException as err:
+                yield futures[future], None, err
+        return
+
+    pending = collections.deque(urls)
+    attempts = collections.Counter()
+    in_flight = {}
+    retry_queue = []  # heap of (time to retry, url)
+    while pending or in_flight or retry_queue:
+        while retry_queue and retry_queue[0][0] <= time.monotonic():
+            pending.appendleft(heapq.heappop(retry_queue)[1])
+        while (pending and len(in_flight) < concurrency.concurrency and
+               not concurrency.pause_time()):
+            url = pending.popleft()
+            attempts[url] += 1
+            in_flight[request(url)] = (url, time.monotonic())
+
+        # wake up when the pause expires or a retry is due, otherwise only when
+        # a request completes
+        pause_time = concurrency.pause_time()
+        wait_times = [pause_time] if pending and pause_time > 0 else []
+        if retry_queue:
+            wait_times.append(retry_queue[0][0] - time.monotonic())
+        wait_time = max(0.0, min(wait_times)) if wait_times else None
+        if not in_flight:
+            time.sleep(wait_time)
+            continue
+
+        done, _ = wait(in_flight, timeout=wait_time, return_when=FIRST_COMPLETED)
+        for future in done:
+            url, sent_time = in_flight.pop(future)
+            try:
+                response, error = future.result(), None
+            except requests.exceptions.RequestException as err:
+                response, error = getattr(err, 'response', None), err
+
+            if (response is not None and
+                    response.status_code in concurrency.THROTTLE_STATUS_CODES):
+                retry_after = parse_retry_after(response)
+                concurrency.on_throttle(sent_time, retry_after)
+                if attempts[url] <= concurrency.max_retries:
+                    metrics.record(response, error, retry=True)
+                    delay = concurrency.retry_delay(attempts[url], retry_after)
+                    heapq.heappush(retry_queue, (time.monotonic() + delay, url))
+                    continue
+            elif error is not None or response.status_code >= 500:
+                concurrency.on_error()
+            else:
+                concurrency.on_success(response.elapsed.total_seconds())
+            yield url, response, error
+
+    metrics.set_value('concurrency', concurrency.concurrency)
+    metrics.set_value('max_concurrency_reached', concurrency.max_concurrency_reached)
+
+
 def _parse_json(response, *args, **kwargs):
-    response.data = response.json()
+    # error responses are not JSON, they are raised by raise_for_status
+    if response.ok:
+        response.data = response.json()
 
 
 def urls_progress_bar(num_urls_to_check, banner_text='Fetching: ', marker='█'):
     """Create a urls progress bar for tracking the fetching progress.
 
+    The bar also shows the request rate and number of errors recorded by the
+    fetch functions.
+
     Args:
         num_urls_to_check (int): The number of urls to be requested.
         banner_text (str, optional): Defaults to 'Fetching: '. Banner text
@@ -158,18 +271,8 @@ def urls_progress_bar(num_urls_to_check, banner_text='Fetching: ', marker='█')
 
     """
 
-    widgets = [
-        banner_text, progressbar.Counter(),
-        ' / ' + str(num_urls_to_check) + ' urls',
-        ' ', progressbar.Bar(marker=marker),
-        ' ', progressbar.Percentage(),
-        ' ', progressbar.Timer(),
-        ' ', progressbar.ETA()
-    ]
-
-    bar = progressbar.ProgressBar(max_value=num_urls_to_check,
-                                  widgets=widgets, redirect_stdout=True)
-    return bar
+    return create_progress_bar(num_urls_to_check, banner_text_begin=banner_text,
+                               marker=marker, fetch_metrics=True)
 
 
 def quote_url(url):
@@ -190,6 +293,123 @@ def quote_url(url):
     return quoted_url
 
 
+def canonicalize_url(url, quoted=False):
+    """Canonicalize a url.
+
+    The canonical URL of a resource is unquoted. Spaces in DBpedia resource
+    names are replaced by underscores and their first letter (after the
+    namespace, if any) is capitalized, like DBpedia and Wikipedia do. Quoting
+    the canonical URL with `quote_url` gives the URL to request.
+
+    Args:
+        url (str): URL.
+        quoted (bool, optional): Defaults to False. Whether the URL is quoted.
+            Quoted and unquoted URLs cannot be told apart as a name may contain
+            a percent sign, e.g. 'Medal_%22For_Courage%22'.
+
+    Returns:
+        str: Canonical URL.
+    """
+
+    if quoted:
+        url = unquote_url(url)
+    if not url.startswith(DBPEDIA_RESOURCE_URL):
+        return url
+
+    name = url[len(DBPEDIA_RESOURCE_URL):].replace(' ', '_')
+    namespace = next((namespace for namespace in DBPEDIA_NAMESPACES
+                      if name.startswith(namespace)), '')
+    title = name[len(namespace):]
+    return DBPEDIA_RESOURCE_URL + namespace + title[:1].upper() + title[1:]
+
+
+def url_id(url, quoted=False):
+    """Get the stable ID of a url.
+
+    The ID is derived from the canonical URL, so it is the same for all the
+    forms of the URL of a resource and across runs.
+
+    Args:
+        url (str): URL.
+        quoted (bool, optional): Defaults to False. Whether the URL is quoted.
+
+    Returns:
+        str: ID of 16 hexadecimal digits.
+    """
+
+    url = canonicalize_url(url, quoted=quoted)
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+
+
+class UrlIndex:
+    """Index of canonical URLs.
+
+    The index deduplicates the URLs of resources by their canonical URL (see
+    `canonicalize_url`) and keeps their stable IDs (see `url_id`). Iterating
+    over the index gives the canonical URLs in the order they were added.
+
+    Args:
+        urls (list of `str`, optional): Defaults to None. URLs to add.
+        quoted (bool, optional): Defaults to False. Whether the `urls` are
+            quoted.
+    """
+
+    def __init__(self, urls=None, quoted=False):
+        self.ids = {}
+        self.num_duplicates = 0
+        for url in urls or []:
+            self.add(url, quoted=quoted)
+
+    def add(self, url, quoted=False):
+        """Add a url to the index.
+
+        Args:
+            url (str): URL.
+            quoted (bool, optional): Defaults to False. Whether the URL is quoted.
+
+        Returns:
+            str: ID of the URL.
+        """
+
+        url = canonicalize_url(url, quoted=quoted)
+        if url in self.ids:
+            self.num_duplicates += 1
+        else:
+            self.ids[url] = url_id(url)
+        return self.ids[url]
+
+    def get_id(self, url, quoted=False):
+        """Get the ID of a url in the index.
+
+        Args:
+            url (str): URL.
+            quoted (bool, optional): Defaults to False. Whether the URL is quoted.
+
+        Returns:
+            str: ID of the URL, or None if the URL is not in the index.
+        """
+
+        return self.ids.get(canonicalize_url(url, quoted=quoted))
+
+    def quoted_urls(self):
+        """Get the quoted canonical URLs, i.e. the URLs to request.
+
+        Returns:
+            list of `str`: Quoted URLs.
+        """
+
+        return [quote_url(url) for url in self.ids]
+
+    def __contains__(self, url):
+        return canonicalize_url(url) in self.ids
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+
 def unquote_url(url):
     """Unquote a url.
 
@@ -0,0 +1,245 @@
+import json
+
+import numpy as np
+from pyarrow import parquet
+
+from src.data.interim_utils import LIST_SEPARATOR, VOCABULARY_METADATA_KEY, _to_list
+
+
+class EntityVocabulary:
+    """Vocabulary mapping entity names to integer IDs.
+
+    The same universities, countries, awards and categories appear
+    thousands of times in the physicists and places data. The vocabulary
+    keeps each distinct name once and the multi-valued fields are encoded
+    as int32 arrays of IDs, so that joins and membership tests on them are
+    integer operations. The IDs of a vocabulary created by `from_frame`
+    follow the sorted order of the names, so sorting IDs sorts names.
+
+    Args:
+        names (list of `str`, optional): Defaults to None. Names in the order
+            of their IDs.
+    """
+
+    def __init__(self, names=None):
+        self.names = []
+        self.ids = {}
+        self._names_array = None
+        for name in names or []:
+            self.add(name)
+
+    @classmethod
+    def from_frame(cls, frame, columns):
+        """Create a vocabulary of the names in list columns.
+
+        Args:
+            frame (pandas.DataFrame): Data, e.g. the interim physicists.
+            columns (list of `str`): List columns. Each value is either a list
+                or array of names or a string of '|' separated names.
+
+        Returns:
+            EntityVocabulary: Vocabulary of the sorted distinct names.
+        """
+
+        names = set()
+        for column in columns:
+            for names_in_cell in frame[column]:
+                names.update(_to_list(names_in_cell) or [])
+        return cls(sorted(names))
+
+    def add(self, name):
+        """Add a name to the vocabulary.
+
+        Args:
+            name (str): Name.
+
+        Returns:
+            int: ID of the name.
+        """
+
+        id_ = self.ids.get(name)
+        if id_ is None:
+            id_ = self.ids[name] = len(self.names)
+            self.names.append(name)
+            self._names_array = None
+        return id_
+
+    def get_id(self, name):
+        """Get the ID of a name.
+
+        Args:
+            name (str): Name.
+
+        Returns:
+            int: ID of the name, or None if the name is not in the vocabulary.
+        """
+
+        return self.ids.get(name)
+
+    def encode(self, names, add=False):
+        """Encode names as IDs.
+
+        Args:
+            names (list of `str`): Names.
+            add (bool, optional): Defaults to False. Whether to add the names
+                not in the vocabulary. If False then their ID is -1.
+
+        Returns:
+            numpy.ndarray: int32 IDs.
+        """
+
+        if add:
+            return np.array([self.add(name) for name in names], dtype='int32')
+        return np.array([self.ids.get(name, -1) for name in names], dtype='int32')
+
+    def decode(self, ids):
+        """Decode IDs as names.
+
+        Args:
+            ids (array-like of `int`): IDs.
+
+        Returns:
+            numpy.ndarray: Names.
+        """
+
+        if self._names_array is None:
+            self._names_array = np.array(self.names, dtype=object)
+        return self._names_array[np.asarray(ids, dtype='int64')]
+
+    def encode_lists(self, series, add=True):
+        """Encode a list column as arrays of IDs.
+
+        Args:
+            series (pandas.Series): List column. Each value is either a list
+                or array of names or a string of '|' separated names.
+            add (bool, optional): Defaults to True. Whether to add the names
+                not in the vocabulary.
+
+        Returns:
+            pandas.Series: int32 arrays of IDs, or `numpy.nan` for missing
+                values.
+
+        Raises:
+            KeyError: If `add` is False and a name is not in the vocabulary.
+        """
+
+        def encode_cell(cell):
+            if not isinstance(cell, (np.ndarray, list, str)):
+                return np.nan
+            ids = self.encode(_to_list(cell), add=add)
+            if (ids == -1).any():
+                raise KeyError('Names not in the vocabulary: {}'.format(
+                    [name for name in _to_list(cell) if name not in self.ids]))
+            return ids
+
+        return series.map(encode_cell)
+
+    def decode_lists(self, series, join=False):
+        """Decode a list column of arrays of IDs.
+
+        Args:
+            series (pandas.Series): Arrays of IDs, e.g. from `encode_lists`.
+            join (bool, optional): Defaults to False. Whether to join the
+                names with '|'.
+
+        Returns:
+            pandas.Series: Lists of names, or '|' separated names if `join`,
+                or `numpy.nan` for missing values.
+        """
+
+        def decode_cell(ids):
+            if not isinstance(ids, (np.ndarray, list)):
+                return np.nan
+            names = self.decode(ids).tolist()
+            return LIST_SEPARATOR.join(names) if join else names
+
+        return series.map(decode_cell)
+
+    def save(self, path):
+        """Save the vocabulary to a JSON file.
+
+        Args:
+            path (str): Path of the JSON file.
+        """
+
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(dict(names=self.names), file, ensure_ascii=False, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        """Load a vocabulary from a JSON file.
+
+        Args:
+            path (str): Path of a JSON file written by `save`.
+
+        Returns:
+            EntityVocabulary: Vocabulary.
+        """
+
+        with open(path, encoding='utf-8') as file:
+            return cls(json.load(file)['names'])
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def __len__(self):
+        return len(self.names)
+
+
+def read_interim_vocabulary(path):
+    """Read the vocabulary of an interim Parquet file.
+
+    Args:
+        path (str): Path of a Parquet file written by `write_interim_table`
+            with a vocabulary.
+
+    Returns:
+        EntityVocabulary: Vocabulary, or None if the file has none.
+    """
+
+    metadata = parquet.read_schema(path).metadata or {}
+    if VOCABULARY_METADATA_KEY not in metadata:
+        return None
+    return EntityVocabulary(json.loads(metadata[VOCABULARY_METADATA_KEY].decode('utf-8')))
+
+
+def lookup_list_ids(id_lists, key_ids, values):
+    """Look up the values of the IDs in list columns.
+
+    An integer join of the arrays of IDs of a list column with a table
+    keyed by ID, e.g. of the places of the physicists with the country codes
+    of the places.
+
+    Args:
+        id_lists (pandas.Series): Arrays of IDs, e.g. from
+            `EntityVocabulary.encode_lists`.
+        key_ids (array-like of `int`): IDs of the keys of the table, e.g. of
+            the full names of the places.
+        values (array-like): Values of the table. Each value is either a list
+            of values, a string of '|' separated values or `numpy.nan`.
+
+    Returns:
+        pandas.Series: Sorted lists of the distinct values of the IDs of each
+            row.
+
+    Raises:
+        ValueError: If the `key_ids` are not unique.
+    """
+
+    key_ids = np.asarray(key_ids, dtype='int64')
+    if len(np.unique(key_ids)) != len(key_ids):
+        raise ValueError('The key IDs must be unique.')
+
+    table = np.full(key_ids.max() + 1 if len(key_ids) else 0, -1, dtype='int64')
+    table[key_ids] = np.arange(len(key_ids))
+    value_lists = [_to_list(value) or [] for value in values]
+
+    def lookup_cell(ids):
+        if not isinstance(ids, (np.ndarray, list)):
+            return []
+        ids = np.asarray(ids, dtype='int64')
+        positions = table[ids[(ids >= 0) & (ids < len(table))]]
+        return sorted({value for position in positions[positions >= 0]
+                       for value in value_lists[position] if value})
+
+    return id_lists.map(lookup_cell)
@@ -1,16 +1,23 @@
 import copy
+import heapq
+import io
+import os
+import re
 import sys
-from concurrent.futures import as_completed
+import time
+import warnings
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from random import random
 from urllib import parse
 
 import pandas as pd
 import progressbar
 import requests
-from bs4 import BeautifulSoup
-from bs4.element import NavigableString
+from lxml import etree
 from requests_futures.sessions import FuturesSession
 
+from src.data.fetch_metrics import FetchMetrics
+from src.data.http_utils import get_shared_session
 from src.data.url_utils import get_filename_from_url
 
 """list of `str`: Blacklist of links.
@@ -61,48 +68,170 @@ The URL path that all English Wikipedia articles are contained in.
 WIKI_URL = 'https://en.wikipedia.org/wiki/'
 
 
-def get_linked_article_titles(url, section_titles, blacklist_links=None):
+"""str: Wikipedia English API URL.
+
+The URL of the MediaWiki action API of the English Wikipedia.
+"""
+WIKI_API_URL = 'https://en.wikipedia.org/w/api.php'
+
+_REDIRECT_KEY = b'"wgInternalRedirectTargetUrl"'
+_REDIRECT_PATTERN = re.compile(_REDIRECT_KEY + rb'\s*:\s*"([^"]*)"')
+_HEAD_END_PATTERN = re.compile(rb'</head\s*>', re.IGNORECASE)
+
+
+def get_linked_article_titles(url, section_titles, blacklist_links=None,
+                              html_cache_dir=None, timeout=10, session=None):
     """Get a list of links from a Wikipedia article.
+
+    The article is parsed in a single pass by `extract_linked_article_titles`.
+    Pinned revisions (URLs with an `oldid`, see `get_old_article_url`) never
+    change, so if `html_cache_dir` is given their HTML is saved there and
+    later calls read it instead of requesting the article again.
+
     Args:
         url (str): URL to fetch.
         section_titles (list(str)): A list of section titles from
             which to fetch the links from.
         blacklist_links (list(str)): A list of links (titles) to not fetch.
-        progress_bar (progressbar.ProgressBar): Progress bar.
+        html_cache_dir (str, optional): Defaults to None. Directory where the
+            HTML of pinned revisions is cached.
+        timeout (int, optional): Defaults to 10. Maximum timeout to allow for
+            the request.
+        session (requests.Session, optional): Defaults to None. Session used for
+            the requests, e.g. created by `create_session`. If None then the
+            shared session of `get_shared_session` is used.
 
     Returns:
         list(str): List of linked article titles.
 
+    Raises:
+        ValueError: If a section is not found in the article.
+        requests.exceptions.RequestException: If the request fails.
     """
 
-    # fetch the page
-    response = requests.get(url)
-    soup = BeautifulSoup(response.text, 'lxml')
-
-    # loop to find links
-    article_titles = []
-    for section_title in section_titles:
-        span_id = section_title.replace(' ', '_')
-        section = soup.find('span', id=span_id)
-        ul = section.find_next('ul')
-        for link in ul.find_all('a', href=True):
-            if not link['href'].startswith('/wiki/'):
-                # skip external and dead (redlink=1) links
-                continue
-            article_title = (
-                link['href'].replace('/wiki/', '').replace('_', ' ')
-            )
-            if (not BLACKLIST_LINKS or
-                    article_title not in BLACKLIST_LINKS):
-                article_titles.append(article_title)
-    return article_titles
+    cache_path = None
+    query = parse.parse_qs(parse.urlsplit(url).query)
+    if html_cache_dir and 'oldid' in query:
+        cache_path = os.path.join(html_cache_dir, '{}-{}.html'.format(
+            parse.quote(query.get('title', [''])[0], safe=''), query['oldid'][0]))
+
+    if not cache_path or not os.path.exists(cache_path):
+        # fetch the page
+        response = (session or get_shared_session()).get(url, timeout=timeout)
+        response.raise_for_status()
+        if not cache_path:
+            return extract_linked_article_titles(
+                io.BytesIO(response.content), section_titles, blacklist_links)
+
+        os.makedirs(html_cache_dir, exist_ok=True)
+        tmp_path = cache_path + '.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(response.content)
+        os.replace(tmp_path, cache_path)
+
+    with open(cache_path, 'rb') as file:
+        return extract_linked_article_titles(file, section_titles, blacklist_links)
+
+
+def get_old_article_url(title, oldid):
+    """Get the URL of a pinned revision of a Wikipedia article.
+
+    Args:
+        title (str): Title of the article, e.g. 'List of physicists'.
+        oldid (int): Revision ID of the article.
+
+    Returns:
+        str: URL of the revision, e.g.
+            'https://en.wikipedia.org/w/index.php?title=List_of_physicists&oldid=861832841'.
+    """
+
+    return '{}{}&oldid={}'.format(WIKI_OLD_URL, title.replace(' ', '_'), oldid)
+
+
+def extract_linked_article_titles(source, section_titles, blacklist_links=None):
+    """Extract the links of sections of a Wikipedia article.
+
+    The links of a section are those of the first list (`<ul>`) after the
+    element whose id is the section title. All the sections are extracted in a
+    single pass over the HTML with `lxml.etree.iterparse`, without building the
+    whole document tree.
+
+    Args:
+        source (str or file): Path or binary file object of the HTML article.
+        section_titles (list(str)): A list of section titles from
+            which to fetch the links from.
+        blacklist_links (list(str), optional): Defaults to None. A list of links
+            (titles) to not fetch.
+
+    Returns:
+        list(str): List of linked article titles, in the order of
+            `section_titles`.
+
+    Raises:
+        ValueError: If a section is not found in the article.
+    """
+
+    section_ids = {section_title.replace(' ', '_'): section_title
+                   for section_title in section_titles}
+    blacklist_links = set(blacklist_links) if blacklist_links else set()
+
+    section_links = {}
+    pending_sections = []  # sections found, waiting for their list
+    lists = []  # open lists being collected and their sections
+    for event, element in etree.iterparse(source, events=('start', 'end'),
+                                          html=True, encoding='utf-8'):
+        if event == 'start':
+            section_id = element.get('id')
+            if section_id in section_ids and section_ids[section_id] not in section_links:
+                section_links[section_ids[section_id]] = []
+                pending_sections.append(section_ids[section_id])
+            elif element.tag == 'ul' and pending_sections:
+                lists.append((element, pending_sections))
+                pending_sections = []
+            continue
+
+        if element.tag == 'a' and lists:
+            href = element.get('href')
+            # skip external and dead (redlink=1) links
+            if href and href.startswith('/wiki/'):
+                article_title = href.replace('/wiki/', '').replace('_', ' ')
+                if article_title not in blacklist_links:
+                    for _, sections in lists:
+                        for section_title in sections:
+                            section_links[section_title].append(article_title)
+        elif lists and element is lists[-1][0]:
+            lists.pop()
+
+        if not lists:
+            # free the parsed elements that are no longer needed
+            element.clear()
+
+    missing = [title for title in section_titles if title not in section_links]
+    if missing:
+        raise ValueError('Sections not found: {}'.format(missing))
+    return [article_title for section_title in section_titles
+            for article_title in section_links[section_title]]
 
 
 def get_redirected_titles(
         titles_to_check, title_cache_path=None, max_workers=2, timeout=10,
-        progress_bar=None):
+        progress_bar=None, bulk=False, wiki_url=WIKI_URL, api_url=WIKI_API_URL,
+        max_retries=3, backoff=1.0, max_backoff=60.0, log_path=None, resume=False,
+        session=None, metrics=None):
     """Get a list of redirected links from a list of Wikipedia articles.
 
+    By default each article is requested and its HTML is streamed until the
+    redirect target is found or the `<head>` element closes, so only the first
+    kilobytes of each article are downloaded. With `bulk` the titles are
+    instead resolved 50 at a time with the MediaWiki API.
+
+    Requests that time out, fail to connect or get a 429 or 5xx response are
+    put back in a retry queue and retried after an exponential backoff, capped
+    at `max_backoff` seconds (or the `Retry-After` header, if any). Titles that
+    still fail are mapped to themselves, with a warning, and recorded with
+    their error in the request log. Rerun with `resume` to only request the
+    titles that failed (or were never requested) in the previous run.
+
     Args:
         titles_to_check (list of `str`): List of titles to request.
         title_cache_path (str, optional): Defaults to None. Path of the csv file
@@ -113,6 +242,31 @@ def get_redirected_titles(
             for any request.
         progress_bar (progressbar.ProgressBar, optional): Defaults to None.
             Progress bar.
+        bulk (bool, optional): Defaults to False. Whether to resolve the titles
+            with the MediaWiki API instead of requesting each article.
+        wiki_url (str, optional): Defaults to `WIKI_URL`. URL path of the
+            articles.
+        api_url (str, optional): Defaults to `WIKI_API_URL`. URL of the
+            MediaWiki API used if `bulk` is True.
+        max_retries (int, optional): Defaults to 3. Maximum number of times a
+            request is retried.
+        backoff (float, optional): Defaults to 1.0. Delay in seconds before the
+            first retry. It doubles with each retry.
+        max_backoff (float, optional): Defaults to 60.0. Maximum delay in seconds
+            before a retry.
+        log_path (str, optional): Defaults to None. Path of the csv file where
+            the redirected title or error of each requested title is recorded.
+            If None and `title_cache_path` is given then it is the title cache
+            path with a '-log' suffix, e.g. 'wikipedia-redirects-log.csv'.
+        resume (bool, optional): Defaults to False. Whether to reuse the titles
+            redirected successfully in the request log and only request the
+            others.
+        session (requests.Session, optional): Defaults to None. Session used for
+            the requests, e.g. created by `create_session`. If None then the
+            shared session of `get_shared_session` is used.
+        metrics (FetchMetrics, optional): Defaults to None. Metrics collector
+            fed with every response, e.g. to export the request rate, latency
+            and errors of the fetch.
 
         Returns:
             dict: Dictionary of redirected page titles.
@@ -127,64 +281,290 @@ def get_redirected_titles(
     if title_cache_path:
         cache = pd.read_csv(title_cache_path)
         redirected_titles = dict(zip(cache.name, cache.redirect_name))
+        if log_path is None:
+            log_path = '{}-log{}'.format(*os.path.splitext(title_cache_path))
+
+    log = {}
+    if resume and log_path and os.path.exists(log_path):
+        log = _read_title_log(log_path)
+        redirected_titles.update({title: redirect_name
+                                  for title, (redirect_name, error) in log.items()
+                                  if not error})
+    unique_titles = {parse.unquote(name) for name in titles_to_check
+                     if isinstance(name, str)}
     titles = (
-        list({parse.unquote(name) for name in titles_to_check if isinstance(name, str)} -
+        list(unique_titles -
         set(redirected_titles.keys()))
         )
 
+    metrics = metrics or FetchMetrics()
+    if title_cache_path or resume:
+        metrics.record_cache(len(unique_titles) - len(titles), len(titles))
+    session = session or get_shared_session()
+    resolved_titles = {}
+    errors = {}
+    try:
+        if bulk:
+            resolved_titles.update(resolve_redirected_titles(
+                titles, api_url=api_url, timeout=timeout, session=session,
+                max_retries=max_retries, backoff=backoff, max_backoff=max_backoff,
+                errors=errors, progress_bar=progress_bar, metrics=metrics))
+        else:
+            _request_redirected_titles(
+                titles, resolved_titles, errors, session, wiki_url, max_workers,
+                timeout, max_retries, backoff, max_backoff, progress_bar, metrics)
+    finally:
+        # record the titles resolved so far, even if interrupted
+        if log_path:
+            for title, redirected_title in resolved_titles.items():
+                log[title] = (redirected_title, errors.get(title))
+            _write_title_log(log_path, log)
+
+    if errors:
+        warnings.warn('Failed to get the redirects of {} titles{}.'.format(
+            len(errors), ', see ' + log_path if log_path else ''))
+    redirected_titles.update(resolved_titles)
+    return redirected_titles
+
+
+def _request_redirected_titles(titles, redirected_titles, errors, session, wiki_url,
+                               max_workers, timeout, max_retries, backoff, max_backoff,
+                               progress_bar, metrics):
+    attempts = {}
     futures = {}
-    with FuturesSession(max_workers=max_workers) as session:
-        if progress_bar:
-            progress_bar.start()
+    retry_queue = []  # heap of (time to retry, title)
+    # the session's pools are sized by `create_session`, FuturesSession only
+    # resizes them, dropping their connections, when it creates the executor
+    with ThreadPoolExecutor(max_workers=max_workers) as executor, \
+            FuturesSession(session=session, executor=executor) as futures_session:
+        metrics.start(progress_bar)
+
+        def request_title(title):
+            attempts[title] = attempts.get(title, 0) + 1
+            url = wiki_url + title.replace(' ', '_')
+            futures[futures_session.get(url, timeout=timeout, stream=True)] = title
 
         for title in titles:
-            if isinstance(title, str):
-                # fetch the page
-                url = WIKI_URL + title.replace(' ', '_')
-                future = session.get(url, timeout=timeout)
-                futures[future] = title
-
-        num_iters = 0
-        for future in as_completed(futures):
+            request_title(title)
+
+        while futures or retry_queue:
+            while retry_queue and retry_queue[0][0] <= time.monotonic():
+                request_title(heapq.heappop(retry_queue)[1])
+            wait_time = (max(0, retry_queue[0][0] - time.monotonic())
+                         if retry_queue else None)
+            if not futures:
+                time.sleep(wait_time)
+                continue
+
+            done, _ = wait(futures, timeout=wait_time, return_when=FIRST_COMPLETED)
+            for future in done:
+                title = futures.pop(future)
+                response, error = None, None
+                try:
+                    response = future.result()
+                    try:
+                        response.raise_for_status()
+                    except requests.exceptions.HTTPError:
+                        response.close()
+                        raise
+                    # search the head of the page for redirects
+                    redirected_title = find_redirected_title(response)
+                except requests.exceptions.RequestException as err:
+                    error = err
+                    if attempts[title] <= max_retries and _is_retryable(err):
+                        metrics.record(response, err, retry=True)
+                        delay = _retry_delay(err, attempts[title], backoff, max_backoff)
+                        heapq.heappush(retry_queue, (time.monotonic() + delay, title))
+                        continue
+                    errors[title] = str(err)
+                    redirected_title = None
+
+                if redirected_title:
+                    redirected_titles[title] = parse.unquote(redirected_title)
+                else:
+                    redirected_titles[title] = title
+                metrics.record(response, error)
+
+        metrics.finish()
+
+
+def find_redirected_title(response, chunk_size=4096):
+    """Find the redirect target of a Wikipedia article response.
+
+    The response body is read in chunks and searched for the
+    `wgInternalRedirectTargetUrl` variable that Wikipedia sets in the `<head>`
+    of redirected articles. Reading stops as soon as it is found or the
+    `<head>` element closes, and the response is closed. Request the article
+    with `stream=True` so that the rest of the body is not downloaded.
+
+    Args:
+        response (requests.Response): Response of a Wikipedia article.
+        chunk_size (int, optional): Defaults to 4096. Number of bytes read at a
+            time.
+
+    Returns:
+        str: Redirected title, or None if the article is not redirected or the
+            response is not OK.
+    """
+
+    try:
+        if response.status_code != requests.codes.ok:
+            return None
+
+        buffer = b''
+        for chunk in response.iter_content(chunk_size):
+            buffer += chunk
+            match = _REDIRECT_PATTERN.search(buffer)
+            if match:
+                return (match.group(1).decode('utf-8')
+                        .replace('/wiki/', '').replace('_', ' '))
+            if _HEAD_END_PATTERN.search(buffer):
+                return None
+
+            # keep the part of the buffer that may hold an incomplete match
+            start = buffer.rfind(_REDIRECT_KEY)
+            buffer = buffer[start:] if start != -1 else buffer[-len(_REDIRECT_KEY):]
+        return None
+    finally:
+        response.close()
+
+
+def resolve_redirected_titles(titles, api_url=WIKI_API_URL, batch_size=50,
+                              timeout=10, session=None, max_retries=3, backoff=1.0,
+                              max_backoff=60.0, errors=None, progress_bar=None,
+                              metrics=None):
+    """Resolve the redirects of Wikipedia titles with the MediaWiki API.
+
+    The titles are sent `batch_size` at a time to the `query` action with
+    `redirects`, so thousands of titles are resolved with a few small
+    requests. Like the article redirects, a redirect to a section keeps the
+    section fragment, e.g. 'Target#Section'.
+
+    Args:
+        titles (list of `str`): Titles to resolve.
+        api_url (str, optional): Defaults to `WIKI_API_URL`. URL of the
+            MediaWiki API.
+        batch_size (int, optional): Defaults to 50. Number of titles per
+            request. The API accepts at most 50 titles per request for most
+            clients.
+        timeout (int, optional): Defaults to 10. Maximum timeout to allow for
+            any request.
+        session (requests.Session, optional): Defaults to None. Session used for
+            the requests, e.g. created by `create_session`. If None then the
+            shared session of `get_shared_session` is used.
+        max_retries (int, optional): Defaults to 3. Maximum number of times a
+            failed request is retried, with exponential backoff.
+        backoff (float, optional): Defaults to 1.0. Delay in seconds before the
+            first retry. It doubles with each retry.
+        max_backoff (float, optional): Defaults to 60.0. Maximum delay in seconds
+            before a retry.
+        errors (dict, optional): Defaults to None. If given, the titles of the
+            batches that still fail are mapped to themselves and their errors
+            are added to it instead of raising.
+        progress_bar (progressbar.ProgressBar, optional): Defaults to None.
+            Progress bar.
+        metrics (FetchMetrics, optional): Defaults to None. Metrics collector
+            fed with every response, e.g. to export the request rate, latency
+            and errors of the fetch.
+
+    Returns:
+        dict: The keys are the titles and the values are the redirected titles,
+            or the titles themselves if they are not redirected.
+
+    Raises:
+        requests.exceptions.RequestException: If a request still fails after the
+            retries and `errors` is None.
+    """
+
+    titles = list(dict.fromkeys(title for title in titles if isinstance(title, str)))
+    session = session or get_shared_session()
+    metrics = metrics or FetchMetrics()
+    redirected_titles = {}
+    metrics.start(progress_bar)
+    for start in range(0, len(titles), batch_size):
+        batch = titles[start:start + batch_size]
+        params = dict(action='query', format='json', formatversion=2, redirects=1,
+                      titles='|'.join(batch))
+        for attempt in range(1, max_retries + 2):
             try:
-                response = future.result()
+                response = session.get(api_url, params=params, timeout=timeout)
                 response.raise_for_status()
+                break
             except requests.exceptions.RequestException as err:
-                print(err)
-
-            # parse javascript for redirects
-            redirected_title = _parse_javascript(response)
-            title = parse.unquote(futures[future])
-            if redirected_title:
-                redirected_titles[title] = parse.unquote(redirected_title)
-            else:
+                if attempt <= max_retries and _is_retryable(err):
+                    metrics.record(error=err, retry=True)
+                    time.sleep(_retry_delay(err, attempt, backoff, max_backoff))
+                    continue
+                metrics.record(error=err, num_items=len(batch))
+                if errors is None:
+                    metrics.finish()
+                    raise
+                response = None
+                error = str(err)
+                break
+
+        if response is None:
+            for title in batch:
                 redirected_titles[title] = title
+                errors[title] = error
+            continue
+        metrics.record(response, num_items=len(batch))
+        query = response.json().get('query', {})
+
+        normalized = {item['from']: item['to']
+                      for item in query.get('normalized', [])}
+        redirects = {item['from']: (item['to'], item.get('tofragment'))
+                     for item in query.get('redirects', [])}
+        for title in batch:
+            redirected_titles[title] = _follow_redirects(
+                title, normalized.get(title, title), redirects)
+    metrics.finish()
 
-            num_iters += 1
-            if progress_bar:
-                progress_bar.update(num_iters)
+    return redirected_titles
 
-        if progress_bar:
-            progress_bar.finish()
 
-    return redirected_titles
+def _follow_redirects(title, normalized_title, redirects):
+    if normalized_title not in redirects:
+        # like an article request, a title that is only normalized is kept as is
+        return title
+
+    seen = set()
+    fragment = None
+    while normalized_title in redirects and normalized_title not in seen:
+        seen.add(normalized_title)
+        normalized_title, fragment = redirects[normalized_title]
+    return normalized_title + '#' + fragment if fragment else normalized_title
+
+
+def _is_retryable(err):
+    if isinstance(err, requests.exceptions.HTTPError):
+        status_code = err.response.status_code if err.response is not None else None
+        return status_code == requests.codes.too_many_requests or (
+            status_code is not None and status_code >= 500)
+    return isinstance(err, (requests.exceptions.ConnectionError,
+                            requests.exceptions.Timeout,
+                            requests.exceptions.ChunkedEncodingError))
+
+
+def _retry_delay(err, attempt, backoff, max_backoff):
+    retry_after = (err.response.headers.get('Retry-After')
+                   if err.response is not None else None)
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), max_backoff)
+    # exponential backoff with jitter so that retries are spread out
+    return min(backoff * 2 ** (attempt - 1), max_backoff) * (0.5 + random() / 2)
+
+
+def _read_title_log(log_path):
+    log = pd.read_csv(log_path, keep_default_na=False)
+    return {name: (redirect_name, error or None)
+            for name, redirect_name, error in zip(log.name, log.redirect_name, log.error)}
 
 
-def _parse_javascript(response):
-    if response.status_code == requests.codes.ok:
-        REDIRECT = '"wgInternalRedirectTargetUrl":'
-        soup = BeautifulSoup(response.text, 'lxml')
-
-        for script_tag in soup.find_all(name='script'):
-            script_code = script_tag.string
-            if (isinstance(script_code, NavigableString) and
-                    REDIRECT in script_code):
-                start = script_code.find(REDIRECT)
-                end = script_code.find(
-                    '"', start + len(REDIRECT) + 1)
-                redirected_title = (
-                    script_code[start + len(REDIRECT) + 1:end]
-                    .replace('/wiki/', '').replace('_', ' '))
-                return redirected_title
-
-    return None
+def _write_title_log(log_path, log):
+    log = pd.DataFrame([(name, redirect_name, error or '')
+                        for name, (redirect_name, error) in sorted(log.items())],
+                       columns=['name', 'redirect_name', 'error'])
+    tmp_path = log_path + '.tmp'
+    log.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, log_path)
@@ -0,0 +1,245 @@
+import json
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as ss
+from sklearn.base import BaseEstimator, TransformerMixin
+
+from src.features.features_utils import SparseFeatures
+
+SERIES_TO_BINARIZE = {
+    'birth_country_alpha_3_codes': 'born_in_',
+    'birth_continent_codes': 'born_in_',
+    'residence_country_alpha_3_codes': 'lived_in_',
+    'residence_continent_codes': 'lived_in_',
+    'alma_mater': 'alumnus_of_',
+    'alma_mater_country_alpha_3_codes': 'alumnus_in_',
+    'alma_mater_continent_codes': 'alumnus_in_',
+    'workplaces': 'worked_at_',
+    'workplaces_country_alpha_3_codes': 'worked_in_',
+    'workplaces_continent_codes': 'worked_in_',
+    'citizenship_country_alpha_3_codes': 'citizen_of_',
+    'citizenship_continent_codes': 'citizen_in_'
+}
+"""dict: Series to binarize.
+
+The list features built for the physicists and the prefixes of the binary
+features they are binarized into.
+"""
+
+
+def other_feature_name(name, prefix):
+    """Get the name of the "other" binary feature of a list feature.
+
+    Rare categories of a list feature are grouped into the "other"
+    category, represented by one or more "*'s" in its name.
+
+    Args:
+        name (str): Name of the list feature.
+        prefix (str): Prefix of the binary features.
+
+    Returns:
+        str: Name of the "other" binary feature.
+    """
+
+    if name.endswith('alpha_3_codes'):
+        other_name = '***'
+    elif name.endswith('continent_codes'):
+        other_name = '**'
+    else:
+        other_name = '*'
+    return prefix + other_name
+
+
+class ListFeatureBinarizer(BaseEstimator, TransformerMixin):
+    """Binarize list features into a sparse binary features matrix.
+
+    The vocabulary of each list feature is frozen when the binarizer is
+    fitted to the training features and can be saved to a JSON file. When
+    transforming, categories not in the vocabulary are mapped to the
+    "other" binary feature of their list feature, or dropped if there is
+    none, so that the validation and test features always have the same
+    columns as the training features.
+
+    Args:
+        prefixes (dict, optional): Defaults to None. The keys are the names
+            of the list features to binarize and the values are the prefixes
+            of their binary features. If None then `SERIES_TO_BINARIZE` is
+            used.
+        presence_threshold (float, optional): Defaults to 0.0. For each
+            category in a list feature, the fraction of physicists for which
+            the category is present is calculated when fitting. If the
+            fraction is below this threshold it is grouped into the "other"
+            category. Set this value to zero to prevent any grouping.
+        vocabulary (EntityVocabulary, optional): Defaults to None. Vocabulary
+            of the list features encoded as arrays of IDs (see
+            `src.data.vocabulary_utils`). If given, the list features must be
+            encoded with it and the categories are counted and looked up by
+            ID, while the fitted vocabulary and feature names keep the names.
+
+    Attributes:
+        vocabulary_ (dict): The keys are the names of the list features. The
+            values are dicts with the sorted `categories` kept as binary
+            features and whether the list feature has an `other` feature.
+    """
+
+    def __init__(self, prefixes=None, presence_threshold=0.0, vocabulary=None):
+        self.prefixes = prefixes
+        self.presence_threshold = presence_threshold
+        self.vocabulary = vocabulary
+
+    def fit(self, features, y=None):
+        """Fit the vocabulary of each list feature.
+
+        Args:
+            features (pandas.DataFrame): Features dataframe containing the
+                list features. Each value is either a list of categories or
+                a string of '|' separated categories.
+            y (None): Ignored.
+
+        Returns:
+            ListFeatureBinarizer: self.
+        """
+
+        self.vocabulary_ = {}
+        for name in self._prefixes():
+            rows, categories = _explode(features[name])
+            pairs = pd.DataFrame({'row': rows, 'category': categories})
+            presence = pairs.drop_duplicates().category.value_counts() / len(
+                features)
+            keep = presence >= self.presence_threshold
+            categories = presence.index[keep]
+            if self.vocabulary is not None:
+                categories = self.vocabulary.decode(categories.values.astype('int64'))
+            self.vocabulary_[name] = dict(
+                categories=sorted(categories.tolist()),
+                other=bool((~keep).any()))
+        return self
+
+    def transform(self, features):
+        """Binarize the list features.
+
+        The work done is linear in the number of categories present in the
+        features.
+
+        Args:
+            features (pandas.DataFrame): Features dataframe containing the
+                list features.
+
+        Returns:
+            SparseFeatures: Sparse binary features with dtype int8 and
+                columns in the order given by `get_feature_names`.
+        """
+
+        self._check_is_fitted()
+
+        offset = 0
+        all_rows, all_cols = [], []
+        for name in self._prefixes():
+            vocabulary = self.vocabulary_[name]
+            num_categories = len(vocabulary['categories'])
+            rows, categories = _explode(features[name])
+            if self.vocabulary is not None:
+                categories = categories.astype('int64')
+            cols = self._category_index(vocabulary['categories']).get_indexer(
+                categories)
+            if vocabulary['other']:
+                cols[cols == -1] = num_categories
+            known = cols != -1
+            all_rows.append(rows[known])
+            all_cols.append(cols[known] + offset)
+            offset += num_categories + vocabulary['other']
+
+        rows = np.concatenate(all_rows) if all_rows else np.empty(0, 'int64')
+        cols = np.concatenate(all_cols) if all_cols else np.empty(0, 'int64')
+        matrix = ss.csr_matrix(
+            (np.ones(len(rows), dtype='int8'), (rows, cols)),
+            shape=(len(features), offset))
+        # a category can be grouped into "other" more than once in a row
+        matrix.sum_duplicates()
+        matrix.data[:] = 1
+        return SparseFeatures(matrix, features.index.values,
+                              np.array(self.get_feature_names(), dtype=object))
+
+    def get_feature_names(self):
+        """Get the names of the binary features.
+
+        Returns:
+            list of `str`: Names of the binary features.
+        """
+
+        self._check_is_fitted()
+
+        names = []
+        for name, prefix in self._prefixes().items():
+            vocabulary = self.vocabulary_[name]
+            names += [prefix + category.replace(' ', '_')
+                      for category in vocabulary['categories']]
+            if vocabulary['other']:
+                names.append(other_feature_name(name, prefix))
+        return names
+
+    def save(self, path):
+        """Save the fitted binarizer to a JSON file.
+
+        Args:
+            path (str): Path of the JSON file.
+        """
+
+        self._check_is_fitted()
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(dict(prefixes=self._prefixes(),
+                           presence_threshold=self.presence_threshold,
+                           vocabulary=self.vocabulary_),
+                      file, ensure_ascii=False, indent=1)
+
+    @classmethod
+    def load(cls, path, vocabulary=None):
+        """Load a fitted binarizer from a JSON file.
+
+        Args:
+            path (str): Path of a JSON file written by `save`.
+            vocabulary (EntityVocabulary, optional): Defaults to None.
+                Vocabulary of the list features to transform, if they are
+                encoded as arrays of IDs.
+
+        Returns:
+            ListFeatureBinarizer: Fitted binarizer.
+        """
+
+        with open(path, encoding='utf-8') as file:
+            saved = json.load(file)
+        binarizer = cls(prefixes=saved['prefixes'],
+                        presence_threshold=saved['presence_threshold'],
+                        vocabulary=vocabulary)
+        binarizer.vocabulary_ = saved['vocabulary']
+        return binarizer
+
+    def _category_index(self, categories):
+        if self.vocabulary is None:
+            return pd.Index(categories)
+        ids = self.vocabulary.encode(categories).astype('int64')
+        # categories missing from the vocabulary get distinct IDs that are
+        # never present
+        missing = ids == -1
+        ids[missing] = -2 - np.arange(missing.sum())
+        return pd.Index(ids)
+
+    def _prefixes(self):
+        return self.prefixes if self.prefixes is not None else SERIES_TO_BINARIZE
+
+    def _check_is_fitted(self):
+        if not hasattr(self, 'vocabulary_'):
+            raise ValueError('This ListFeatureBinarizer instance is not '
+                             'fitted yet. Call fit before using it.')
+
+
+def _explode(series):
+    lists = series.reset_index(drop=True)
+    if lists.dtype == object:
+        split = lists.str.split('|')
+        # lists are not strings so they are kept as they are
+        lists = split.where(split.notna(), lists)
+    exploded = lists.explode()
+    exploded = exploded[exploded.notna() & (exploded != '')]
+    return exploded.index.values, exploded.values.astype(object)
@@ -0,0 +1,166 @@
+import os
+
+import pandas as pd
+from pyarrow import feather
+
+from src.features.features_utils import (convert_categoricals_to_numerical,
+                                         convert_target_to_numerical)
+
+PARTITIONS = ['train', 'validation', 'test']
+"""list of `str`: Partitions.
+
+The partitions of the physicists data into training, validation and
+test sets.
+"""
+
+TABLES = ['features', 'features-topics', 'target']
+"""list of `str`: Tables.
+
+The tables stored for each partition. The processed CSV file of a table
+is named `<partition>-<table>.csv`.
+"""
+
+INDEX_NAME = 'full_name'
+"""str: Index name.
+
+The column containing the physicist names used to index all the tables.
+"""
+
+
+def build_feature_store(processed_dir, store_dir, partitions=None,
+                        tables=None):
+    """Build a feature store from the processed CSV files.
+
+    Each table is read once, converted to numerical values and written as
+    an uncompressed Feather file with int8 dtypes for the binary columns.
+    Tables whose CSV file does not exist are skipped.
+
+    Args:
+        processed_dir (str): Directory containing the processed CSV files.
+        store_dir (str): Directory to write the feature store to. It is
+            created if it does not exist.
+        partitions (list of `str`, optional): Defaults to None. Partitions
+            to build. If None then all `PARTITIONS` are built.
+        tables (list of `str`, optional): Defaults to None. Tables to build.
+            If None then all `TABLES` are built.
+
+    Returns:
+        list of `str`: Paths of the Feather files written.
+    """
+
+    os.makedirs(store_dir, exist_ok=True)
+
+    paths = []
+    for partition in partitions or PARTITIONS:
+        for table in tables or TABLES:
+            csv_path = os.path.join(
+                processed_dir, '{}-{}.csv'.format(partition, table))
+            if not os.path.exists(csv_path):
+                continue
+
+            if table == 'target':
+                target = pd.read_csv(csv_path, index_col=INDEX_NAME).iloc[:, 0]
+                frame = convert_target_to_numerical(target).to_frame()
+            else:
+                frame = convert_categoricals_to_numerical(
+                    pd.read_csv(csv_path))
+            path = table_path(store_dir, partition, table)
+            write_table(frame, path)
+            paths.append(path)
+    return paths
+
+
+def table_path(store_dir, partition, table):
+    """Get the path of a table in the feature store.
+
+    Args:
+        store_dir (str): Feature store directory.
+        partition (str): Partition name, e.g. 'train'.
+        table (str): Table name, e.g. 'features'.
+
+    Returns:
+        str: Path of the Feather file.
+    """
+
+    return os.path.join(store_dir, '{}-{}.feather'.format(partition, table))
+
+
+def write_table(frame, path):
+    """Write a numerical dataframe as a typed Feather file.
+
+    Integer columns with values in [0, 1] are stored as int8. The index is
+    stored as a column so that it is restored by `read_table`.
+
+    Args:
+        frame (pandas.DataFrame): Numerical dataframe indexed by
+            `INDEX_NAME`.
+        path (str): Path of the Feather file to write.
+    """
+
+    frame = frame.copy()
+    for column in frame.select_dtypes(include=['integer', 'bool']).columns:
+        values = frame[column]
+        if values.isin([0, 1]).all():
+            frame[column] = values.astype('int8')
+
+    frame.index.name = frame.index.name or INDEX_NAME
+    feather.write_feather(frame.reset_index(), path,
+                          compression='uncompressed')
+
+
+def read_table(store_dir, partition, table, columns=None):
+    """Read a table from the feature store.
+
+    The Feather file is memory-mapped and the numerical columns are not
+    parsed or converted.
+
+    Args:
+        store_dir (str): Feature store directory.
+        partition (str): Partition name, e.g. 'train'.
+        table (str): Table name, e.g. 'features'.
+        columns (list of `str`, optional): Defaults to None. Columns to
+            read. If None then all columns are read.
+
+    Returns:
+        pandas.DataFrame: Table indexed by `INDEX_NAME`.
+    """
+
+    if columns is not None:
+        columns = [INDEX_NAME] + [col for col in columns if col != INDEX_NAME]
+
+    arrow_table = feather.read_table(
+        table_path(store_dir, partition, table), columns=columns,
+        memory_map=True)
+    frame = arrow_table.to_pandas(split_blocks=True)
+    return frame.set_index(INDEX_NAME)
+
+
+def read_features(store_dir, partition, topics=False):
+    """Read the features of a partition from the feature store.
+
+    Args:
+        store_dir (str): Feature store directory.
+        partition (str): Partition name, e.g. 'train'.
+        topics (bool, optional): Defaults to False. Whether to read the
+            topic features instead of the binary features.
+
+    Returns:
+        pandas.DataFrame: Features dataframe with numerical values.
+    """
+
+    table = 'features-topics' if topics else 'features'
+    return read_table(store_dir, partition, table)
+
+
+def read_target(store_dir, partition):
+    """Read the target of a partition from the feature store.
+
+    Args:
+        store_dir (str): Feature store directory.
+        partition (str): Partition name, e.g. 'train'.
+
+    Returns:
+        pandas.Series: Target with numerical values.
+    """
+
+    return read_table(store_dir, partition, 'target').iloc[:, 0]
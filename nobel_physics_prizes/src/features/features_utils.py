@@ -1,22 +1,289 @@
+import collections
+
+import numpy as np
 import pandas as pd
+import scipy.sparse as ss
+from sklearn.preprocessing import MultiLabelBinarizer
+
+SparseFeatures = collections.namedtuple(
+    'SparseFeatures', ['matrix', 'index', 'columns'])
+"""namedtuple: Sparse features.
+
+A sparse features matrix together with its metadata. `matrix` is a
+`scipy.sparse.csr_matrix` of shape (n_samples, n_features), `index` is
+a `numpy.ndarray` of row labels (e.g. the full names of the physicists)
+and `columns` is a `numpy.ndarray` of the feature names.
+"""
+
+CATEGORIES = {
+    'binary': ['no', 'yes'],
+    'gender': ['female', 'male']
+}
+"""dict: Categories.
+
+The categories of each kind of categorical feature. The position of a
+category in the list is its numerical code, i.e. ['no', 'yes'] and
+['female', 'male'] are encoded as [0, 1]. Features of kind 'numeric'
+are left unchanged.
+"""
 
 
-def convert_categoricals_to_numerical(features):
+def infer_categorical_schema(features, index_col='full_name'):
+    """Infer the kind of each feature in a features dataframe.
+
+    The kind of a categorical feature is the kind whose categories contain
+    its distinct values. Values that are not categories of the kind are
+    reported when the features are converted with
+    `convert_categoricals_to_numerical`.
+
+    Args:
+        features (pandas.DataFrame): Features dataframe.
+        index_col (str, optional): Defaults to 'full_name'. Column to
+            exclude from the schema.
+
+    Returns:
+        dict: Schema. The keys are the feature names and the values
+            are the kinds of the features, i.e. one of 'binary',
+            'gender' or 'numeric'.
+
+    Raises:
+        ValueError: If the distinct values of a non-numeric feature
+            contain the categories of no kind or of several kinds.
+    """
+
+    schema = {}
+    for column, series in features.items():
+        if column == index_col:
+            continue
+        if series.dtype != object:
+            schema[column] = 'numeric'
+            continue
+
+        values = set(series.dropna().unique())
+        kinds = [kind for kind, categories in CATEGORIES.items()
+                 if values.intersection(categories)]
+        if len(kinds) != 1:
+            raise ValueError(
+                'Cannot infer the kind of feature {} with values {}: it '
+                'matches the kinds {}.'.format(
+                    column, sorted(values, key=str), kinds))
+        schema[column] = kinds[0]
+    return schema
+
+
+def convert_categoricals_to_numerical(features, schema=None, validate=True,
+                                      inplace=False):
     """Convert categorical features to numerical features.
 
+    Each categorical feature is converted with a vectorized comparison
+    against its categories straight to int8 codes.
+
+    Args:
+        features (pandas.DataFrame): Features dataframe.
+        schema (dict, optional): Defaults to None. Kind of each feature as
+            returned by `infer_categorical_schema`. If None then it is
+            inferred from `features`.
+        validate (bool, optional): Defaults to True. Whether to raise an
+            error if a categorical feature contains a value that is not
+            one of its categories. If False then such values are encoded
+            as 0 and the check is skipped. Missing values are kept as
+            `numpy.nan` either way.
+        inplace (bool, optional): Defaults to False. Whether to modify
+            `features` in place rather than return a new dataframe.
+
+    Returns:
+        pandas.DataFrame or None: Features dataframe with categorical
+            values ['yes', 'no'] and ['male', 'female'] replaced
+            with [1, 0] or None if `inplace` is True.
+
+    Raises:
+        ValueError: If `validate` is True and a categorical feature
+            contains an unexpected value.
+    """
+
+    if schema is None:
+        schema = infer_categorical_schema(features)
+
+    if inplace:
+        features.set_index('full_name', drop=True, inplace=True)
+        for column, kind in schema.items():
+            if kind != 'numeric':
+                features[column] = _categorical_codes(
+                    features[column], kind, validate)
+        return None
+
+    index = pd.Index(features['full_name'].values, name='full_name')
+    data = collections.OrderedDict()
+    for column in features.columns.drop('full_name'):
+        kind = schema.get(column, 'numeric')
+        values = features[column].values
+        if kind != 'numeric':
+            values = _categorical_codes(features[column], kind, validate)
+        data[column] = values
+    return pd.DataFrame(data, index=index, columns=list(data.keys()))
+
+
+def _categorical_codes(series, kind, validate):
+    negative, positive = CATEGORIES[kind]
+    values = np.asarray(series.values)
+    is_positive = values == positive
+    is_missing = pd.isnull(values)
+    if validate:
+        unexpected = ~(is_positive | (values == negative) | is_missing)
+        if unexpected.any():
+            raise ValueError('Unexpected values in {} feature {}: {}'.format(
+                kind, series.name, list(pd.unique(values[unexpected]))))
+    if is_missing.any():
+        return np.where(is_missing, np.nan, is_positive)
+    return is_positive.view('int8')
+
+
+def convert_categoricals_to_sparse(features, index_col='full_name'):
+    """Convert categorical features to a sparse numerical features matrix.
+
+    The conversion is done column by column so that the dense numerical
+    features matrix is never materialized. Only the positions of the
+    non-zero values are kept.
+
     Args:
         features (pandas.DataFrame): Features dataframe.
+        index_col (str, optional): Defaults to 'full_name'. Column to
+            use as the row labels. If None then the index of `features`
+            is used.
+
+    Returns:
+        SparseFeatures: Sparse features with categorical values
+            ['yes', 'no'] and ['male', 'female'] replaced with [1, 0].
+            The matrix has dtype int8 if all the features are binary,
+            otherwise it has dtype float64.
+    """
+
+    if index_col:
+        index = features[index_col].values
+        features = features.drop(index_col, axis='columns')
+    else:
+        index = features.index.values
+    schema = infer_categorical_schema(features, index_col=None)
+
+    rows, cols, data = [], [], []
+    for col, (column, series) in enumerate(features.items()):
+        values = series.values
+        if schema[column] != 'numeric':
+            values = _categorical_codes(series, schema[column], True)
+        nonzero = np.flatnonzero(values)
+        rows.append(nonzero)
+        cols.append(np.full(len(nonzero), col, dtype='int32'))
+        data.append(values[nonzero])
+
+    data = np.concatenate(data) if data else np.empty(0)
+    binary = np.isin(data, [0, 1]).all()
+    matrix = ss.csr_matrix(
+        (data.astype('int8' if binary else 'float64'),
+         (np.concatenate(rows) if rows else np.empty(0, dtype='int32'),
+          np.concatenate(cols) if cols else np.empty(0, dtype='int32'))),
+        shape=features.shape)
+    return SparseFeatures(matrix, index, features.columns.values)
+
+
+def binarize_list_feature(series, prefix):
+    """Binarize a list feature into a sparse features matrix.
+
+    Args:
+        series (pandas.Series): List feature. Each value is either a list
+            of categories or a string of '|' separated categories.
+        prefix (str): Prefix for the binarized feature names. Spaces in
+            the categories are replaced by underscores.
+
+    Returns:
+        SparseFeatures: Sparse binary features with dtype int8 and one
+            column per category.
+    """
+
+    lists = series.apply(
+        lambda val: val.split('|') if isinstance(val, str) and val else
+        ([] if not isinstance(val, list) else val))
+    mlb = MultiLabelBinarizer(sparse_output=True)
+    matrix = mlb.fit_transform(lists).tocsr().astype('int8')
+    columns = np.array([prefix + class_.replace(' ', '_')
+                        for class_ in mlb.classes_], dtype=object)
+    return SparseFeatures(matrix, series.index.values, columns)
+
+
+def hstack_sparse_features(sparse_features):
+    """Horizontally stack sparse features with the same rows.
+
+    Args:
+        sparse_features (list of `SparseFeatures`): Sparse features to
+            stack. They must all have the same index.
+
+    Returns:
+        SparseFeatures: Stacked sparse features.
+    """
+
+    index = sparse_features[0].index
+    for features in sparse_features[1:]:
+        if not np.array_equal(features.index, index):
+            raise ValueError('Sparse features must have the same index.')
+
+    matrix = ss.hstack([features.matrix for features in sparse_features],
+                       format='csr')
+    columns = np.concatenate(
+        [features.columns for features in sparse_features])
+    return SparseFeatures(matrix, index, columns)
+
+
+def sparse_features_to_dataframe(sparse_features):
+    """Convert sparse features to a sparse pandas dataframe.
+
+    Args:
+        sparse_features (SparseFeatures): Sparse features.
+
+    Returns:
+        pandas.DataFrame: Features dataframe backed by sparse columns.
+    """
+
+    return pd.DataFrame.sparse.from_spmatrix(
+        sparse_features.matrix, index=sparse_features.index,
+        columns=sparse_features.columns)
+
+
+def save_sparse_features(file, sparse_features):
+    """Save sparse features to a `.npz` file.
+
+    The CSR arrays and the metadata are stored uncompressed so that they
+    can be loaded without any parsing.
+
+    Args:
+        file (str or file object): File to save to. The `.npz` extension
+            is appended if not already present.
+        sparse_features (SparseFeatures): Sparse features to save.
+    """
+
+    matrix = sparse_features.matrix.tocsr()
+    np.savez(file, data=matrix.data, indices=matrix.indices,
+             indptr=matrix.indptr, shape=np.array(matrix.shape),
+             index=np.asarray(sparse_features.index).astype(str),
+             columns=np.asarray(sparse_features.columns).astype(str))
+
+
+def load_sparse_features(file):
+    """Load sparse features from a `.npz` file.
+
+    Args:
+        file (str or file object): File to load from that was
+            previously saved with `save_sparse_features`.
 
     Returns:
-        pandas.DataFrame: Features dataframe with categorical
-            values ['yes', 'no'] and ['male', 'female']
-            replaced with [1, 0].
+        SparseFeatures: Sparse features.
     """
 
-    features_numerical = features.set_index('full_name', drop=True)
-    features_numerical = features_numerical.replace(
-        to_replace={'yes': 1, 'no': 0, 'male': 1, 'female': 0})
-    return features_numerical
+    with np.load(file, allow_pickle=False) as loaded:
+        matrix = ss.csr_matrix(
+            (loaded['data'], loaded['indices'], loaded['indptr']),
+            shape=tuple(loaded['shape']))
+        index = loaded['index'].astype(object)
+        columns = loaded['columns'].astype(object)
+    return SparseFeatures(matrix, index, columns)
 
 
 def convert_target_to_numerical(target):
@@ -0,0 +1,124 @@
+import hashlib
+import os
+
+import pandas as pd
+
+from src.pipeline.instrumentation_utils import instrument
+
+
+@instrument(name='build_features', count='physicists')
+def build_features_incremental(physicists, build_func, cache_path, args=(),
+                               key='fullName', fill_value=0, columns=None):
+    """Build features incrementally, only for new or changed physicists.
+
+    Each physicist is identified by `key` plus a content hash of its row.
+    Features of physicists whose row is unchanged since the last build are
+    read from the cache and `build_func` is only called for the rest. The
+    cache is invalidated when any of `args` (e.g. the Nobel laureates,
+    places or nationalities dataframes) change. Delete `cache_path` when
+    the code of `build_func` changes.
+
+    `build_func` may drop columns that are all zeros for the physicists it
+    is called with (as the laureate counts in `build_features` do), so the
+    feature columns of the cached and the newly built physicists can differ.
+    Missing columns are filled with `fill_value`.
+
+    Args:
+        physicists (pandas.DataFrame): Physicists dataframe.
+        build_func (callable): Function with signature
+            build_func(physicists, *args) returning a features dataframe
+            with the same index as `physicists`.
+        cache_path (str): Path of the pickle file where the cache is stored.
+            The same cache can be shared by the training, validation and
+            test sets.
+        args (tuple, optional): Defaults to (). Extra arguments to pass to
+            `build_func`.
+        key (str, optional): Defaults to 'fullName'. Column that uniquely
+            identifies a physicist.
+        fill_value (optional): Defaults to 0. Value of the features in
+            columns missing for some physicists.
+        columns (list of `str`, optional): Defaults to None. If given, the
+            features are reindexed to these columns, filling missing
+            columns with `fill_value` and dropping unknown columns.
+
+    Returns:
+        pandas.DataFrame: Features dataframe with the same index as
+            `physicists`.
+
+    Raises:
+        ValueError: If `key` is not unique in `physicists`.
+    """
+
+    keys = physicists[key]
+    if not keys.is_unique:
+        raise ValueError('Column {} must be unique.'.format(key))
+
+    context = _args_digest(args)
+    cache = _read_cache(cache_path)
+    if cache is None or cache['context'] != context:
+        cache = dict(context=context, hashes={}, features=pd.DataFrame())
+
+    row_hashes = dict(zip(keys.values, _hash_rows(physicists)))
+    stale = [key_ for key_, hash_ in row_hashes.items()
+             if cache['hashes'].get(key_) != hash_]
+
+    cached_features = cache['features'].drop(stale, errors='ignore')
+    if stale:
+        mask = keys.isin(stale).values
+        built_features = build_func(physicists[mask], *args)
+        built_features.index = keys.values[mask]
+        cached_features = _concat_features(
+            [cached_features, built_features], fill_value)
+        cache['hashes'].update({key_: row_hashes[key_] for key_ in stale})
+        cache['features'] = cached_features
+        _write_cache(cache_path, cache)
+
+    features = cached_features.loc[keys.values]
+    features.index = physicists.index
+    if columns is not None:
+        features = features.reindex(columns=columns, fill_value=fill_value)
+    return features
+
+
+def _hash_rows(frame):
+    frame = frame.reindex(sorted(frame.columns), axis='columns')
+    return pd.util.hash_pandas_object(frame, index=False).values.tolist()
+
+
+def _args_digest(args):
+    digest = hashlib.sha1()
+    for arg in args:
+        if isinstance(arg, (pd.DataFrame, pd.Series)):
+            digest.update(pd.util.hash_pandas_object(arg).values.tobytes())
+            if isinstance(arg, pd.DataFrame):
+                digest.update(repr(arg.columns.tolist()).encode())
+        else:
+            digest.update(repr(arg).encode())
+    return digest.hexdigest()
+
+
+def _concat_features(frames, fill_value):
+    frames = [frame for frame in frames if len(frame.columns)]
+    columns = []
+    for frame in frames:
+        columns += [col for col in frame.columns if col not in columns]
+
+    filled = []
+    for frame in frames:
+        missing = [col for col in columns if col not in frame.columns]
+        if missing:
+            frame = frame.assign(**{col: fill_value for col in missing})
+        filled.append(frame[columns])
+    return pd.concat(filled)
+
+
+def _read_cache(cache_path):
+    if not os.path.exists(cache_path):
+        return None
+    return pd.read_pickle(cache_path)
+
+
+def _write_cache(cache_path, cache):
+    tmp_path = cache_path + '.tmp'
+    pd.to_pickle(cache, tmp_path)
+    os.replace(tmp_path, cache_path)
@@ -0,0 +1,153 @@
+import json
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as ss
+
+from src.features.features_utils import SparseFeatures
+
+
+class FeatureSchema:
+    """The column order and dtypes of the training features.
+
+    Validation, test and scoring features are aligned to the schema: columns
+    missing from them are filled with zeros and columns unknown to the schema
+    are dropped, so that they always have the columns of the training features
+    in the same order.
+
+    Args:
+        columns (list of `str`): Feature columns in order.
+        dtypes (dict, optional): Defaults to None. The keys are the columns and
+            the values are the names of their dtypes, e.g. 'int8'. If None then
+            the dtypes are not enforced.
+    """
+
+    def __init__(self, columns, dtypes=None):
+        self.columns = [str(column) for column in columns]
+        self.dtypes = dict(dtypes) if dtypes is not None else None
+
+        if len(set(self.columns)) != len(self.columns):
+            raise ValueError('The columns of a feature schema must be unique.')
+        self._index = pd.Index(self.columns)
+
+    @classmethod
+    def from_features(cls, features):
+        """Create the schema of the training features.
+
+        Args:
+            features (pandas.DataFrame or SparseFeatures): Training features.
+
+        Returns:
+            FeatureSchema: Feature schema.
+        """
+
+        if isinstance(features, SparseFeatures):
+            dtype = features.matrix.dtype.name
+            return cls(features.columns, {str(column): dtype
+                                          for column in features.columns})
+        return cls(features.columns, {str(column): dtype.name
+                                      for column, dtype in features.dtypes.items()})
+
+    def align(self, features, fill_value=0):
+        """Align features to the schema.
+
+        Args:
+            features (pandas.DataFrame or SparseFeatures): Features.
+            fill_value (optional): Defaults to 0. Value of the missing columns of a
+                dataframe. The missing columns of a sparse matrix are always zero.
+
+        Returns:
+            pandas.DataFrame or SparseFeatures: Aligned features, of the same type
+                as `features`.
+        """
+
+        if isinstance(features, SparseFeatures):
+            matrix = self.align_matrix(features.matrix, features.columns)
+            return SparseFeatures(matrix, features.index,
+                                  np.array(self.columns, dtype=object))
+        return self.align_frame(features, fill_value=fill_value)
+
+    def align_frame(self, frame, fill_value=0):
+        """Align a features dataframe to the schema.
+
+        Args:
+            frame (pandas.DataFrame): Features dataframe.
+            fill_value (optional): Defaults to 0. Value of the missing columns.
+
+        Returns:
+            pandas.DataFrame: Features dataframe with the columns of the schema.
+        """
+
+        aligned = frame.reindex(columns=self._index, fill_value=fill_value)
+        if self.dtypes:
+            changed = {column: dtype for column, dtype in self.dtypes.items()
+                       if aligned[column].dtype.name != dtype}
+            if changed:
+                aligned = aligned.astype(changed)
+        return aligned
+
+    def align_matrix(self, matrix, columns):
+        """Align a sparse features matrix to the schema.
+
+        The work done is linear in the number of stored values of the matrix:
+        the column index of every stored value is mapped to the schema with one
+        gather and the values of unknown columns are dropped.
+
+        Args:
+            matrix (scipy.sparse.spmatrix): Features matrix of shape (n_samples,
+                len(columns)).
+            columns (list of `str`): Columns of the matrix.
+
+        Returns:
+            scipy.sparse.csr_matrix: Features matrix of shape (n_samples,
+                len(self.columns)).
+
+        Raises:
+            ValueError: If the number of columns does not match the matrix.
+        """
+
+        matrix = ss.csr_matrix(matrix)
+        if matrix.shape[1] != len(columns):
+            raise ValueError('Got {} columns for a matrix with {} columns.'.format(
+                len(columns), matrix.shape[1]))
+
+        column_map = self._index.get_indexer(pd.Index(columns).astype(str))
+        new_indices = column_map[matrix.indices]
+        keep = new_indices != -1
+        num_rows = matrix.shape[0]
+        rows = np.repeat(np.arange(num_rows), np.diff(matrix.indptr))
+        indptr = np.zeros(num_rows + 1, dtype=matrix.indptr.dtype)
+        np.cumsum(np.bincount(rows[keep], minlength=num_rows), out=indptr[1:])
+
+        aligned = ss.csr_matrix(
+            (matrix.data[keep], new_indices[keep].astype(matrix.indices.dtype), indptr),
+            shape=(num_rows, len(self.columns)))
+        aligned.has_sorted_indices = False
+        aligned.sort_indices()
+        return aligned
+
+    def save(self, path):
+        """Save the schema to a JSON file.
+
+        Args:
+            path (str): Path of the JSON file.
+        """
+
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(dict(columns=self.columns, dtypes=self.dtypes), file,
+                      ensure_ascii=False, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        """Load a schema from a JSON file.
+
+        Args:
+            path (str): Path of a JSON file written by `save`.
+
+        Returns:
+            FeatureSchema: Feature schema.
+        """
+
+        with open(path, encoding='utf-8') as file:
+            saved = json.load(file)
+        return cls(saved['columns'], saved['dtypes'])
@@ -0,0 +1,187 @@
+import hashlib
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+INDEX_COLUMNS = ['key', 'data_hash', 'n_hidden', 'seed', 'max_iter', 'eps', 'tc',
+                 'has_empty_topics', 'model_file', 'model_bytes', 'last_used']
+"""list of `str`: Index columns.
+
+Columns of the CSV file indexing the topic models in a `TopicModelCache`.
+"""
+
+
+def hash_topic_model_data(X, words=None, docs=None):
+    """Hash the data a topic model is fitted to.
+
+    Args:
+        X (scipy.sparse.csr_matrix): Binary features matrix.
+        words (list of `str`, optional): Defaults to None. Feature names.
+        docs (list of `str`, optional): Defaults to None. Document names.
+
+    Returns:
+        str: Hexadecimal digest of the data.
+    """
+
+    X = X.tocsr()
+    digest = hashlib.sha1(repr(X.shape).encode())
+    for array in [X.data, X.indices, X.indptr]:
+        digest.update(np.ascontiguousarray(array).tobytes())
+    for labels in [words, docs]:
+        if labels is not None:
+            digest.update(repr(list(labels)).encode())
+    return digest.hexdigest()
+
+
+class TopicModelCache:
+    """Persistent cache of the CorEx topic models fitted in a sweep.
+
+    The total correlation and empty topics flag of every fitted topic model are
+    kept in an index CSV file. New and updated entries are appended to it, the
+    last row of a key being its current entry, so that an interrupted sweep can
+    be resumed without rewriting the index. The serialized topic models are kept
+    in separate files and the least recently used are evicted once their total
+    size exceeds `max_model_bytes`. The scores of evicted models are kept and the
+    index is rewritten with one row per key when models are evicted.
+
+    Args:
+        cache_dir (str): Directory of the cache. It is created if it does not
+            exist.
+        max_model_bytes (int, optional): Defaults to None. Maximum total size in
+            bytes of the serialized topic models. If None then no models are
+            evicted.
+    """
+
+    def __init__(self, cache_dir, max_model_bytes=None):
+        self.cache_dir = cache_dir
+        self.max_model_bytes = max_model_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._index_path = os.path.join(cache_dir, 'index.csv')
+        if os.path.exists(self._index_path):
+            index = pd.read_csv(self._index_path, keep_default_na=False,
+                                float_precision='round_trip')
+            # the entries of the keys updated after they were added are appended
+            self._index = {row['key']: row for row in index.to_dict('records')}
+        else:
+            self._index = {}
+
+    @staticmethod
+    def key(data_hash, n_hidden, seed, max_iter, eps):
+        """Create the key of a topic model.
+
+        Args:
+            data_hash (str): Hash of the data as returned by
+                `hash_topic_model_data`.
+            n_hidden (int): Number of topics.
+            seed (int): Random seed.
+            max_iter (int): Maximum number of iterations.
+            eps (float): Convergence tolerance.
+
+        Returns:
+            str: Key.
+        """
+
+        return '{}-{}-{}-{}-{!r}'.format(data_hash, n_hidden, seed, max_iter, eps)
+
+    def get(self, key):
+        """Get the score of a topic model.
+
+        Args:
+            key (str): Key of the topic model.
+
+        Returns:
+            dict or None: Index entry of the topic model with the `tc` and
+                `has_empty_topics` fields or None if it is not in the cache.
+        """
+
+        return self._index.get(key)
+
+    def load_model(self, key):
+        """Load a serialized topic model.
+
+        Args:
+            key (str): Key of the topic model.
+
+        Returns:
+            corextopic.CorEx or None: Topic model or None if it is not in the
+                cache or has been evicted.
+        """
+
+        entry = self._index.get(key)
+        if not entry or not entry['model_file']:
+            return None
+
+        with open(os.path.join(self.cache_dir, entry['model_file']), 'rb') as file:
+            model = pickle.load(file)
+        entry['last_used'] = time.time()
+        self._append_index(entry)
+        return model
+
+    def put(self, key, data_hash, n_hidden, seed, max_iter, eps, tc, has_empty_topics,
+            model_bytes=None):
+        """Add a fitted topic model to the cache.
+
+        Args:
+            key (str): Key of the topic model.
+            data_hash (str): Hash of the data.
+            n_hidden (int): Number of topics.
+            seed (int): Random seed.
+            max_iter (int): Maximum number of iterations.
+            eps (float): Convergence tolerance.
+            tc (float): Total correlation.
+            has_empty_topics (bool): Whether the topic model has empty topics.
+            model_bytes (bytes, optional): Defaults to None. Pickled topic model.
+        """
+
+        model_file = ''
+        if model_bytes is not None:
+            model_file = hashlib.sha1(key.encode()).hexdigest() + '.pkl'
+            with open(os.path.join(self.cache_dir, model_file), 'wb') as file:
+                file.write(model_bytes)
+
+        entry = self._index[key] = dict(
+            key=key, data_hash=data_hash, n_hidden=n_hidden, seed=seed,
+            max_iter=max_iter, eps=eps, tc=tc, has_empty_topics=bool(has_empty_topics),
+            model_file=model_file, model_bytes=len(model_bytes or b''),
+            last_used=time.time())
+        if self._evict():
+            self._write_index()
+        else:
+            self._append_index(entry)
+
+    def _evict(self):
+        # returns whether any model was evicted
+        if self.max_model_bytes is None:
+            return False
+
+        evicted = False
+        entries = sorted((entry for entry in self._index.values() if entry['model_file']),
+                         key=lambda entry: entry['last_used'])
+        total_bytes = sum(entry['model_bytes'] for entry in entries)
+        for entry in entries:
+            if total_bytes <= self.max_model_bytes:
+                break
+            path = os.path.join(self.cache_dir, entry['model_file'])
+            if os.path.exists(path):
+                os.remove(path)
+            total_bytes -= entry['model_bytes']
+            entry['model_file'], entry['model_bytes'] = '', 0
+            evicted = True
+        return evicted
+
+    def _append_index(self, entry):
+        index = pd.DataFrame([entry], columns=INDEX_COLUMNS)
+        write_header = not os.path.exists(self._index_path)
+        index.to_csv(self._index_path, mode='a', header=write_header, index=False,
+                     float_format='%.17g')
+
+    def _write_index(self):
+        index = pd.DataFrame(list(self._index.values()), columns=INDEX_COLUMNS)
+        tmp_path = self._index_path + '.tmp'
+        # floats are written with enough digits to be read back exactly
+        index.to_csv(tmp_path, index=False, float_format='%.17g')
+        os.replace(tmp_path, self._index_path)
@@ -0,0 +1,317 @@
+import collections
+import os
+import pickle
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as ss
+from corextopic import corextopic as ct
+
+from src.features.features_utils import CATEGORIES, SparseFeatures
+from src.features.topic_model_cache import TopicModelCache, hash_topic_model_data
+from src.pipeline.instrumentation_utils import instrument
+
+TopicModelScore = collections.namedtuple(
+    'TopicModelScore', ['n_hidden', 'seed', 'tc', 'has_empty_topics'])
+"""namedtuple: Topic model score.
+
+The total correlation (TC) of a CorEx topic model fitted with `n_hidden`
+topics and random `seed`, and whether the model has empty topics.
+"""
+
+_worker_X = {}
+
+
+@instrument(count='features')
+def find_best_topic_model(features, num_topic_models=10, num_topics_range=range(1, 11),
+                          max_iter=200, eps=1e-05, max_workers=None, patience=None,
+                          cache=None, progress_bar=None):
+    """Find the best topic model as measured by total correlation (TC).
+
+    Fits a CorEx topic model over a number of topics range. For each number of topics,
+    fits a specified number of topic models and selects the topic model with the
+    highest total correlation (TC), ignoring topic models with empty topics. Finally,
+    the topic model with the value of number of topics corresponding to the overall
+    highest TC is chosen (namely, the model that produces topics that are most
+    informative about the documents).
+
+    The (number of topics, seed) grid is fitted in a process pool that shares the
+    features matrix through a memory map. Only the scores are sent back from the
+    workers and the best topic model is refitted at the end.
+
+    If a `cache` is given, the score and serialized model of each fitted topic model
+    are saved to it as soon as they are available. Topic models already in the cache
+    are not refitted, so an interrupted search can be resumed and a search over a
+    larger range only fits the new topic models.
+
+    Args:
+        features (pandas.DataFrame or SparseFeatures): Binary features.
+        num_topic_models (int, optional): Defaults to 10. Number of topics models to
+            fit for each number of topics. The seeds of the models are 1 to
+            `num_topic_models`.
+        num_topics_range (range, optional): Defaults to range(1, 11). Range of number
+            of topics to fit models over.
+        max_iter (int, optional): Defaults to 200. Maximum number of iterations
+            before ending.
+        eps (float, optional): Defaults to 1e-05. Convergence tolerance.
+        max_workers (int, optional): Defaults to None. Number of worker processes.
+            If None then the number of processors on the machine is used.
+        patience (int, optional): Defaults to None. Stop the search once this many
+            consecutive numbers of topics have not improved on the highest TC. CorEx
+            gives no bound on the TC reachable with more topics, so this is a
+            heuristic. If None then the whole range is searched.
+        cache (TopicModelCache or str, optional): Defaults to None. Topic model
+            cache or its directory. If None then nothing is cached.
+        progress_bar (progressbar.ProgressBar, optional): Defaults to None.
+            Progress bar.
+
+    Returns:
+        corextopic.CorEx: CorEx topic model.
+
+        CorEx topic model with the highest total correlation.
+
+    Raises:
+        ValueError: If all the topic models have empty topics.
+    """
+
+    X, words, docs = _features_to_csr(features)
+    if isinstance(cache, str):
+        cache = TopicModelCache(cache)
+
+    if progress_bar:
+        progress_bar.start()
+
+    best, num_topics_done = None, 0
+    for score in iter_topic_model_scores(
+            X, num_topic_models=num_topic_models, num_topics_range=num_topics_range,
+            max_iter=max_iter, eps=eps, max_workers=max_workers, patience=patience,
+            cache=cache, words=words, docs=docs):
+        if not score.has_empty_topics and (best is None or score.tc > best.tc):
+            best = score
+        if score.seed == num_topic_models:
+            num_topics_done += 1
+            if progress_bar:
+                progress_bar.update(num_topics_done)
+
+    if progress_bar:
+        progress_bar.finish()
+
+    if best is None:
+        raise ValueError('All the topic models have empty topics.')
+
+    if cache is not None:
+        key = cache.key(hash_topic_model_data(X, words, docs), best.n_hidden,
+                        best.seed, max_iter, eps)
+        topic_model = cache.load_model(key)
+        if topic_model is not None:
+            return topic_model
+
+    topic_model = ct.Corex(n_hidden=best.n_hidden, max_iter=max_iter, eps=eps,
+                           seed=best.seed)
+    topic_model.fit(X, words=words, docs=docs)
+    return topic_model
+
+
+def iter_topic_model_scores(X, num_topic_models=10, num_topics_range=range(1, 11),
+                            max_iter=200, eps=1e-05, max_workers=None, patience=None,
+                            cache=None, words=None, docs=None):
+    """Fit CorEx topic models over a (number of topics, seed) grid in parallel.
+
+    Topic models in `cache` are not refitted and the newly fitted topic models are
+    saved to it, one at a time, so that the cache is a checkpoint of the grid.
+
+    Args:
+        X (scipy.sparse.csr_matrix): Binary features matrix.
+        num_topic_models (int, optional): Defaults to 10. Number of topics models to
+            fit for each number of topics. The seeds of the models are 1 to
+            `num_topic_models`.
+        num_topics_range (range, optional): Defaults to range(1, 11). Range of number
+            of topics to fit models over.
+        max_iter (int, optional): Defaults to 200. Maximum number of iterations
+            before ending.
+        eps (float, optional): Defaults to 1e-05. Convergence tolerance.
+        max_workers (int, optional): Defaults to None. Number of worker processes.
+            If None then the number of processors on the machine is used.
+        patience (int, optional): Defaults to None. Stop once this many consecutive
+            numbers of topics have not improved on the highest TC. The fits that have
+            not started yet are cancelled.
+        cache (TopicModelCache, optional): Defaults to None. Topic model cache. If
+            None then nothing is cached.
+        words (list of `str`, optional): Defaults to None. Feature names, used to
+            label the topics of the cached models.
+        docs (list of `str`, optional): Defaults to None. Document names, used to
+            label the documents of the cached models.
+
+    Yields:
+        TopicModelScore: Score of each topic model, in the order of the grid (by
+            number of topics and then by seed) as soon as it is available.
+    """
+
+    grid = [(n_topic, seed) for n_topic in num_topics_range
+            for seed in range(1, num_topic_models + 1)]
+    data_hash = hash_topic_model_data(X, words, docs) if cache is not None else None
+    mmap_dir = tempfile.mkdtemp(prefix='topic-models-')
+    try:
+        _dump_csr(X, mmap_dir)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = []
+            for n_topic, seed in grid:
+                key = None
+                if cache is not None:
+                    key = cache.key(data_hash, n_topic, seed, max_iter, eps)
+                    entry = cache.get(key)
+                    if entry is not None:
+                        futures.append((key, TopicModelScore(
+                            n_topic, seed, entry['tc'], entry['has_empty_topics'])))
+                        continue
+                futures.append((key, executor.submit(
+                    _fit_topic_model, mmap_dir, X.shape, n_topic, seed, max_iter, eps,
+                    words=words, docs=docs, serialize=cache is not None)))
+            try:
+                best_tc, n_topic_tc, num_not_improved = None, None, 0
+                for (n_topic, seed), (key, future) in zip(grid, futures):
+                    if isinstance(future, TopicModelScore):
+                        score = future
+                    else:
+                        score, model_bytes = future.result()
+                        if cache is not None:
+                            cache.put(key, data_hash, n_topic, seed, max_iter, eps,
+                                      score.tc, score.has_empty_topics,
+                                      model_bytes=model_bytes)
+                    yield score
+
+                    if not score.has_empty_topics and (n_topic_tc is None or
+                                                       score.tc > n_topic_tc):
+                        n_topic_tc = score.tc
+                    if seed < num_topic_models:
+                        continue
+
+                    # all models for this number of topics are done
+                    if n_topic_tc is not None and (best_tc is None or n_topic_tc > best_tc):
+                        best_tc, num_not_improved = n_topic_tc, 0
+                    else:
+                        num_not_improved += 1
+                    n_topic_tc = None
+                    if patience is not None and num_not_improved >= patience:
+                        break
+            finally:
+                # cancel the fits that have not started yet
+                for _, future in futures:
+                    if not isinstance(future, TopicModelScore):
+                        future.cancel()
+    finally:
+        shutil.rmtree(mmap_dir, ignore_errors=True)
+
+
+def project_features_to_topic_space(features, topic_model, columns=None, dtype='int8',
+                                    batch_size=None, as_strings=False):
+    """Project the binary features to the latent space spanned by the binary
+    topics of the topic model.
+
+    The topics are computed with one sparse transform per batch of rows and
+    written straight into a preallocated array, so the result is ready for the
+    models without any conversion.
+
+    Args:
+        features (pandas.DataFrame or SparseFeatures): Binary features.
+        topic_model (corextopic.CorEx): CorEx topic model.
+        columns (list of `str`, optional): Defaults to None. Topic labels to use
+            as columns for the dataframe.
+        dtype (str, optional): Defaults to 'int8'. Data type of the topics, e.g.
+            'int8' or 'bool'.
+        batch_size (int, optional): Defaults to None. Number of rows to transform
+            at a time. If None then all the rows are transformed at once.
+        as_strings (bool, optional): Defaults to False. Whether to export the
+            topics as 'yes'/'no' strings, as stored in the processed CSV files.
+
+    Returns:
+        pandas.DataFrame: Binary features dataframe containing the topics.
+    """
+
+    X, _, index = _features_to_csr(features)
+
+    X_topics = np.empty((X.shape[0], topic_model.n_hidden), dtype=dtype)
+    start = 0
+    for batch_topics in iter_topic_space_batches(X, topic_model, batch_size):
+        X_topics[start:start + len(batch_topics)] = batch_topics
+        start += len(batch_topics)
+
+    if as_strings:
+        X_topics = np.array(CATEGORIES['binary'], dtype=object)[X_topics.astype('int8')]
+    return pd.DataFrame(X_topics, index=index, columns=columns)
+
+
+def iter_topic_space_batches(X, topic_model, batch_size=None):
+    """Project batches of rows of a binary features matrix to the topic space.
+
+    Only one batch is densified at a time, so large inputs can be streamed
+    through the topic model.
+
+    Args:
+        X (scipy.sparse.csr_matrix): Binary features matrix.
+        topic_model (corextopic.CorEx): CorEx topic model.
+        batch_size (int, optional): Defaults to None. Number of rows in each
+            batch. If None then all the rows are in one batch.
+
+    Yields:
+        numpy.ndarray: Boolean topics of each batch of rows, of shape
+            (batch rows, number of topics).
+    """
+
+    X = ss.csr_matrix(X)
+    batch_size = batch_size or max(X.shape[0], 1)
+    for start in range(0, X.shape[0], batch_size):
+        yield np.asarray(topic_model.transform(X[start:start + batch_size]),
+                         dtype=bool).reshape(-1, topic_model.n_hidden)
+
+
+def has_empty_topics(model):
+    """Check whether a CorEx topic model has empty topics.
+
+    Args:
+        model (corextopic.CorEx): Fitted CorEx topic model.
+
+    Returns:
+        bool: True if the model has empty topics (an unstable model).
+    """
+
+    for n_topic in range(model.n_hidden - 1, 0, -1):
+        if not model.get_topics(topic=n_topic):
+            return True
+    return False
+
+
+def _features_to_csr(features):
+    if isinstance(features, SparseFeatures):
+        return (features.matrix.tocsr(), list(features.columns),
+                list(features.index))
+    return ss.csr_matrix(features.values), features.columns, features.index
+
+
+def _dump_csr(X, directory):
+    X = X.tocsr()
+    for name in ['data', 'indices', 'indptr']:
+        np.save(os.path.join(directory, name + '.npy'), getattr(X, name))
+
+
+def _load_csr(directory, shape):
+    arrays = [np.load(os.path.join(directory, name + '.npy'), mmap_mode='r')
+              for name in ['data', 'indices', 'indptr']]
+    return ss.csr_matrix(tuple(arrays), shape=shape, copy=False)
+
+
+def _fit_topic_model(directory, shape, n_topic, seed, max_iter, eps, words=None,
+                     docs=None, serialize=False):
+    # each worker process memory maps the features matrix once
+    if directory not in _worker_X:
+        _worker_X.clear()
+        _worker_X[directory] = _load_csr(directory, shape)
+
+    topic_model = ct.Corex(n_hidden=n_topic, max_iter=max_iter, eps=eps, seed=seed)
+    topic_model.fit(_worker_X[directory], words=words, docs=docs)
+    score = TopicModelScore(n_topic, seed, topic_model.tc, has_empty_topics(topic_model))
+    model_bytes = pickle.dumps(topic_model) if serialize else None
+    return score, model_bytes
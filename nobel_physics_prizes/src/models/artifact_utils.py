@@ -0,0 +1,159 @@
+import collections
+import json
+import struct
+
+import numpy as np
+
+ARTIFACT_MAGIC = b'NPPMODEL'
+"""bytes: Artifact magic.
+
+The first bytes of a model artifact file, identifying its format.
+"""
+
+ARTIFACT_VERSION = 1
+"""int: Artifact version.
+
+The version of the model artifact format written by `write_model_artifact`.
+"""
+
+_PREFIX = struct.Struct('<8sII')
+_ALIGNMENT = 64
+
+ModelArtifact = collections.namedtuple(
+    'ModelArtifact', ['coef', 'intercept', 'threshold', 'columns', 'metadata'])
+"""namedtuple: Model artifact.
+
+A binary logistic regression model: the `coef` array in the order of the
+feature `columns`, the `intercept`, the decision `threshold` on the
+probability of the positive class and a dict of `metadata`.
+"""
+
+
+def write_model_artifact(path, coef, intercept, columns, threshold=0.5, metadata=None,
+                         dtype='float64'):
+    """Write a binary logistic regression model to a model artifact file.
+
+    The file starts with a small JSON header holding the intercept, threshold,
+    feature columns and metadata, followed by the coefficients as raw
+    little-endian values aligned to 64 bytes, so that they can be memory-mapped.
+
+    Args:
+        path (str): Path of the artifact file.
+        coef (array-like, shape (n_features,) or (1, n_features)): Coefficients.
+        intercept (float or array-like): Intercept.
+        columns (list of `str`): Feature names in the order of the coefficients.
+        threshold (float, optional): Defaults to 0.5. Decision threshold on the
+            probability of the positive class.
+        metadata (dict, optional): Defaults to None. JSON serializable metadata,
+            e.g. the estimator parameters.
+        dtype (str, optional): Defaults to 'float64'. Data type of the
+            coefficients, 'float32' or 'float64'.
+
+    Raises:
+        ValueError: If the number of columns and coefficients differ.
+    """
+
+    coef = np.ravel(coef).astype(np.dtype(dtype).newbyteorder('<'))
+    columns = [str(column) for column in columns]
+    if len(columns) != len(coef):
+        raise ValueError('Got {} columns for {} coefficients.'.format(
+            len(columns), len(coef)))
+
+    header = json.dumps(dict(
+        dtype=coef.dtype.str, n_features=len(coef),
+        intercept=float(np.ravel(intercept)[0]), threshold=float(threshold),
+        columns=columns, metadata=metadata or {}), ensure_ascii=False).encode('utf-8')
+    header_end = _PREFIX.size + len(header)
+    padding = b' ' * (-header_end % _ALIGNMENT)
+
+    with open(path, 'wb') as file:
+        file.write(_PREFIX.pack(ARTIFACT_MAGIC, ARTIFACT_VERSION,
+                                len(header) + len(padding)))
+        file.write(header + padding)
+        file.write(coef.tobytes())
+
+
+def read_model_artifact(path, mmap=True):
+    """Read a model artifact file.
+
+    Only the header is parsed; the coefficients are memory-mapped read-only. This
+    does not import `sklearn`.
+
+    Args:
+        path (str): Path of the artifact file.
+        mmap (bool, optional): Defaults to True. Whether to memory-map the
+            coefficients instead of reading them into memory.
+
+    Returns:
+        ModelArtifact: Model artifact.
+
+    Raises:
+        ValueError: If the file is not a model artifact or its version is not
+            supported.
+    """
+
+    with open(path, 'rb') as file:
+        magic, version, header_size = _PREFIX.unpack(file.read(_PREFIX.size))
+        if magic != ARTIFACT_MAGIC:
+            raise ValueError('{} is not a model artifact.'.format(path))
+        if version > ARTIFACT_VERSION:
+            raise ValueError('Unsupported model artifact version {}.'.format(version))
+        header = json.loads(file.read(header_size).decode('utf-8'))
+
+        offset = _PREFIX.size + header_size
+        shape = (header['n_features'],)
+        if mmap:
+            coef = np.memmap(path, dtype=header['dtype'], mode='r', offset=offset,
+                             shape=shape)
+        else:
+            coef = np.fromfile(file, dtype=header['dtype'], count=shape[0])
+            coef.flags.writeable = False
+
+    return ModelArtifact(coef, header['intercept'], header['threshold'],
+                         header['columns'], header['metadata'])
+
+
+def convert_model_to_artifact(model_path, params_path, artifact_path, columns=None,
+                              dtype='float64'):
+    """Convert a persisted `sklearn` model and its parameters to a model artifact.
+
+    Converts the model and parameters saved by the model notebooks, e.g.
+    'models/LR.joblib' and 'models/LR.csv'. This requires `sklearn` and a version
+    compatible with the one the model was pickled with.
+
+    Args:
+        model_path (str): Path of the joblib file of the fitted
+            `LogisticRegression` estimator.
+        params_path (str): Path of the CSV file of the estimator parameters with
+            the estimator, params and threshold rows.
+        artifact_path (str): Path of the artifact file to write.
+        columns (list of `str`, optional): Defaults to None. Feature names in the
+            order of the coefficients. If None then the feature names stored in
+            the estimator are used.
+        dtype (str, optional): Defaults to 'float64'. Data type of the
+            coefficients.
+
+    Returns:
+        ModelArtifact: Model artifact written.
+
+    Raises:
+        ValueError: If `columns` is None and the estimator has no feature names.
+    """
+
+    import joblib
+    import pandas as pd
+
+    estimator = joblib.load(model_path)
+    if columns is None:
+        if not hasattr(estimator, 'feature_names_in_'):
+            raise ValueError('The estimator has no feature names so the columns '
+                             'must be given.')
+        columns = estimator.feature_names_in_
+
+    params = pd.read_csv(params_path, index_col=0).iloc[:, 0]
+    metadata = dict(name=params.name, estimator=params['estimator'],
+                    params=params['params'], source=model_path)
+    write_model_artifact(artifact_path, estimator.coef_, estimator.intercept_, columns,
+                         threshold=float(params['threshold']), metadata=metadata,
+                         dtype=dtype)
+    return read_model_artifact(artifact_path)
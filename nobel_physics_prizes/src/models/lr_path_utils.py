@@ -0,0 +1,159 @@
+import warnings
+
+import numpy as np
+import scipy.optimize as so
+import scipy.sparse as ss
+from scipy.special import expit
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import matthews_corrcoef
+from sklearn.utils.class_weight import compute_class_weight
+
+
+def logistic_regression_path(X, y, Cs, penalty='l2', class_weight=None,
+                             sample_weight=None, max_iter=1000, tol=1e-4,
+                             random_state=None):
+    """Fit binary logistic regression models along a regularization path.
+
+    The models are fitted in increasing order of `C`, each one warm-started from the
+    coefficients of the previous one, so the whole path costs little more than a
+    single fit. The objective is the same as `LogisticRegression` with an
+    unpenalized intercept: for the L2 penalty it is minimized with L-BFGS and for
+    the L1 penalty with the saga solver of `LogisticRegression`. Like in
+    `LogisticRegression`, the L2 objective is the log-loss averaged over the
+    sample weights plus the penalty divided by `C` times their sum, so that `tol`
+    means the same for every `C`.
+
+    Args:
+        X ({array-like, sparse matrix}, shape (n_samples, n_features)): Training
+            features matrix.
+        y (array-like, shape (n_samples,)): Binary target vector.
+        Cs (array-like, shape (n_Cs,)): Inverses of the regularization strength.
+        penalty (str, optional): Defaults to 'l2'. Norm used in the penalization,
+            'l1' or 'l2'.
+        class_weight (dict or 'balanced', optional): Defaults to None. Weights
+            associated with the classes as in `LogisticRegression`. If None then all
+            classes have weight one.
+        sample_weight (array-like, shape (n_samples,), optional): Defaults to None.
+            Array of weights that are assigned to individual samples. If not provided,
+            then each sample is given unit weight.
+        max_iter (int, optional): Defaults to 1000. Maximum number of iterations
+            for each value of `C`.
+        tol (float, optional): Defaults to 1e-4. Tolerance for stopping criteria.
+        random_state (int, RandomState instance or None, optional): Defaults to None.
+            Seed used to shuffle the data by the saga solver.
+
+    Returns:
+        tuple: Tuple containing:
+
+            coefs (numpy.ndarray, shape (n_Cs, n_features)): Coefficients for each
+                value of `C`, in the order of `Cs`.
+            intercepts (numpy.ndarray, shape (n_Cs,)): Intercepts for each value of
+                `C`, in the order of `Cs`.
+
+    Raises:
+        ValueError: If `y` does not have two classes or `penalty` is not 'l1' or
+            'l2'.
+    """
+
+    if penalty not in ['l1', 'l2']:
+        raise ValueError("Penalty must be 'l1' or 'l2', got {}.".format(penalty))
+    X = X.tocsr() if ss.issparse(X) else np.asarray(X, dtype='float64')
+    y = np.asarray(y)
+    classes = np.unique(y)
+    if len(classes) != 2:
+        raise ValueError('The target must have two classes, got {}.'.format(
+            len(classes)))
+
+    weights = _combined_weights(y, classes, class_weight, sample_weight)
+    Cs = np.asarray(Cs, dtype='float64')
+    order = np.argsort(Cs)
+
+    coefs = np.empty((len(Cs), X.shape[1]))
+    intercepts = np.empty(len(Cs))
+    if penalty == 'l2':
+        signs = np.where(y == classes[1], 1.0, -1.0)
+        weights_sum = weights.sum()
+        w = np.zeros(X.shape[1] + 1)
+        for i in order:
+            result = so.minimize(
+                _l2_loss_and_grad, w,
+                args=(X, signs, weights / weights_sum, 1.0 / (Cs[i] * weights_sum)),
+                jac=True, method='L-BFGS-B', options=dict(maxiter=max_iter, gtol=tol))
+            if not result.success:
+                warnings.warn('L-BFGS failed to converge for C={}: {}'.format(
+                    Cs[i], result.message), ConvergenceWarning)
+            w = result.x
+            coefs[i], intercepts[i] = w[:-1], w[-1]
+    else:
+        classifier = LogisticRegression(
+            penalty='l1', solver='saga', warm_start=True, max_iter=max_iter, tol=tol,
+            random_state=random_state)
+        for i in order:
+            classifier.set_params(C=Cs[i])
+            classifier.fit(X, y, sample_weight=weights)
+            coefs[i], intercepts[i] = classifier.coef_.ravel(), classifier.intercept_[0]
+    return coefs, intercepts
+
+
+def decision_function_path(coefs, intercepts, X):
+    """Compute the decision function of every model on a path at once.
+
+    Args:
+        coefs (numpy.ndarray, shape (n_Cs, n_features)): Coefficients of the models.
+        intercepts (numpy.ndarray, shape (n_Cs,)): Intercepts of the models.
+        X ({array-like, sparse matrix}, shape (n_samples, n_features)): Features
+            matrix.
+
+    Returns:
+        numpy.ndarray: Decision function of shape (n_samples, n_Cs).
+    """
+
+    if not ss.issparse(X):
+        X = np.asarray(X, dtype='float64')
+    return np.asarray(X @ coefs.T) + intercepts
+
+
+def score_path(coefs, intercepts, X, y, score_func=matthews_corrcoef):
+    """Score every model on a path with one matrix multiply.
+
+    Args:
+        coefs (numpy.ndarray, shape (n_Cs, n_features)): Coefficients of the models.
+        intercepts (numpy.ndarray, shape (n_Cs,)): Intercepts of the models.
+        X ({array-like, sparse matrix}, shape (n_samples, n_features)): Features
+            matrix.
+        y (array-like, shape (n_samples,)): Binary target vector with classes 0
+            and 1.
+        score_func (callable, optional): Defaults to matthews_corrcoef. Score function
+            with signature score_func(y, y_pred, **kwargs).
+
+    Returns:
+        numpy.ndarray: Score of each model, of shape (n_Cs,).
+    """
+
+    y_pred = (decision_function_path(coefs, intercepts, X) > 0).astype('int64')
+    with warnings.catch_warnings():  # ignore runtime warnings caused by zero MCC
+        warnings.filterwarnings('ignore', category=RuntimeWarning)
+        return np.array([score_func(y_true=y, y_pred=y_pred[:, i])
+                         for i in range(y_pred.shape[1])])
+
+
+def _combined_weights(y, classes, class_weight, sample_weight):
+    weights = (np.ones(len(y)) if sample_weight is None
+               else np.asarray(sample_weight, dtype='float64').copy())
+    if class_weight is not None:
+        class_weights = compute_class_weight(class_weight, classes=classes, y=y)
+        weights *= class_weights[np.searchsorted(classes, y)]
+    return weights
+
+
+def _l2_loss_and_grad(w, X, signs, weights, alpha):
+    # the weights are normalized to sum to one and alpha is 1 / (C * their sum)
+    coef, intercept = w[:-1], w[-1]
+    margins = signs * (X @ coef + intercept)
+    loss = weights @ np.logaddexp(0.0, -margins) + 0.5 * alpha * (coef @ coef)
+    residuals = -weights * signs * expit(-margins)
+    grad = np.empty_like(w)
+    grad[:-1] = X.T @ residuals + alpha * coef
+    grad[-1] = residuals.sum()
+    return loss, grad
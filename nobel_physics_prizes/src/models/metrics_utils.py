@@ -168,3 +168,26 @@ def mcc_auc_score(y_true, y_score, sample_weight=None, probability=True, normali
         assert(0.0 <= mcc_auc <= 1.0)
 
     return mcc_auc
+
+
+def max_mcc_threshold(y_true, y_score, sample_weight=None, probability=True):
+    """Find the classification threshold with the maximum Matthews correlation coefficient (MCC).
+
+    This is the threshold marked on the MCC curve by `plot_mcc_tpr_tnr` in the model training
+    notebook.
+
+    Args:
+        y_true (array, shape = [n_samples]): True binary labels.
+        y_score (array, shape = [n_samples]): Target scores, can either be probability estimates of the
+            positive class, confidence values, or non-thresholded measure of decisions.
+        sample_weight (array-like of shape = [n_samples], optional): Defaults to None. Sample weights.
+        probability (bool, optional): Defaults to True. Whether `y_score` are probability estimates of the
+            positive class.
+
+    Returns:
+        float: Threshold corresponding to maximum MCC.
+    """
+
+    mcc, _, _, thresholds = mcc_curve(
+        y_true, np.asarray(y_score), sample_weight=sample_weight, probability=probability)
+    return thresholds[np.argmax(mcc)]
@@ -0,0 +1,290 @@
+import copy
+import hashlib
+import operator
+import os
+import pickle
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as ss
+from sklearn.base import clone
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import matthews_corrcoef
+from sklearn.model_selection import ParameterGrid
+
+from src.pipeline.instrumentation_utils import instrument
+
+DETERMINISTIC_SOLVERS = ('lbfgs', 'newton-cg', 'newton-cholesky')
+"""tuple of `str`: Deterministic solvers.
+
+The `LogisticRegression` solvers that do not use the random state. The
+liblinear, sag and saga solvers shuffle the data.
+"""
+
+
+@instrument(count='X_train')
+def evaluate_classifier(
+        X_train, y_train, X_validation, y_validation, clf=None, param_grid=None,
+        score_func=matthews_corrcoef, greater_score_is_better=True, solver='lbfgs',
+        sample_weight=None, max_iter=1000, random_state=None, n_jobs=None,
+        name='classifier', max_workers=None, cache_dir=None, progress_bar=None):
+    """Evaluate an `sklearn` classifier over a parameter grid using a scoring function.
+
+    The parameter grid is fitted in a process pool. For `LogisticRegression`, the
+    parameter sets that only differ in `C` form a regularization path that is fitted
+    in one task in increasing order of `C`, each fit warm-started from the previous
+    coefficients. The liblinear solver does not support warm starts, so with it the
+    path is fitted cold.
+
+    If `cache_dir` is given, the training score, validation score and fitted
+    classifier of each parameter set are saved there, keyed by a hash of the data,
+    the classifier and the parameters. Parameter sets already in the cache are not
+    refitted, so re-running an evaluation, e.g. with a larger grid, only fits the
+    new parameter sets. The cache is per seed: the `random_state` is part of the
+    key, except for the `LogisticRegression` solvers in `DETERMINISTIC_SOLVERS`,
+    whose fits are shared by evaluations with different seeds.
+
+    Args:
+        X_train ({array-like, sparse matrix}, shape (n_samples, n_features)): Training
+            features matrix, where n_samples is the number of samples and n_features
+            is the number of features.
+        y_train (array-like, shape (n_samples,)): Training data target vector.
+        X_validation ({array-like, sparse matrix}, shape (n_samples, n_features)):
+            Validation features matrix, where n_samples is the number of samples and
+            n_features is the number of features.
+        y_validation (array-like, shape (n_samples,)): Validation data target vector.
+        clf (sklearn.base.BaseEstimator, optional): Defaults to None. Classifier. If
+            None then `LogisticRegression()` is used.
+        param_grid (iterable of `dict`, optional): Defaults to None. Grid of
+            parameters with a discrete number of values for each, e.g. a
+            `ParameterGrid` or `ParameterSampler`. If None then
+            ParameterGrid(dict(C=np.logspace(-5, 15, 21, base=2.0))) is used.
+        score_func (callable, optional): Defaults to matthews_corrcoef. Score function
+            (or loss function) with signature score_func(y, y_pred, **kwargs). It
+            must be picklable.
+        greater_score_is_better (bool, optional): Defaults to True. Whether score_func
+            is a score function (default), meaning high is good, or a loss function,
+            meaning low is good.
+        solver (str, optional): Defaults to 'lbfgs'. Algorithm to use in the
+            optimization problem.
+        sample_weight (array-like, shape (n_samples,), optional): Defaults to None.
+            Array of weights that are assigned to individual samples. If not provided,
+            then each sample is given unit weight.
+        max_iter (int, optional): Defaults to 1000. Maximum number of iterations
+            taken for the solvers to converge.
+        random_state (int, RandomState instance or None, optional): Defaults to None.
+            The seed of the pseudo random number generator to use when shuffling the
+            data.
+        n_jobs (int or None, optional): Defaults to None. Number of CPU cores used by
+            the classifier when parallelizing.
+        name (str, optional): Defaults to 'classifier'. Name of classifier.
+        max_workers (int, optional): Defaults to None. Number of worker processes.
+            If None then the number of processors on the machine is used.
+        cache_dir (str, optional): Defaults to None. Directory of the cache. It is
+            created if it does not exist. If None then nothing is cached.
+        progress_bar (progressbar.ProgressBar, optional): Defaults to None. Progress
+            bar.
+
+    Returns:
+        dict: Results containing the name, best classifier estimator, best parameters,
+            best score, training scores, and validation scores.
+    """
+
+    if clf is None:
+        clf = LogisticRegression()
+    if param_grid is None:
+        param_grid = ParameterGrid(dict(C=np.logspace(-5, 15, 21, base=2.0)))
+    param_grid = list(param_grid)
+
+    # the settings are only set on the classifiers that have them
+    settings = dict(solver=solver, max_iter=max_iter, random_state=random_state,
+                    n_jobs=n_jobs)
+    settings = {key: value for key, value in settings.items()
+                if key in clf.get_params()}
+    warm_start = isinstance(clf, LogisticRegression)
+
+    if progress_bar:
+        progress_bar.start()
+
+    evaluations = {}
+    digest = None
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        digest = _evaluation_digest(X_train, y_train, X_validation, y_validation,
+                                    sample_weight, clf, settings, score_func)
+        for params in param_grid:
+            evaluation = _read_evaluation(cache_dir, digest, params)
+            if evaluation is not None:
+                # the classifier may have been fitted with another seed
+                if 'random_state' in settings:
+                    evaluation[2].set_params(random_state=random_state)
+                evaluations[str(params)] = evaluation
+
+    num_iters = len(evaluations)
+    if progress_bar:
+        progress_bar.update(num_iters)
+
+    paths = _group_by_path(
+        [params for params in param_grid if str(params) not in evaluations], warm_start)
+    if paths:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(
+                _fit_path, clf, settings, path, X_train, y_train, X_validation,
+                y_validation, sample_weight, score_func, warm_start)
+                for path in paths]
+            for path, future in zip(paths, futures):
+                for params, evaluation in zip(path, future.result()):
+                    evaluations[str(params)] = evaluation
+                    if cache_dir:
+                        _write_evaluation(cache_dir, digest, params, evaluation)
+                    num_iters += 1
+                    if progress_bar:
+                        progress_bar.update(num_iters)
+
+    if progress_bar:
+        progress_bar.finish()
+
+    # results are kept in the order of the grid
+    train_scores, validation_scores, classifiers = {}, {}, {}
+    for params in param_grid:
+        train_score, validation_score, classifier = evaluations[str(params)]
+        train_scores[str(params)] = train_score
+        validation_scores[str(params)] = validation_score
+        classifiers[str(params)] = classifier
+
+    # find the best scoring model
+    sorted_validation_scores = sorted(
+        validation_scores.items(), key=operator.itemgetter(1),
+        reverse=greater_score_is_better)
+    best_params_key, best_score = sorted_validation_scores[0]
+    best_params = param_grid[[str(params) for params in param_grid].index(
+        best_params_key)]
+    best_classifier = classifiers[best_params_key]
+
+    # warn about LogisticRegression classifiers with infeasibly large or small
+    # coefficients (corresponds to odds lower than p = 0.001 or larger than p = 0.999)
+    if isinstance(best_classifier, LogisticRegression):
+        max_odds_ratio = np.max(np.exp(best_classifier.coef_.ravel()))
+        if max_odds_ratio > 0.999 / (1.0 - 0.999):
+            warnings.warn('The best classifier Logistic regression coefficients are '
+                          'infeasibly large. The maximum odds ratio is {}-1.'.format(
+                              max_odds_ratio))
+
+    results = dict(name=name, best_classifier=best_classifier, best_params=best_params,
+                   best_score=best_score, train_scores=train_scores,
+                   validation_scores=validation_scores)
+    return results
+
+
+def print_best_classifier(results):
+    """Print the best classifier.
+
+    Args:
+        results (dict): Results of classifier evaluation.
+    """
+
+    print(results['name'])
+    print('Best params: ', results['best_params'])
+    print('Training score: ',
+          round(results['train_scores'][str(results['best_params'])], 3))
+    print('Validation score: ', round(results['best_score'], 3))
+
+
+def _group_by_path(param_grid, warm_start):
+    if not warm_start:
+        return [[params] for params in param_grid]
+
+    paths = {}
+    for params in param_grid:
+        path_key = str(sorted((key, str(value)) for key, value in params.items()
+                              if key != 'C'))
+        paths.setdefault(path_key, []).append(params)
+    return [sorted(path, key=lambda params: params.get('C', 1.0))
+            for path in paths.values()]
+
+
+def _fit_path(clf, settings, path, X_train, y_train, X_validation, y_validation,
+              sample_weight, score_func, warm_start):
+    evaluations = []
+    classifier = None
+    for params in path:
+        if classifier is None or not warm_start:
+            classifier = clone(clf).set_params(**settings)
+            if warm_start:
+                classifier.set_params(warm_start=True)
+        classifier.set_params(**params)
+        classifier.fit(X_train, y_train, sample_weight=sample_weight)
+
+        y_train_predict = classifier.predict(X_train)
+        y_validation_predict = classifier.predict(X_validation)
+        with warnings.catch_warnings():  # ignore runtime warnings caused by zero MCC
+            warnings.filterwarnings('ignore', category=RuntimeWarning)
+            train_score = score_func(y_true=y_train, y_pred=y_train_predict)
+            validation_score = score_func(y_true=y_validation,
+                                          y_pred=y_validation_predict)
+
+        fitted_classifier = copy.deepcopy(classifier)
+        if warm_start:
+            fitted_classifier.set_params(warm_start=clf.get_params()['warm_start'])
+        evaluations.append((train_score, validation_score, fitted_classifier))
+    return evaluations
+
+
+def _evaluation_digest(X_train, y_train, X_validation, y_validation, sample_weight,
+                       clf, settings, score_func):
+    digest = hashlib.sha1()
+    for data in [X_train, y_train, X_validation, y_validation, sample_weight]:
+        digest.update(_data_digest(data).encode())
+    clf_params = dict(clf.get_params(), **settings)
+    if (isinstance(clf, LogisticRegression) and
+            clf_params.get('solver') in DETERMINISTIC_SOLVERS):
+        del clf_params['random_state']
+    digest.update(type(clf).__name__.encode())
+    digest.update(repr(sorted(clf_params.items())).encode())
+    digest.update('{}.{}'.format(score_func.__module__,
+                                 score_func.__name__).encode())
+    return digest.hexdigest()
+
+
+def _data_digest(data):
+    digest = hashlib.sha1()
+    if data is None:
+        return digest.hexdigest()
+    if ss.issparse(data):
+        data = data.tocsr()
+        digest.update(repr(data.shape).encode())
+        arrays = [data.data, data.indices, data.indptr]
+    else:
+        if isinstance(data, (pd.DataFrame, pd.Series)):
+            data = data.values
+        data = np.asarray(data)
+        digest.update(repr((data.shape, data.dtype.str)).encode())
+        if data.dtype == object:
+            data = np.array(repr(data.tolist()))
+        arrays = [data]
+    for array in arrays:
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def _evaluation_path(cache_dir, digest, params):
+    key = hashlib.sha1('{}-{}'.format(digest, params).encode()).hexdigest()
+    return os.path.join(cache_dir, key + '.pkl')
+
+
+def _read_evaluation(cache_dir, digest, params):
+    path = _evaluation_path(cache_dir, digest, params)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as file:
+        return pickle.load(file)
+
+
+def _write_evaluation(cache_dir, digest, params, evaluation):
+    path = _evaluation_path(cache_dir, digest, params)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as file:
+        pickle.dump(evaluation, file)
+    os.replace(tmp_path, path)
@@ -0,0 +1,375 @@
+import collections
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from src.models.artifact_utils import read_model_artifact
+
+Score = collections.namedtuple('Score', ['probability', 'label'])
+"""namedtuple: Score.
+
+The probability of the positive class (e.g. winning a Nobel Prize) of a row of
+features and its label, 1 if the probability is above the decision threshold
+and 0 otherwise.
+"""
+
+_STOP = object()
+
+
+class BatchScorer:
+    """Score rows of features with a binary logistic regression model.
+
+    The coefficients are kept in a read-only contiguous array so that a batch of
+    rows, dense or sparse, is scored with one matrix-vector product. Scoring does
+    not modify the scorer, so it can be shared by threads.
+
+    Single rows can also be submitted to a micro-batching queue. A background
+    thread collects the rows submitted within `max_delay` seconds, up to
+    `max_batch_size` rows, and scores them together.
+
+    Args:
+        coef (array-like, shape (n_features,) or (1, n_features)): Coefficients.
+        intercept (float or array-like, optional): Defaults to 0.0. Intercept.
+        threshold (float, optional): Defaults to 0.5. Decision threshold on the
+            probability of the positive class, e.g. the maximum MCC threshold.
+        columns (list of `str`, optional): Defaults to None. Feature names in the
+            order of the coefficients. If given then dataframes are reordered to
+            these columns before scoring.
+        dtype (str, optional): Defaults to 'float64'. Data type of the
+            coefficients, 'float32' or 'float64'.
+        max_batch_size (int, optional): Defaults to 256. Maximum number of rows
+            scored together by the queue.
+        max_delay (float, optional): Defaults to 0.002. Maximum time in seconds a
+            submitted row waits for other rows to be batched with.
+    """
+
+    def __init__(self, coef, intercept=0.0, threshold=0.5, columns=None,
+                 dtype='float64', max_batch_size=256, max_delay=0.002):
+        self.coef = np.ascontiguousarray(np.ravel(coef), dtype=dtype)
+        self.coef.flags.writeable = False
+        self.intercept = float(np.ravel(intercept)[0])
+        self.threshold = threshold
+        self.columns = list(columns) if columns is not None else None
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+
+        if self.columns is not None and len(self.columns) != len(self.coef):
+            raise ValueError('Got {} columns for {} coefficients.'.format(
+                len(self.columns), len(self.coef)))
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_estimator(cls, estimator, threshold=0.5, columns=None, **kwargs):
+        """Create a scorer from a fitted `LogisticRegression` estimator.
+
+        Args:
+            estimator (sklearn.linear_model.LogisticRegression): Fitted binary
+                logistic regression estimator.
+            threshold (float, optional): Defaults to 0.5. Decision threshold.
+            columns (list of `str`, optional): Defaults to None. Feature names in
+                the order of the coefficients.
+            **kwargs: Other arguments of `BatchScorer`.
+
+        Returns:
+            BatchScorer: Scorer.
+        """
+
+        return cls(estimator.coef_, estimator.intercept_, threshold=threshold,
+                   columns=columns, **kwargs)
+
+    @classmethod
+    def load(cls, model_path, params_path=None, columns=None, **kwargs):
+        """Load a scorer from a persisted model and its parameters.
+
+        Args:
+            model_path (str): Path of the joblib file of the fitted estimator, e.g.
+                'models/LR.joblib'.
+            params_path (str, optional): Defaults to None. Path of the CSV file of
+                the estimator parameters, e.g. 'models/LR.csv'. The decision
+                threshold is read from it. If None then the threshold is 0.5.
+            columns (list of `str`, optional): Defaults to None. Feature names in
+                the order of the coefficients.
+            **kwargs: Other arguments of `BatchScorer`.
+
+        Returns:
+            BatchScorer: Scorer.
+        """
+
+        import joblib
+        import pandas as pd
+
+        estimator = joblib.load(model_path)
+        threshold = 0.5
+        if params_path:
+            params = pd.read_csv(params_path, index_col=0).iloc[:, 0]
+            threshold = float(params['threshold'])
+        return cls.from_estimator(estimator, threshold=threshold, columns=columns,
+                                  **kwargs)
+
+    @classmethod
+    def from_artifact(cls, path, **kwargs):
+        """Load a scorer from a model artifact file.
+
+        The coefficients are memory-mapped and `sklearn` is not imported, so this
+        is the fastest way for a worker to start scoring.
+
+        Args:
+            path (str): Path of the artifact file written by
+                `write_model_artifact`.
+            **kwargs: Other arguments of `BatchScorer`.
+
+        Returns:
+            BatchScorer: Scorer.
+        """
+
+        artifact = read_model_artifact(path)
+        kwargs.setdefault('dtype', artifact.coef.dtype)
+        return cls(artifact.coef, artifact.intercept, threshold=artifact.threshold,
+                   columns=artifact.columns, **kwargs)
+
+    def decision_function(self, X):
+        """Compute the log odds of the positive class.
+
+        Args:
+            X ({array-like, sparse matrix, pandas.DataFrame}, shape (n_samples,
+                n_features)): Features matrix. A single row may also be given as a
+                1-d array or a `pandas.Series`.
+
+        Returns:
+            numpy.ndarray: Log odds of shape (n_samples,).
+        """
+
+        return np.asarray(self._to_matrix(X).dot(self.coef)).ravel() + self.intercept
+
+    def predict_proba(self, X):
+        """Compute the probability of the positive class.
+
+        Unlike `sklearn`, only the probabilities of the positive class are
+        returned.
+
+        Args:
+            X ({array-like, sparse matrix, pandas.DataFrame}, shape (n_samples,
+                n_features)): Features matrix.
+
+        Returns:
+            numpy.ndarray: Probabilities of shape (n_samples,).
+        """
+
+        return np.exp(-np.logaddexp(0.0, -self.decision_function(X)))
+
+    def predict(self, X):
+        """Predict the labels using the decision threshold.
+
+        Args:
+            X ({array-like, sparse matrix, pandas.DataFrame}, shape (n_samples,
+                n_features)): Features matrix.
+
+        Returns:
+            numpy.ndarray: Labels of shape (n_samples,) with dtype int64.
+        """
+
+        return (self.predict_proba(X) > self.threshold).astype('int64')
+
+    def submit(self, row):
+        """Submit a row of features to the micro-batching queue.
+
+        Args:
+            row ({array-like, sparse matrix, pandas.Series}): Row of features.
+
+        Returns:
+            concurrent.futures.Future: Future of the `Score` of the row.
+        """
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            future = Future()
+            self._queue.put((row, future))
+        return future
+
+    def close(self):
+        """Score the rows left in the queue and stop the background thread."""
+
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(_STOP)
+            thread, self._thread = self._thread, None
+        thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _to_matrix(self, X):
+        if _is_pandas(X):
+            if self.columns is not None:
+                is_row = X.ndim == 1
+                labels = X.index if is_row else X.columns
+                missing = [column for column in self.columns if column not in labels]
+                if missing:
+                    raise ValueError('Missing feature columns: {}'.format(missing))
+                X = X[self.columns] if is_row else X.loc[:, self.columns]
+            X = X.values
+
+        if _is_sparse(X):
+            X = X.tocsr()
+        else:
+            X = np.asarray(X, dtype=self.coef.dtype)
+            if X.ndim == 1:
+                X = X.reshape(1, -1)
+        if X.shape[1] != len(self.coef):
+            raise ValueError('Expected {} features, got {}.'.format(
+                len(self.coef), X.shape[1]))
+        return X
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._score_batch(batch)
+
+        # score the rows submitted before the scorer was closed
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                batch.append(item)
+        if batch:
+            self._score_batch(batch)
+
+    def _score_batch(self, batch):
+        futures = [future for _, future in batch]
+        try:
+            rows = [self._to_matrix(row) for row, _ in batch]
+            if any(_is_sparse(row) for row in rows):
+                import scipy.sparse as ss
+                X = ss.vstack(rows, format='csr')
+            else:
+                X = np.vstack(rows)
+            probabilities = self.predict_proba(X)
+        except Exception as error:
+            for future in futures:
+                future.set_exception(error)
+            return
+
+        labels = probabilities > self.threshold
+        for future, probability, label in zip(futures, probabilities, labels):
+            future.set_result(Score(float(probability), int(label)))
+
+
+def benchmark_batch_scorer(scorer, X, batch_sizes=(1, 16, 256, 4096),
+                           num_repeats=100, num_requests=1000, num_threads=4):
+    """Benchmark the throughput and latency of a scorer.
+
+    Batches of each size are scored directly with `predict_proba`. Single rows
+    are also submitted to the micro-batching queue by `num_threads` threads, each
+    waiting for the score of a row before submitting the next one.
+
+    Args:
+        scorer (BatchScorer): Scorer.
+        X ({array-like, sparse matrix}, shape (n_samples, n_features)): Features
+            matrix. Its rows are repeated to fill the batches.
+        batch_sizes (tuple of `int`, optional): Defaults to (1, 16, 256, 4096). Batch
+            sizes to score directly.
+        num_repeats (int, optional): Defaults to 100. Number of batches scored for
+            each batch size.
+        num_requests (int, optional): Defaults to 1000. Number of rows submitted to
+            the queue.
+        num_threads (int, optional): Defaults to 4. Number of threads submitting
+            rows to the queue.
+
+    Returns:
+        pandas.DataFrame: Mode ('batch' or 'queue'), batch size, throughput in rows
+            per second and median and 99th percentile latency in milliseconds.
+    """
+
+    import pandas as pd
+
+    X = X.tocsr() if _is_sparse(X) else np.asarray(X)
+    num_rows = X.shape[0]
+
+    results = []
+    for batch_size in batch_sizes:
+        batch = X[np.arange(batch_size) % num_rows]
+        latencies = []
+        for _ in range(num_repeats):
+            start = time.perf_counter()
+            scorer.predict_proba(batch)
+            latencies.append(time.perf_counter() - start)
+        results.append(_benchmark_result('batch', batch_size, batch_size * num_repeats,
+                                         sum(latencies), latencies))
+
+    latencies = []
+    latencies_lock = threading.Lock()
+
+    def submit_rows(indices):
+        thread_latencies = []
+        for index in indices:
+            start = time.perf_counter()
+            scorer.submit(X[index % num_rows]).result()
+            thread_latencies.append(time.perf_counter() - start)
+        with latencies_lock:
+            latencies.extend(thread_latencies)
+
+    threads = [threading.Thread(target=submit_rows,
+                                args=(range(i, num_requests, num_threads),))
+               for i in range(num_threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    results.append(_benchmark_result('queue', scorer.max_batch_size, num_requests,
+                                     elapsed, latencies))
+
+    return pd.DataFrame(results, columns=['mode', 'batch_size', 'rows_per_second',
+                                          'latency_p50_ms', 'latency_p99_ms'])
+
+
+def _benchmark_result(mode, batch_size, num_rows, elapsed, latencies):
+    latencies_ms = 1000 * np.array(latencies)
+    return (mode, batch_size, num_rows / elapsed, np.percentile(latencies_ms, 50),
+            np.percentile(latencies_ms, 99))
+
+
+def _is_pandas(X):
+    # pandas is not imported by this module so that a scoring worker starts fast,
+    # and X cannot be a pandas object if pandas has not been imported
+    pd = sys.modules.get('pandas')
+    return pd is not None and isinstance(X, (pd.DataFrame, pd.Series))
+
+
+def _is_sparse(X):
+    ss = sys.modules.get('scipy.sparse')
+    return ss is not None and ss.issparse(X)
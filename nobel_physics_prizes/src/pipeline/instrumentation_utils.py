@@ -0,0 +1,289 @@
+import contextlib
+import datetime
+import functools
+import inspect
+import json
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+TRACE_METRICS = ['wall_time', 'cpu_time', 'peak_rss_mb', 'peak_rss_growth_mb',
+                 'allocated_mb', 'items']
+"""list of `str`: Trace metrics.
+
+The metrics recorded for each span of a trace. `cpu_time` is the CPU time of
+the whole process, so it includes the time of other threads and excludes
+the time of child processes. `peak_rss_mb` is the peak resident set size of
+the process so far, a high-water mark over its lifetime rather than the
+memory used by the span, and `peak_rss_growth_mb` is how much the span raised
+it, which is 0 unless the span reached a new peak. `allocated_mb` is the
+memory allocated by Python during the span and is only recorded when
+allocations are traced.
+"""
+
+_active_tracer = None
+
+
+class Tracer:
+    """Record the spans of the pipeline stages.
+
+    A span is one call of an instrumented function or one `span` block. Spans
+    can be recorded from several threads and nested spans record the name of
+    their parent.
+
+    Args:
+        trace_allocations (bool, optional): Defaults to False. Whether to trace
+            the memory allocated by Python with `tracemalloc`. This slows down
+            the code considerably.
+    """
+
+    def __init__(self, trace_allocations=False):
+        self.trace_allocations = trace_allocations
+        self.spans = []
+        self.created = datetime.datetime.now().isoformat()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def span(self, name, items=None):
+        """Record a span.
+
+        Args:
+            name (str): Name of the span, e.g. the name of the stage.
+            items (int, optional): Defaults to None. Number of items processed.
+                It can also be set on the yielded dict.
+
+        Yields:
+            dict: The span record. Set its 'items' key to record the number of
+                items processed.
+        """
+
+        stack = self._stack()
+        record = dict(name=name, parent=stack[-1]['name'] if stack else None,
+                      thread=threading.current_thread().name, items=items, error=None)
+        stack.append(record)
+
+        start_rss = _peak_rss_mb()
+        start_allocated = (tracemalloc.get_traced_memory()[0]
+                           if tracemalloc.is_tracing() else None)
+        start_cpu = time.process_time()
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException as error:
+            record['error'] = repr(error)
+            raise
+        finally:
+            record['start'] = start - self._start
+            record['wall_time'] = time.perf_counter() - start
+            record['cpu_time'] = time.process_time() - start_cpu
+            record['peak_rss_mb'] = _peak_rss_mb()
+            if start_rss is not None:
+                record['peak_rss_growth_mb'] = record['peak_rss_mb'] - start_rss
+            if start_allocated is not None and tracemalloc.is_tracing():
+                record['allocated_mb'] = (
+                    tracemalloc.get_traced_memory()[0] - start_allocated) / 2 ** 20
+            stack.pop()
+            with self._lock:
+                self.spans.append(record)
+
+    def to_dict(self):
+        """Convert the trace to a JSON serializable dict.
+
+        Returns:
+            dict: Trace with the spans in the order they finished.
+        """
+
+        with self._lock:
+            spans = list(self.spans)
+        return dict(created=self.created, python=sys.version.split()[0],
+                    argv=sys.argv, trace_allocations=self.trace_allocations,
+                    spans=spans)
+
+    def save(self, path):
+        """Save the trace to a JSON file.
+
+        Args:
+            path (str): Path of the JSON file.
+        """
+
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(), file, indent=1)
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+
+@contextlib.contextmanager
+def tracing(path=None, trace_allocations=False):
+    """Activate a tracer for the instrumented functions and `span` blocks.
+
+    Args:
+        path (str, optional): Defaults to None. Path of the JSON file to save the
+            trace to when the block exits. If None then the trace is not saved.
+        trace_allocations (bool, optional): Defaults to False. Whether to trace
+            the memory allocated by Python.
+
+    Yields:
+        Tracer: The active tracer.
+    """
+
+    global _active_tracer
+
+    tracer = Tracer(trace_allocations=trace_allocations)
+    previous_tracer, _active_tracer = _active_tracer, tracer
+    started_tracemalloc = trace_allocations and not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start()
+    try:
+        yield tracer
+    finally:
+        _active_tracer = previous_tracer
+        if started_tracemalloc:
+            tracemalloc.stop()
+        if path:
+            tracer.save(path)
+
+
+@contextlib.contextmanager
+def span(name, items=None):
+    """Record a span with the active tracer.
+
+    Nothing is recorded if no tracer is active.
+
+    Args:
+        name (str): Name of the span, e.g. 'build_features'.
+        items (int, optional): Defaults to None. Number of items processed.
+
+    Yields:
+        dict: The span record, or a dict that is discarded if no tracer is
+            active.
+    """
+
+    tracer = _active_tracer
+    if tracer is None:
+        yield dict(name=name, items=items)
+        return
+    with tracer.span(name, items=items) as record:
+        yield record
+
+
+def instrument(name=None, count=None):
+    """Decorate a function so that each of its calls is recorded as a span.
+
+    When no tracer is active the function is called directly, so the overhead
+    of an instrumented function is negligible.
+
+    Args:
+        name (str, optional): Defaults to None. Name of the span. If None then
+            the qualified name of the function is used.
+        count (callable or str, optional): Defaults to None. Function with
+            signature count(result) returning the number of items processed, or
+            the name of the argument whose length is the number of items
+            processed, e.g. 'X'. If None then the length of the result is used,
+            if it has one.
+
+    Returns:
+        callable: Decorator.
+    """
+
+    def decorator(func):
+        span_name = name or func.__qualname__
+        signature = inspect.signature(func) if isinstance(count, str) else None
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            tracer = _active_tracer
+            if tracer is None:
+                return func(*args, **kwargs)
+            with tracer.span(span_name) as record:
+                if signature is not None:
+                    argument = signature.bind(*args, **kwargs).arguments.get(count)
+                    record['items'] = _length(argument)
+                result = func(*args, **kwargs)
+                if signature is None:
+                    record['items'] = (count(result) if count is not None
+                                       else _length(result))
+            return result
+        return wrapper
+    return decorator
+
+
+def read_trace(path):
+    """Read the spans of a JSON trace.
+
+    Args:
+        path (str): Path of a JSON file written by `Tracer.save`.
+
+    Returns:
+        pandas.DataFrame: Spans, one per row.
+    """
+
+    # pandas is only imported to read traces, so that instrumented modules do
+    # not import it
+    import pandas as pd
+
+    with open(path, encoding='utf-8') as file:
+        trace = json.load(file)
+    return pd.DataFrame(trace['spans'])
+
+
+def compare_traces(baseline_path, path, metric='wall_time', tolerance=0.2):
+    """Compare a trace with a baseline trace to find regressions.
+
+    The metric is summed over the spans of each name.
+
+    Args:
+        baseline_path (str): Path of the baseline JSON trace.
+        path (str): Path of the JSON trace to compare.
+        metric (str, optional): Defaults to 'wall_time'. Metric to compare, one of
+            `TRACE_METRICS`.
+        tolerance (float, optional): Defaults to 0.2. Relative increase of the
+            metric above which a span is flagged as a regression.
+
+    Returns:
+        pandas.DataFrame: The baseline and current metric, their ratio and
+            whether it is a regression, indexed by span name and sorted by ratio.
+    """
+
+    import pandas as pd
+
+    totals = []
+    for trace_path in [baseline_path, path]:
+        spans = read_trace(trace_path)
+        if metric not in spans:
+            spans[metric] = float('nan')
+        totals.append(spans.groupby('name')[metric].sum(min_count=1))
+
+    comparison = pd.DataFrame(dict(baseline=totals[0], current=totals[1]))
+    comparison['ratio'] = comparison.current / comparison.baseline
+    comparison['regression'] = comparison.ratio > 1.0 + tolerance
+    return comparison.sort_values('ratio', ascending=False)
+
+
+def _length(value):
+    value = getattr(value, 'matrix', value)  # SparseFeatures
+    if hasattr(value, 'shape'):
+        return int(value.shape[0])
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+
+def _peak_rss_mb():
+    # high-water mark of the process lifetime, not of the current span
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak_rss / 2 ** 20 if sys.platform == 'darwin' else peak_rss / 2 ** 10
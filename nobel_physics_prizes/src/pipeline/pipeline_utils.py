@@ -0,0 +1,325 @@
+import collections
+import functools
+import hashlib
+import json
+import os
+import subprocess
+import threading
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+Stage = collections.namedtuple('Stage', ['name', 'func', 'inputs', 'outputs', 'sources'])
+"""namedtuple: Pipeline stage.
+
+A stage `name`, the `func` called without arguments to run it, the paths of
+the files it reads (`inputs`) and writes (`outputs`) and the paths of its
+`sources`, e.g. the notebook it executes. The stage is rerun when the content
+of any of its inputs or sources changes.
+"""
+
+NOTEBOOK_STAGES = [
+    ('0.0-introduction', [], []),
+    ('1.0-collect-nobel-prize-laureates', [],
+     ['data/raw/nobel-physics-prize-laureates.csv',
+      'data/raw/nobel-chemistry-prize-laureates.csv']),
+    ('1.1-collect-physicists', ['data/raw/nobel-physics-prize-laureates.csv'],
+     ['data/raw/physicists.txt']),
+    ('1.2-collect-physicists-raw-data', ['data/raw/physicists.txt'],
+     ['data/raw/physicists.jsonl.gz']),
+    ('2.0-process-physicists-raw-data', ['data/raw/physicists.jsonl.gz'],
+     ['data/interim/physicists.csv']),
+    ('2.1-train-val-test-split', ['data/interim/physicists.csv'],
+     ['data/processed/train-physicists-from-1901.csv',
+      'data/processed/validation-physicists-from-1901.csv',
+      'data/processed/test-physicists-from-1901.csv']),
+    ('2.2-collect-places-raw-data', ['data/interim/physicists.csv'],
+     ['data/raw/places.jsonl.gz']),
+    ('2.3-process-places-raw-data', ['data/raw/places.jsonl.gz'],
+     ['data/interim/places.csv']),
+    ('2.4-reverse-geocode-places-interim-data',
+     ['data/interim/places.csv', 'data/external/Countries-List.csv'],
+     ['data/processed/places.csv', 'data/processed/Countries-List.csv']),
+    ('3.0-build-features',
+     ['data/raw/nobel-physics-prize-laureates.csv',
+      'data/raw/nobel-chemistry-prize-laureates.csv',
+      'data/processed/places.csv', 'data/processed/Countries-List.csv',
+      'data/processed/train-physicists-from-1901.csv',
+      'data/processed/validation-physicists-from-1901.csv',
+      'data/processed/test-physicists-from-1901.csv'],
+     ['data/processed/train-features.csv', 'data/processed/validation-features.csv',
+      'data/processed/test-features.csv']),
+    ('3.1-build-target',
+     ['data/raw/nobel-physics-prize-laureates.csv',
+      'data/processed/train-physicists-from-1901.csv',
+      'data/processed/validation-physicists-from-1901.csv',
+      'data/processed/test-physicists-from-1901.csv'],
+     ['data/processed/train-target.csv', 'data/processed/validation-target.csv',
+      'data/processed/test-target.csv']),
+    ('4.0-exploratory-data-analysis',
+     ['data/processed/train-features.csv', 'data/processed/train-target.csv'], []),
+    ('4.1-exploratory-factor-analysis',
+     ['data/processed/train-features.csv', 'data/processed/train-target.csv'], []),
+    ('4.2-topic-modeling',
+     ['data/processed/train-features.csv', 'data/processed/validation-features.csv',
+      'data/processed/test-features.csv'],
+     ['data/processed/train-features-topics.csv',
+      'data/processed/validation-features-topics.csv',
+      'data/processed/test-features-topics.csv']),
+    ('5.0-baseline-model',
+     ['data/processed/train-features.csv', 'data/processed/train-target.csv',
+      'data/processed/validation-features.csv',
+      'data/processed/validation-target.csv'], []),
+    ('5.1-covariate-shift',
+     ['data/processed/train-features.csv', 'data/processed/validation-features.csv',
+      'data/processed/train-features-topics.csv',
+      'data/processed/validation-features-topics.csv'], []),
+    ('5.2-importance-weighting',
+     ['data/processed/train-features.csv', 'data/processed/validation-features.csv',
+      'data/processed/train-features-topics.csv',
+      'data/processed/validation-features-topics.csv',
+      'data/processed/train-target.csv'],
+     ['models/train-features-sample-weights.csv',
+      'models/train-features-topics-sample-weights.csv']),
+    ('5.3-train-model',
+     ['data/processed/train-features.csv', 'data/processed/validation-features.csv',
+      'data/processed/train-features-topics.csv',
+      'data/processed/validation-features-topics.csv',
+      'data/processed/train-target.csv', 'data/processed/validation-target.csv',
+      'models/train-features-sample-weights.csv',
+      'models/train-features-topics-sample-weights.csv'],
+     ['models/LR.csv']),
+    ('5.4-predict-model',
+     ['data/processed/train-features.csv', 'data/processed/validation-features.csv',
+      'data/processed/test-features.csv', 'data/processed/train-target.csv',
+      'data/processed/validation-target.csv', 'data/processed/test-target.csv',
+      'models/LR.csv'],
+     ['models/LR.joblib']),
+    ('6.0-conclusion', [], []),
+]
+"""list of `tuple`: Notebook stages.
+
+The notebooks of the project with the data files (relative to the project
+directory) that they read and write. The Wikipedia and DBpedia redirect
+caches are left out as they are read and updated by several notebooks and do
+not change their results.
+"""
+
+
+def notebook_stages(project_dir, timeout=600):
+    """Create the pipeline stages that execute the notebooks of the project.
+
+    Each notebook is executed with `jupyter nbconvert`, like `run-all.ipynb`,
+    and its HTML output is written to the notebooks/html_output directory.
+
+    Args:
+        project_dir (str): Project directory containing the notebooks, data and
+            models directories.
+        timeout (int, optional): Defaults to 600. Timeout in seconds of each
+            notebook cell.
+
+    Returns:
+        list of `Stage`: Notebook stages.
+    """
+
+    notebooks_dir = os.path.join(project_dir, 'notebooks')
+    stages = []
+    for name, inputs, outputs in NOTEBOOK_STAGES:
+        notebook = name + '.ipynb'
+        stages.append(Stage(
+            name, functools.partial(run_notebook, notebook, notebooks_dir, timeout),
+            [os.path.join(project_dir, path) for path in inputs],
+            [os.path.join(project_dir, path) for path in outputs],
+            [os.path.join(notebooks_dir, notebook)]))
+    return stages
+
+
+def run_notebook(notebook, notebooks_dir, timeout=600):
+    """Execute a notebook with `jupyter nbconvert`.
+
+    Args:
+        notebook (str): File name of the notebook.
+        notebooks_dir (str): Directory of the notebook. The notebook is executed
+            in it.
+        timeout (int, optional): Defaults to 600. Timeout in seconds of each
+            notebook cell.
+
+    Raises:
+        subprocess.CalledProcessError: If the notebook fails.
+    """
+
+    subprocess.run(
+        ['jupyter', 'nbconvert', '--ExecutePreprocessor.timeout={}'.format(timeout),
+         '--to', 'html', '--output-dir=html_output', '--execute', notebook],
+        cwd=notebooks_dir, check=True)
+
+
+def run_pipeline(stages, state_path, max_workers=None, force=False, errors=None):
+    """Run a pipeline of stages, skipping the stages whose inputs are unchanged.
+
+    A stage depends on the stages that write its inputs. Stages run as soon as
+    the stages they depend on have finished, so independent branches run in
+    parallel in a thread pool.
+
+    Before a stage runs, a hash of the content of its inputs and sources is
+    compared with the hash recorded in `state_path` when it last succeeded. If
+    they are equal and its outputs exist, the stage is skipped. Hashes of files
+    are reused while their size and modification time are unchanged, so a rerun
+    without changes only reads the state file. The traceback of each stage that
+    failed in its last run is also recorded in `state_path`, under 'errors'.
+
+    Args:
+        stages (list of `Stage`): Stages of the pipeline.
+        state_path (str): Path of the JSON file recording the hashes.
+        max_workers (int, optional): Defaults to None. Maximum number of stages
+            run at the same time. If None then the `ThreadPoolExecutor` default is
+            used.
+        force (bool, optional): Defaults to False. Whether to run all the stages
+            even if they are unchanged.
+        errors (dict, optional): Defaults to None. If given, the exceptions
+            raised by the failed stages are stored in it by stage name. Their
+            tracebacks are kept in `__traceback__`.
+
+    Returns:
+        collections.OrderedDict: The keys are the stage names, in the order of
+            `stages`, and the values are the stage statuses: 'ran', 'skipped',
+            'failed' or 'blocked' (not run because a stage it depends on failed).
+
+    Raises:
+        ValueError: If the stage names are not unique, two stages write the same
+            output or the stages have a cycle.
+    """
+
+    dependencies = _stage_dependencies(stages)
+    state = _read_state(state_path)
+    state.setdefault('errors', {})
+    state_lock = threading.Lock()
+    statuses = collections.OrderedDict((stage.name, None) for stage in stages)
+
+    def run_stage(stage):
+        with state_lock:
+            digest = _stage_digest(stage, state['files'])
+        unchanged = (not force and state['stages'].get(stage.name) == digest and
+                     all(os.path.exists(path) for path in stage.outputs))
+        if unchanged:
+            return 'skipped'
+
+        stage.func()
+        with state_lock:
+            # outputs are hashed now so that dependent stages can reuse the hashes
+            for path in stage.outputs:
+                _file_digest(path, state['files'])
+            state['stages'][stage.name] = digest
+            state['errors'].pop(stage.name, None)
+            _write_state(state_path, state)
+        return 'ran'
+
+    stages_by_name = {stage.name: stage for stage in stages}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+        while True:
+            for name, status in statuses.items():
+                if status is not None or name in running.values():
+                    continue
+                dependency_statuses = [statuses[dependency]
+                                       for dependency in dependencies[name]]
+                if any(status in ['failed', 'blocked'] for status in dependency_statuses):
+                    statuses[name] = 'blocked'
+                elif all(status in ['ran', 'skipped'] for status in dependency_statuses):
+                    running[executor.submit(run_stage, stages_by_name[name])] = name
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                error = future.exception()
+                if error:
+                    with state_lock:
+                        state['errors'][name] = ''.join(traceback.format_exception(
+                            type(error), error, error.__traceback__))
+                    if errors is not None:
+                        errors[name] = error
+                    statuses[name] = 'failed'
+                else:
+                    statuses[name] = future.result()
+
+    with state_lock:
+        _write_state(state_path, state)
+    return statuses
+
+
+def _stage_dependencies(stages):
+    names = [stage.name for stage in stages]
+    if len(set(names)) != len(names):
+        raise ValueError('The stage names must be unique.')
+
+    writers = {}
+    for stage in stages:
+        for path in stage.outputs:
+            path = os.path.abspath(path)
+            if path in writers:
+                raise ValueError('{} is written by stages {} and {}.'.format(
+                    path, writers[path], stage.name))
+            writers[path] = stage.name
+
+    dependencies = {}
+    for stage in stages:
+        dependencies[stage.name] = sorted(set(
+            writers[os.path.abspath(path)] for path in stage.inputs
+            if os.path.abspath(path) in writers) - {stage.name})
+
+    # check for cycles by removing the stages without dependencies
+    remaining = {name: set(deps) for name, deps in dependencies.items()}
+    while remaining:
+        roots = [name for name, deps in remaining.items() if not deps]
+        if not roots:
+            raise ValueError('The stages have a cycle: {}'.format(sorted(remaining)))
+        for name in roots:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(roots)
+    return dependencies
+
+
+def _stage_digest(stage, file_digests):
+    digest = hashlib.sha1(stage.name.encode())
+    func = stage.func.func if isinstance(stage.func, functools.partial) else stage.func
+    digest.update(getattr(func, '__qualname__', repr(func)).encode())
+    for path in list(stage.sources) + list(stage.inputs):
+        digest.update(os.path.basename(path).encode())
+        digest.update(_file_digest(path, file_digests).encode())
+    return digest.hexdigest()
+
+
+def _file_digest(path, file_digests):
+    if not os.path.exists(path):
+        return ''
+
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    cached = file_digests.get(path)
+    if (cached and cached['size'] == stat.st_size and
+            cached['mtime_ns'] == stat.st_mtime_ns):
+        return cached['digest']
+
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    file_digests[path] = dict(size=stat.st_size, mtime_ns=stat.st_mtime_ns,
+                              digest=digest.hexdigest())
+    return file_digests[path]['digest']
+
+
+def _read_state(state_path):
+    if not os.path.exists(state_path):
+        return dict(stages={}, files={}, errors={})
+    with open(state_path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def _write_state(state_path, state):
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(state, file, indent=1, sort_keys=True)
+    os.replace(tmp_path, state_path)
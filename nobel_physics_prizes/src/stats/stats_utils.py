@@ -2,7 +2,10 @@ import numpy as np
 from sklearn.ensemble import BaggingClassifier
 from sklearn.utils import indices_to_mask
 
+from src.pipeline.instrumentation_utils import instrument
 
+
+@instrument(count='X')
 def bootstrap_prediction(X, y, score_func, base_estimator=None, n_estimators=10,
                          max_samples=1.0, max_features=1.0, bootstrap=True,
                          bootstrap_features=False, n_jobs=None, random_state=None):
@@ -78,3 +81,25 @@ def percentile_conf_int(data, alpha=0.05):
     upper = 100 * (1. - alpha / 2)
     conf_int = np.percentile(data, [lower, upper])
     return conf_int
+
+
+@instrument(name='DensityRatioEstimator.fit', count='X_train')
+def fit_density_ratio_estimator(estimator, X_train, X_test, alpha_0=None):
+    """Fit a density ratio estimator, recording the fit as a span.
+
+    The fit of the vendored `src.externals.pykliep.pykliep.DensityRatioEstimator`
+    is instrumented here so that the externals are left as they are.
+
+    Args:
+        estimator (DensityRatioEstimator): Density ratio estimator.
+        X_train (numpy.ndarray): Training features.
+        X_test (numpy.ndarray): Test features.
+        alpha_0 (numpy.ndarray, optional): Defaults to None. Initial alphas
+            passed to `fit`.
+
+    Returns:
+        DensityRatioEstimator: The fitted estimator.
+    """
+
+    estimator.fit(X_train, X_test, alpha_0=alpha_0)
+    return estimator
@@ -0,0 +1,90 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib import parse
+
+import pytest
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    """Local HTTP server standing in for Wikipedia and DBpedia in tests.
+
+    Requests are dispatched to `routes`: the keys are URL paths and the values
+    are functions with signature route(path, query) returning the status code,
+    a dict of headers and the body bytes. Every request is recorded in
+    `requests` as a (path, query) tuple, the client address of every
+    connection in `connections`, and `bytes_sent` counts the body bytes
+    written. Connections are kept alive, like HTTP/1.1 servers do.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _StandInHandler)
+        self.routes = {}
+        self.requests = []
+        self.connections = []
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections.append(self.client_address)
+
+    def do_HEAD(self):
+        self.do_GET(send_body=False)
+
+    def do_GET(self, send_body=True):
+        url = parse.urlsplit(self.path)
+        path = parse.unquote(url.path)
+        query = parse.parse_qs(url.query)
+        with self.server.lock:
+            self.server.requests.append((path, query))
+
+        route = self.server.routes.get(path)
+        if route is None:
+            prefixes = [prefix for prefix in self.server.routes
+                        if prefix.endswith('/') and path.startswith(prefix)]
+            route = self.server.routes[max(prefixes, key=len)] if prefixes else None
+        if route is None:
+            status, headers, body = 404, {}, b'Not Found'
+        else:
+            status, headers, body = route(path, query)
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not send_body:
+            return
+        try:
+            self.wfile.write(body)
+            with self.server.lock:
+                self.server.bytes_sent += len(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # the client stopped reading the body
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in_server():
+    server = StandInServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
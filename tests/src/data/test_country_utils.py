@@ -133,3 +133,11 @@ def test_nationality_to_alpha2_code_northern_ireland(
     alpha2 = nationality_to_alpha2_code(
         text, read_nationalities)
     assert(alpha2 == 'GB')
+
+
+def test_nationality_to_alpha2_code_as_list(
+        read_nationalities):
+    text = 'Turkey and United States of America'
+    alpha2 = nationality_to_alpha2_code(
+        text, read_nationalities, as_list=True)
+    assert(alpha2 == ['TR', 'US'])
@@ -3,7 +3,9 @@ import pytest
 
 from src.data.dbpedia_utils import (PHYSICISTS_IGNORE_REDIRECT_KEYS,
                                     PHYSICISTS_IMPUTE_KEYS, PLACES_IMPUTE_KEYS,
+                                    benchmark_construct_resource_urls,
                                     construct_resource_urls,
+                                    construct_resource_urls_batch,
                                     impute_redirect_filenames)
 from src.data.jsonl_utils import read_jsonl
 
@@ -2113,3 +2115,57 @@ def test_construct_resource_urls(mickey_mouse_data, expected_urls):
     keys = ['city', 'country', 'homepage', 'spouse', 'workplaces']
     urls = construct_resource_urls([mickey_mouse_data], keys)
     assert(sorted(urls) == sorted(expected_urls))
+
+
+def test_construct_resource_urls_canonical(mickey_mouse_data, expected_urls):
+    data = [mickey_mouse_data,
+            {'city': 'http://dbpedia.org/resource/Burbank, California|wonderland',
+             'spouse': 'Minnie_Mouse'}]
+    keys = ['city', 'country', 'homepage', 'spouse', 'workplaces']
+    urls = construct_resource_urls(data, keys)
+    assert(sorted(urls) == sorted(expected_urls))
+
+
+def test_impute_redirect_filenames_canonical():
+    redirect_urls = {'http://dbpedia.org/resource/Physics':
+                     'http://dbpedia.org/page/Physics_(science)'}
+    imputed_data = impute_redirect_filenames([{'field': 'physics|Physics'}],
+                                             ['field'], redirect_urls)[0]
+    assert(imputed_data == {'field': 'Physics (science)'})
+
+
+def test_construct_resource_urls_batch(mickey_mouse_data, expected_urls):
+    data = [mickey_mouse_data,
+            {'city': 'http://dbpedia.org/resource/Burbank, California|wonderland',
+             'country': 3, 'spouse': ''}]
+    keys = ['city', 'country', 'homepage', 'spouse', 'workplaces']
+    urls = construct_resource_urls_batch(data, keys)
+    assert(sorted(urls) == sorted(expected_urls))
+    assert(sorted(urls) == sorted(construct_resource_urls(data, keys)))
+
+
+def test_benchmark_construct_resource_urls(mickey_mouse_data):
+    keys = ['city', 'country', 'spouse', 'workplaces']
+    results = benchmark_construct_resource_urls([mickey_mouse_data] * 10, keys,
+                                                num_repeats=2)
+    assert(results['version'].tolist() == ['loop', 'batch'])
+    assert((results['num_urls'] == 5).all())
+    assert((results['records_per_second'] > 0).all())
+
+
+def test_construct_resource_urls_lists(mickey_mouse_data, expected_urls):
+    data = [{key: val.split('|') if key == 'city' else val
+             for key, val in mickey_mouse_data.items()}]
+    keys = ['city', 'country', 'homepage', 'spouse', 'workplaces']
+    assert(sorted(construct_resource_urls(data, keys)) == sorted(expected_urls))
+    assert(sorted(construct_resource_urls_batch(data, keys)) == sorted(expected_urls))
+
+
+def test_impute_redirect_filenames_as_lists():
+    redirect_urls = {'http://dbpedia.org/resource/Physics':
+                     'http://dbpedia.org/page/Physics_(science)'}
+    data = [{'field': ['Physics', 'Optics \n* Acoustics'], 'spouse': 'Mileva'}]
+    imputed_data = impute_redirect_filenames(data, ['field', 'spouse'], redirect_urls,
+                                             as_lists=True)[0]
+    assert(imputed_data == {'field': ['Acoustics', 'Optics', 'Physics (science)'],
+                            'spouse': ['Mileva']})
@@ -0,0 +1,82 @@
+import io
+import json
+
+import progressbar
+import pytest
+
+from src.data.fetch_metrics import FetchMetrics
+from src.data.progress_bar import progress_bar
+from src.data.url_utils import fetch_json_data, get_redirect_urls, urls_progress_bar
+
+
+@pytest.fixture
+def json_server(stand_in_server):
+    def json_route(path, query):
+        if path == '/data/missing.json':
+            return 404, {}, b'Not Found'
+        if path == '/data/busy.json':
+            return 429, {}, b'Too Many Requests'
+        return 200, {'Content-Type': 'application/json'}, b'{"name": "Einstein"}'
+    stand_in_server.routes['/data/'] = json_route
+    return stand_in_server
+
+
+def test_fetch_metrics(json_server, tmp_path):
+    urls = ['{}/data/{}.json'.format(json_server.url, i) for i in range(10)]
+    urls += [json_server.url + '/data/missing.json', json_server.url + '/data/busy.json']
+    bar = progress_bar(len(urls), fetch_metrics=True)
+    bar.fd = io.StringIO()
+    errors_widget = bar.widgets[-1]
+    assert(errors_widget(bar, dict(variables=bar.variables)) == '0 errors')
+
+    metrics = FetchMetrics()
+    data = fetch_json_data(urls, max_workers=4, progress_bar=bar, metrics=metrics)
+    assert(len(data) == 10)
+    assert(bar.value == 12)
+    assert(bar.variables['errors'] == 2)
+    assert(errors_widget(bar, dict(variables=bar.variables)) == '2 errors')
+
+    cache_path = str(tmp_path / 'redirects.csv')
+    with open(cache_path, 'w') as file:
+        file.write('url,redirect_url\n{0},{0}\n'.format(urls[0]))
+    get_redirect_urls(urls[:4], url_cache_path=cache_path, metrics=metrics)
+
+    summary = metrics.summary()
+    assert(summary['num_requests'] == 15)
+    assert(summary['num_errors'] == 2)
+    assert(summary['status_counts'] == {'200': 13, '404': 1, '429': 1})
+    assert(summary['num_429'] == 1)
+    assert(summary['num_5xx'] == 0)
+    assert(summary['num_bytes'] == 10 * 20 + len('Not Found') + len('Too Many Requests'))
+    assert(summary['requests_per_second'] > 0)
+    assert(summary['latency_p50_ms'] <= summary['latency_p99_ms'])
+    assert(summary['cache_hit_ratio'] == 0.25)
+
+    metrics.set_value('max_workers', 4)
+    summary_path = str(tmp_path / 'metrics.json')
+    metrics.save(summary_path)
+    with open(summary_path) as file:
+        assert(json.load(file)['values'] == {'max_workers': 4})
+
+
+def test_fetch_metrics_retries():
+    metrics = FetchMetrics()
+    bar = progressbar.ProgressBar(max_value=10, fd=io.StringIO())
+    metrics.start(bar)
+    metrics.record(error=ValueError(), retry=True)
+    metrics.record(num_items=5)
+    assert(bar.value == 5)
+    metrics.finish()
+
+    summary = metrics.summary()
+    assert(summary['num_requests'] == 2)
+    assert(summary['num_retries'] == 1)
+    assert(summary['num_errors'] == 0)
+    assert(summary['latency_p50_ms'] is None)
+    assert(summary['cache_hit_ratio'] is None)
+
+
+def test_urls_progress_bar():
+    bar = urls_progress_bar(5)
+    assert(bar.max_value == 5)
+    assert(set(bar.variables) == {'requests_per_second', 'errors'})
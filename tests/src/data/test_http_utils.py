@@ -0,0 +1,179 @@
+import email.utils
+import threading
+import time
+from concurrent.futures import wait
+
+import pytest
+import requests
+
+from src.data.fetch_metrics import FetchMetrics
+from src.data.http_utils import (AdaptiveConcurrency, create_session, get_shared_session,
+                                 parse_retry_after)
+from src.data import url_utils
+from src.data.url_utils import fetch_json_data, get_redirect_urls
+
+
+@pytest.fixture
+def json_server(stand_in_server):
+    def json_route(path, query):
+        if path == '/data/slow.json':
+            time.sleep(0.5)
+        return 200, {'Content-Type': 'application/json'}, b'{"name": "Einstein"}'
+    stand_in_server.routes['/data/'] = json_route
+    return stand_in_server
+
+
+def test_create_session_reuses_connections(json_server):
+    urls = ['{}/data/{}.json'.format(json_server.url, i) for i in range(20)]
+    with create_session(pool_maxsize=2) as session:
+        data = fetch_json_data(urls, max_workers=2, session=session)
+        redirect_urls = get_redirect_urls(urls[:5], max_workers=2, session=session)
+    assert(len(data) == 20)
+    assert(data[urls[0]] == {'name': 'Einstein'})
+    assert(len(redirect_urls) == 5)
+    assert(len(json_server.requests) == 25)
+    # both functions share the keep-alive connections of the pool
+    assert(len(json_server.connections) <= 2)
+
+
+def test_fetch_keeps_session_pools(json_server):
+    urls = ['{}/data/{}.json'.format(json_server.url, i) for i in range(20)]
+    with create_session(pool_maxsize=2) as session:
+        adapter = session.get_adapter(json_server.url)
+        poolmanager = adapter.poolmanager
+        fetch_json_data(urls[:10], max_workers=16, session=session)
+        get_redirect_urls(urls[10:], max_workers=16, session=session)
+        # the warm pools are neither replaced nor resized by the workers
+        assert(adapter.poolmanager is poolmanager)
+        assert(adapter._pool_maxsize == 2)
+
+
+def test_create_session_timeout(json_server):
+    with create_session(timeout=0.1, max_retries=0) as session:
+        start = time.perf_counter()
+        with pytest.raises(requests.exceptions.RequestException, match='timed out'):
+            session.get(json_server.url + '/data/slow.json')
+        assert(time.perf_counter() - start < 0.4)
+        # the timeout of a request overrides the session timeout
+        response = session.get(json_server.url + '/data/slow.json', timeout=5)
+    assert(response.json() == {'name': 'Einstein'})
+
+
+def test_create_session_host_pool_sizes():
+    session = create_session(pool_maxsize=4, host_pool_sizes={'http://dbpedia.org': 40},
+                             user_agent='nobel-physics-prizes')
+    assert(session.get_adapter('http://dbpedia.org/data/A.json')._pool_maxsize == 40)
+    assert(session.get_adapter('https://en.wikipedia.org/wiki/A')._pool_maxsize == 4)
+    assert(session.headers['User-Agent'] == 'nobel-physics-prizes')
+
+
+def test_get_shared_session():
+    assert(get_shared_session() is get_shared_session())
+
+
+def test_adaptive_concurrency():
+    concurrency = AdaptiveConcurrency(initial_concurrency=2, max_concurrency=4,
+                                      latency_target=1.0)
+    for _ in range(20):
+        concurrency.on_success(0.1)
+    assert(concurrency.concurrency == 4)
+
+    # slow responses do not increase the concurrency
+    concurrency = AdaptiveConcurrency(initial_concurrency=2, latency_target=1.0)
+    for _ in range(20):
+        concurrency.on_success(2.0)
+    assert(concurrency.concurrency == 2)
+
+    # nor do errors
+    concurrency = AdaptiveConcurrency(initial_concurrency=2)
+    concurrency.on_error()
+    concurrency.on_success()
+    assert(concurrency.limit == 2.0)
+
+    # requests in flight when the server started throttling back off once
+    concurrency = AdaptiveConcurrency(initial_concurrency=16, max_concurrency=16)
+    sent_time = time.monotonic()
+    for _ in range(5):
+        concurrency.on_throttle(sent_time)
+    assert(concurrency.concurrency == 8)
+    concurrency.on_throttle(time.monotonic(), retry_after=0.2)
+    assert(concurrency.concurrency == 4)
+    assert(0.1 < concurrency.pause_time() <= 0.2)
+    assert(concurrency.max_concurrency_reached == 16)
+    assert([limit for _, limit in concurrency.history] == [16, 8, 4])
+
+    assert(concurrency.retry_delay(3) == 4.0)
+    assert(concurrency.retry_delay(3, retry_after=2.0) == 2.0)
+    with pytest.raises(ValueError):
+        AdaptiveConcurrency(initial_concurrency=30, max_concurrency=20)
+
+
+@pytest.fixture
+def throttling_server(stand_in_server):
+    """Server that throttles the requests above 4 in flight."""
+
+    in_flight = []
+    lock = threading.Lock()
+
+    def throttling_route(path, query):
+        with lock:
+            in_flight.append(path)
+            throttled = len(in_flight) > 4
+        try:
+            if throttled:
+                return 429, {'Retry-After': '0'}, b'Too Many Requests'
+            time.sleep(0.01)
+            return 200, {'Content-Type': 'application/json'}, b'{"name": "Einstein"}'
+        finally:
+            with lock:
+                in_flight.remove(path)
+    stand_in_server.routes['/data/'] = throttling_route
+    return stand_in_server
+
+
+def test_fetch_json_data_adaptive_concurrency(throttling_server):
+    urls = ['{}/data/{}.json'.format(throttling_server.url, i) for i in range(200)]
+    concurrency = AdaptiveConcurrency(initial_concurrency=1, max_concurrency=16,
+                                      backoff=0.01)
+    metrics = FetchMetrics()
+    with create_session(pool_maxsize=16) as session:
+        data = fetch_json_data(urls, session=session, metrics=metrics,
+                               concurrency=concurrency)
+
+    assert(len(data) == 200)
+    summary = metrics.summary()
+    assert(summary['num_errors'] == 0)
+    assert(summary['num_429'] > 0)
+    assert(summary['num_retries'] == summary['num_429'])
+    # the concurrency grew until the server throttled and then backed off
+    assert(summary['values']['max_concurrency_reached'] > 4)
+    assert(summary['values']['concurrency'] < 16)
+    assert(summary['values']['concurrency'] == concurrency.concurrency)
+
+
+def test_fetch_json_data_adaptive_concurrency_waits(json_server, monkeypatch):
+    num_waits = []
+
+    def counting_wait(*args, **kwargs):
+        num_waits.append(1)
+        return wait(*args, **kwargs)
+    monkeypatch.setattr(url_utils, 'wait', counting_wait)
+
+    urls = [json_server.url + '/data/slow.json?{}'.format(i) for i in range(4)]
+    concurrency = AdaptiveConcurrency(initial_concurrency=2, max_concurrency=2)
+    data = fetch_json_data(urls, concurrency=concurrency)
+    assert(len(data) == 4)
+    # the saturated loop blocks until a request completes instead of spinning
+    assert(len(num_waits) <= 8)
+
+
+def test_parse_retry_after():
+    response = requests.Response()
+    assert(parse_retry_after(response) is None)
+    response.headers['Retry-After'] = '120'
+    assert(parse_retry_after(response) == 120.0)
+    response.headers['Retry-After'] = email.utils.formatdate(
+        time.time() + 60, usegmt=True)
+    assert(55 < parse_retry_after(response) <= 60)
+    response.headers['Retry-After'] = 'soon'
+    assert(parse_retry_after(response) is None)
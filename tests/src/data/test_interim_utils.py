@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+from pyarrow import parquet
+
+from src.data.interim_utils import (convert_interim_csv, infer_list_columns,
+                                    read_interim_table, write_interim_table)
+
+INTERIM_PATH = 'nobel_physics_prizes/data/interim/physicists.csv'
+
+
+@pytest.fixture(scope='module')
+def physicists_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('interim') / 'physicists.parquet')
+    convert_interim_csv(INTERIM_PATH, path)
+    return path
+
+
+def test_convert_interim_csv(physicists_path):
+    schema = parquet.read_schema(physicists_path)
+    assert(pa.types.is_list(schema.field('almaMater').type))
+    assert(schema.field('almaMater').type.value_type == pa.string())
+    assert(schema.field('fullName').type == pa.string())
+    assert(os.path.getsize(physicists_path) < os.path.getsize(INTERIM_PATH))
+
+    # joining the lists gives back the CSV file
+    expected = pd.read_csv(INTERIM_PATH)
+    physicists = read_interim_table(physicists_path, join_lists=True)
+    pd.testing.assert_frame_equal(physicists, expected)
+    assert(physicists.deathDate.isna().equals(expected.deathDate.isna()))
+
+
+def test_read_interim_table(physicists_path):
+    physicists = read_interim_table(physicists_path,
+                                    columns=['fullName', 'field', 'spouse'])
+    expected = pd.read_csv(INTERIM_PATH, usecols=['fullName', 'field', 'spouse'])
+    assert(physicists.columns.tolist() == ['fullName', 'field', 'spouse'])
+    for values, text in zip(physicists.field, expected.field):
+        if isinstance(text, float):
+            assert(np.isnan(values))
+        else:
+            assert(values == text.split('|'))
+
+
+def test_write_interim_table(tmp_path):
+    path = str(tmp_path / 'places.parquet')
+    data = [{'fullName': 'Paris', 'country': 'France', 'type': ['City', 'Capital'],
+             'lat': 48.85},
+            {'fullName': 'Nowhere', 'type': 'Place|Thing', 'lat': np.nan}]
+    assert(infer_list_columns(pd.DataFrame(data)) == ['type'])
+    assert(write_interim_table(data, path, list_columns=['type', 'country']) ==
+           ['country', 'type'])
+
+    places = read_interim_table(path)
+    assert(places.type.tolist() == [['City', 'Capital'], ['Place', 'Thing']])
+    assert(places.country[0] == ['France'])
+    assert(np.isnan(places.country[1]))
+    assert(places.lat.dtype == 'float64')
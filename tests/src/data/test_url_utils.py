@@ -0,0 +1,60 @@
+import pytest
+
+from src.data.url_utils import (UrlIndex, canonicalize_url, get_redirect_urls,
+                                quote_url, url_id)
+
+
+@pytest.fixture
+def redirect_server(stand_in_server):
+    stand_in_server.routes['/resource/'] = lambda path, query: (200, {}, b'')
+    return stand_in_server
+
+
+def test_canonicalize_url():
+    url = 'http://dbpedia.org/resource/Albert_Einstein'
+    assert(canonicalize_url('http://dbpedia.org/resource/albert Einstein') == url)
+    assert(canonicalize_url(url) == url)
+    assert(canonicalize_url('http://dbpedia.org/resource/Category:nobel_laureates') ==
+           'http://dbpedia.org/resource/Category:Nobel_laureates')
+    assert(canonicalize_url('http://dbpedia.org/resource/%C3%A9cole_normale',
+                            quoted=True) ==
+           'http://dbpedia.org/resource/École_normale')
+    # names may contain percent signs
+    url = 'http://dbpedia.org/resource/Medal_%22For_Courage%22'
+    assert(canonicalize_url(url) == url)
+    assert(canonicalize_url(quote_url(url), quoted=True) == url)
+    # only DBpedia resources are capitalized
+    assert(canonicalize_url('https://example.com/lower case') ==
+           'https://example.com/lower case')
+
+
+def test_url_index():
+    index = UrlIndex(['http://dbpedia.org/resource/Burbank,_California',
+                      'http://dbpedia.org/resource/burbank, California'])
+    index.add('http://dbpedia.org/resource/Burbank%2C_California', quoted=True)
+    assert(len(index) == 1)
+    assert(index.num_duplicates == 2)
+    assert('http://dbpedia.org/resource/burbank,_California' in index)
+    assert(index.quoted_urls() == ['http://dbpedia.org/resource/Burbank%2C_California'])
+
+    id_ = index.get_id('http://dbpedia.org/resource/Burbank,_California')
+    assert(id_ == url_id('http://dbpedia.org/resource/burbank,_California'))
+    assert(id_ != url_id('http://dbpedia.org/resource/Burbank'))
+    assert(len(id_) == 16)
+    assert(index.get_id('http://dbpedia.org/resource/Burbank') is None)
+
+
+def test_get_redirect_urls_requests_each_resource_once(redirect_server, tmp_path):
+    url = redirect_server.url + '/resource/'
+    cache_path = str(tmp_path / 'redirects.csv')
+    with open(cache_path, 'w', encoding='utf-8') as file:
+        file.write('url,redirect_url\n{0}Einstein,{0}Albert_Einstein\n'.format(url))
+
+    urls_to_check = [url + 'Caf%C3%A9', url + 'Café', url + 'Caf%C3%A9',
+                     url + 'Einstein', url + 'Planck']
+    redirect_urls = get_redirect_urls(urls_to_check, url_cache_path=cache_path)
+    assert(sorted(path for path, _ in redirect_server.requests) ==
+           ['/resource/Café', '/resource/Planck'])
+    assert(redirect_urls == {url + 'Café': url + 'Café',
+                             url + 'Einstein': url + 'Albert_Einstein',
+                             url + 'Planck': url + 'Planck'})
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.interim_utils import read_interim_table, write_interim_table
+from src.data.vocabulary_utils import (EntityVocabulary, lookup_list_ids,
+                                       read_interim_vocabulary)
+
+
+@pytest.fixture
+def physicists():
+    return pd.DataFrame(dict(
+        fullName=['Albert Einstein', 'Marie Curie', 'Paul Dirac'],
+        almaMater=['ETH Zurich|University of Zurich', 'University of Paris', np.nan],
+        workplaces=[['ETH Zurich', 'Princeton'], np.nan, ['University of Cambridge']]))
+
+
+def test_entity_vocabulary(physicists, tmp_path):
+    vocabulary = EntityVocabulary.from_frame(physicists, ['almaMater', 'workplaces'])
+    assert(vocabulary.names == ['ETH Zurich', 'Princeton', 'University of Cambridge',
+                                'University of Paris', 'University of Zurich'])
+    assert('Princeton' in vocabulary)
+    assert(vocabulary.get_id('Princeton') == 1)
+    assert(vocabulary.get_id('MIT') is None)
+    assert(vocabulary.encode(['MIT', 'Princeton']).tolist() == [-1, 1])
+    assert(vocabulary.decode([4, 0]).tolist() == ['University of Zurich', 'ETH Zurich'])
+
+    ids = vocabulary.encode_lists(physicists.almaMater)
+    assert(ids[0].dtype == 'int32')
+    assert(ids[0].tolist() == [0, 4])
+    assert(np.isnan(ids[2]))
+    assert(vocabulary.decode_lists(ids, join=True).iloc[:2].tolist() ==
+           physicists.almaMater.iloc[:2].tolist())
+    assert(vocabulary.decode_lists(vocabulary.encode_lists(physicists.workplaces))[0] ==
+           ['ETH Zurich', 'Princeton'])
+
+    with pytest.raises(KeyError):
+        vocabulary.encode_lists(pd.Series(['MIT']), add=False)
+    vocabulary.encode_lists(pd.Series(['MIT|Princeton']))
+    assert(vocabulary.get_id('MIT') == 5)
+    # list columns read from Parquet hold arrays
+    ids = vocabulary.encode_lists(pd.Series([np.array(['MIT', 'ETH Zurich'], dtype=object)]))
+    assert(ids[0].tolist() == [5, 0])
+    assert(len(vocabulary) == 6)
+
+    path = str(tmp_path / 'vocabulary.json')
+    vocabulary.save(path)
+    assert(EntityVocabulary.load(path).names == vocabulary.names)
+
+
+def test_interim_table_vocabulary(physicists, tmp_path):
+    path = str(tmp_path / 'physicists.parquet')
+    vocabulary = EntityVocabulary()
+    write_interim_table(physicists, path, list_columns=['almaMater', 'workplaces'],
+                        vocabulary=vocabulary)
+    assert(read_interim_vocabulary(path).names == vocabulary.names)
+
+    ids = read_interim_table(path, as_ids=True)
+    assert(ids.almaMater[0].tolist() == vocabulary.encode(
+        ['ETH Zurich', 'University of Zurich']).tolist())
+    assert(np.isnan(ids.workplaces[1]))
+
+    names = read_interim_table(path, join_lists=True)
+    assert(names.almaMater.iloc[:2].tolist() == physicists.almaMater.iloc[:2].tolist())
+    assert(names.workplaces[0] == 'ETH Zurich|Princeton')
+    assert(read_interim_table(path).workplaces[2] == ['University of Cambridge'])
+
+    write_interim_table(physicists, path)
+    assert(read_interim_vocabulary(path) is None)
+
+
+def test_lookup_list_ids(physicists):
+    vocabulary = EntityVocabulary.from_frame(physicists, ['almaMater', 'workplaces'])
+    places = pd.DataFrame(dict(
+        fullName=['ETH Zurich', 'University of Zurich', 'Princeton'],
+        countryAlpha3Code=['CHE', 'CHE', np.nan],
+        continentCode=['EU', 'EU|XX', 'NA']))
+    place_ids = vocabulary.encode(places.fullName)
+    ids = vocabulary.encode_lists(physicists.almaMater)
+    assert(lookup_list_ids(ids, place_ids, places.countryAlpha3Code).tolist() ==
+           [['CHE'], [], []])
+    assert(lookup_list_ids(vocabulary.encode_lists(physicists.workplaces), place_ids,
+                           places.continentCode).tolist() == [['EU', 'NA'], [], []])
+    with pytest.raises(ValueError):
+        lookup_list_ids(ids, [0, 0], ['CHE', 'CHE'])
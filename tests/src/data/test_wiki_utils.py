@@ -0,0 +1,264 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+import requests
+
+from src.data.wiki_utils import (WIKI_OLD_URL, extract_linked_article_titles,
+                                 find_redirected_title, get_linked_article_titles,
+                                 get_old_article_url, get_redirected_titles,
+                                 resolve_redirected_titles)
+
+REDIRECTS = {
+    'Einstein': '/wiki/Albert_Einstein',
+    'Curie': '/wiki/Marie_Curie#Early_life',
+    'Andre Ampere': '/wiki/Andr%C3%A9-Marie_Amp%C3%A8re',
+}
+
+
+def _article(title, body_size=200000):
+    config = '"wgPageName":"{}"'.format(title.replace(' ', '_'))
+    if title in REDIRECTS:
+        config += ',"wgInternalRedirectTargetUrl":"{}"'.format(REDIRECTS[title])
+    return ('<!DOCTYPE html><html><head><title>{}</title>'
+            '<script>RLCONF={{{}}};</script></head><body>{}</body></html>'.format(
+                title, config, 'x' * body_size)).encode('utf-8')
+
+
+def _wiki_route(path, query):
+    title = path[len('/wiki/'):].replace('_', ' ')
+    if title == 'Missing':
+        return 404, {}, b'Not Found'
+    return 200, {'Content-Type': 'text/html; charset=UTF-8'}, _article(title)
+
+
+def _api_route(path, query):
+    titles = query['titles'][0].split('|')
+    normalized = [dict({'from': title, 'to': title[0].upper() + title[1:]})
+                  for title in titles if title[0].islower()]
+    api_redirects = {'Einstein': ('Albert Einstein', None),
+                     'Curie': ('Marie Curie', 'Early life'),
+                     'Double': ('Einstein', None)}
+    redirects = []
+    for title in titles:
+        title = title[0].upper() + title[1:]
+        while title in api_redirects:
+            redirect = {'from': title, 'to': api_redirects[title][0]}
+            if api_redirects[title][1]:
+                redirect['tofragment'] = api_redirects[title][1]
+            redirects.append(redirect)
+            title = api_redirects[title][0]
+    body = dict(batchcomplete=True, query=dict(normalized=normalized,
+                                               redirects=redirects))
+    return 200, {'Content-Type': 'application/json'}, json.dumps(body).encode()
+
+
+class _ChunkedResponse:
+
+    def __init__(self, body, status_code=200):
+        self.body = body
+        self.status_code = status_code
+        self.bytes_read = 0
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            chunk = self.body[start:start + chunk_size]
+            self.bytes_read += len(chunk)
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def wiki_server(stand_in_server):
+    stand_in_server.routes['/wiki/'] = _wiki_route
+    stand_in_server.routes['/w/api.php'] = _api_route
+    return stand_in_server
+
+
+def test_find_redirected_title():
+    response = _ChunkedResponse(_article('Einstein'))
+    assert(find_redirected_title(response, chunk_size=16) == 'Albert Einstein')
+    assert(response.closed)
+    assert(response.bytes_read < 200)
+
+    response = _ChunkedResponse(_article('Albert Einstein'))
+    assert(find_redirected_title(response, chunk_size=7) is None)
+    assert(response.bytes_read < 200)
+
+    response = _ChunkedResponse(_article('Einstein'), status_code=404)
+    assert(find_redirected_title(response) is None)
+    assert(response.bytes_read == 0)
+
+
+def test_get_redirected_titles(wiki_server):
+    titles = ['Einstein', 'Curie', 'Andre Ampere', 'Max Planck', 'Missing']
+    with pytest.warns(UserWarning):
+        redirected_titles = get_redirected_titles(
+            titles, wiki_url=wiki_server.url + '/wiki/')
+    assert(redirected_titles == {
+        'Einstein': 'Albert Einstein',
+        'Curie': 'Marie Curie#Early life',
+        'Andre Ampere': 'André-Marie Ampère',
+        'Max Planck': 'Max Planck',
+        'Missing': 'Missing',
+    })
+
+
+def test_get_redirected_titles_bulk(wiki_server):
+    titles = ['Einstein', 'Curie', 'Double', 'max Planck', 'Max Planck']
+    redirected_titles = get_redirected_titles(
+        titles, bulk=True, api_url=wiki_server.url + '/w/api.php')
+    assert(redirected_titles == {
+        'Einstein': 'Albert Einstein',
+        'Curie': 'Marie Curie#Early life',
+        'Double': 'Albert Einstein',
+        'max Planck': 'max Planck',
+        'Max Planck': 'Max Planck',
+    })
+    assert(len(wiki_server.requests) == 1)
+
+
+def test_resolve_redirected_titles_batches(wiki_server):
+    titles = ['Title {}'.format(i) for i in range(120)] + ['Einstein']
+    with requests.Session() as session:
+        redirected_titles = resolve_redirected_titles(
+            titles, api_url=wiki_server.url + '/w/api.php', session=session)
+    assert(len(redirected_titles) == 121)
+    assert(redirected_titles['Einstein'] == 'Albert Einstein')
+    assert(redirected_titles['Title 7'] == 'Title 7')
+    assert([len(query['titles'][0].split('|')) for _, query in wiki_server.requests] ==
+           [50, 50, 21])
+
+
+def _flaky_route(failures):
+    attempts = {}
+
+    def route(path, query):
+        title = path[len('/wiki/'):].replace('_', ' ')
+        attempts[title] = attempts.get(title, 0) + 1
+        if attempts[title] <= failures.get(title, 0):
+            return 503, {'Retry-After': '0'}, b'Service Unavailable'
+        return _wiki_route(path, query)
+    return route
+
+
+def test_get_redirected_titles_retries(stand_in_server, tmp_path):
+    stand_in_server.routes['/wiki/'] = _flaky_route({'Einstein': 2, 'Curie': 4})
+    log_path = str(tmp_path / 'redirects-log.csv')
+    titles = ['Einstein', 'Curie', 'Max Planck']
+
+    with pytest.warns(UserWarning, match='1 titles'):
+        redirected_titles = get_redirected_titles(
+            titles, wiki_url=stand_in_server.url + '/wiki/', max_retries=3,
+            backoff=0.01, log_path=log_path)
+    assert(redirected_titles == {'Einstein': 'Albert Einstein', 'Curie': 'Curie',
+                                 'Max Planck': 'Max Planck'})
+    paths = [path for path, _ in stand_in_server.requests]
+    assert(paths.count('/wiki/Einstein') == 3)
+    assert(paths.count('/wiki/Curie') == 4)
+
+    log = pd.read_csv(log_path, keep_default_na=False).set_index('name')
+    assert(log.loc['Einstein', 'redirect_name'] == 'Albert Einstein')
+    assert(log.loc['Einstein', 'error'] == '')
+    assert('503' in log.loc['Curie', 'error'])
+
+    # resuming only requests the failed titles
+    del stand_in_server.requests[:]
+    redirected_titles = get_redirected_titles(
+        titles, wiki_url=stand_in_server.url + '/wiki/', backoff=0.01,
+        log_path=log_path, resume=True)
+    assert(stand_in_server.requests[0][0] == '/wiki/Curie')
+    assert(len(stand_in_server.requests) == 1)
+    assert(redirected_titles == {'Einstein': 'Albert Einstein',
+                                 'Curie': 'Marie Curie#Early life',
+                                 'Max Planck': 'Max Planck'})
+    log = pd.read_csv(log_path, keep_default_na=False)
+    assert((log.error == '').all())
+
+
+def test_get_redirected_titles_log_next_to_cache(wiki_server, tmp_path):
+    cache_path = str(tmp_path / 'wikipedia-redirects.csv')
+    pd.DataFrame(dict(name=['Curie'], redirect_name=['Marie Curie'])).to_csv(
+        cache_path, index=False)
+    redirected_titles = get_redirected_titles(
+        ['Curie', 'Einstein'], title_cache_path=cache_path,
+        wiki_url=wiki_server.url + '/wiki/')
+    assert(redirected_titles == {'Curie': 'Marie Curie', 'Einstein': 'Albert Einstein'})
+
+    log = pd.read_csv(str(tmp_path / 'wikipedia-redirects-log.csv'))
+    assert(log.name.tolist() == ['Einstein'])
+
+
+def test_resolve_redirected_titles_errors(stand_in_server):
+    stand_in_server.routes['/w/api.php'] = lambda path, query: (500, {}, b'Error')
+    api_url = stand_in_server.url + '/w/api.php'
+    with pytest.raises(requests.exceptions.HTTPError):
+        resolve_redirected_titles(['Einstein'], api_url=api_url, max_retries=1,
+                                  backoff=0.01)
+    assert(len(stand_in_server.requests) == 2)
+
+    errors = {}
+    redirected_titles = resolve_redirected_titles(
+        ['Einstein'], api_url=api_url, max_retries=0, errors=errors)
+    assert(redirected_titles == {'Einstein': 'Einstein'})
+    assert(list(errors) == ['Einstein'])
+
+
+LIST_ARTICLE = '''<!DOCTYPE html>
+<html><head><meta charset="UTF-8"><title>List of physicists</title></head>
+<body>
+<h2><span class="mw-headline" id="A">A</span></h2>
+<ul>
+<li><a href="/wiki/Ernst_Abbe">Ernst Abbe</a></li>
+<li><a href="/wiki/Newcastle_University">Newcastle University</a>
+  <ul><li><a href="/wiki/Alexei_Abrikosov">Alexei Abrikosov</a></li></ul></li>
+<li><a href="/w/index.php?title=Nobody&amp;redlink=1">Nobody</a></li>
+<li><a href="https://example.com/">External</a></li>
+</ul>
+<p><a href="/wiki/Not_in_a_list">Not in a list</a></p>
+<h2><span class="mw-headline" id="B">B</span></h2>
+<p>Intro</p>
+<ul><li><a href="/wiki/Andr%C3%A9_Bloch">André Bloch</a></li></ul>
+<h2><span class="mw-headline" id="Middle_Ages">Middle Ages</span></h2>
+<ul><li><a href="/wiki/Ibn_al-Haytham">Ibn al-Haytham</a></li></ul>
+</body></html>
+'''.encode('utf-8')
+
+
+def test_extract_linked_article_titles(tmp_path):
+    path = str(tmp_path / 'list.html')
+    with open(path, 'wb') as file:
+        file.write(LIST_ARTICLE)
+
+    assert(extract_linked_article_titles(path, ['B', 'A'], ['Newcastle University']) ==
+           ['Andr%C3%A9 Bloch', 'Ernst Abbe', 'Alexei Abrikosov'])
+    assert(extract_linked_article_titles(path, ['Middle Ages', 'A']) ==
+           ['Ibn al-Haytham', 'Ernst Abbe', 'Newcastle University', 'Alexei Abrikosov'])
+    with pytest.raises(ValueError):
+        extract_linked_article_titles(path, ['A', 'C'])
+
+
+def test_get_linked_article_titles_cache(stand_in_server, tmp_path):
+    stand_in_server.routes['/w/index.php'] = lambda path, query: (
+        200, {'Content-Type': 'text/html; charset=UTF-8'}, LIST_ARTICLE)
+    url = get_old_article_url('List of physicists', 861832841).replace(
+        WIKI_OLD_URL, stand_in_server.url + '/w/index.php?title=')
+    assert(url.endswith('/w/index.php?title=List_of_physicists&oldid=861832841'))
+
+    cache_dir = str(tmp_path / 'html')
+    for _ in range(2):
+        article_titles = get_linked_article_titles(
+            url, ['A'], blacklist_links=['Ernst Abbe'], html_cache_dir=cache_dir)
+        assert(article_titles == ['Newcastle University', 'Alexei Abrikosov'])
+    assert(len(stand_in_server.requests) == 1)
+    assert(os.listdir(cache_dir) == ['List_of_physicists-861832841.html'])
+
+    # unpinned articles are not cached
+    get_linked_article_titles(stand_in_server.url + '/w/index.php?title=List', ['B'],
+                              html_cache_dir=cache_dir)
+    assert(len(stand_in_server.requests) == 2)
+    assert(len(os.listdir(cache_dir)) == 1)
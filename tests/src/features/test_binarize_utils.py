@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.vocabulary_utils import EntityVocabulary
+from src.features.binarize_utils import ListFeatureBinarizer, other_feature_name
+
+
+@pytest.fixture
+def train_features():
+    features = pd.DataFrame(data=[
+        [['Caltech', 'Princeton University'], ['USA']],
+        [['Princeton University'], ['USA', 'GBR']],
+        [[], ['USA']],
+        [['University of Cambridge'], []]
+    ],
+        index=['Sheldon Cooper', 'Amy Fowler', 'Howard Wolowitz', 'Mandark'],
+        columns=['alma_mater', 'citizenship_country_alpha_3_codes'])
+    return features
+
+
+@pytest.fixture
+def prefixes():
+    return {'alma_mater': 'alumnus_of_',
+            'citizenship_country_alpha_3_codes': 'citizen_of_'}
+
+
+def test_other_feature_name():
+    assert(other_feature_name('alma_mater', 'alumnus_of_') == 'alumnus_of_*')
+    assert(other_feature_name('birth_continent_codes', 'born_in_') == 'born_in_**')
+    assert(other_feature_name('birth_country_alpha_3_codes', 'born_in_') ==
+           'born_in_***')
+
+
+def test_list_feature_binarizer(train_features, prefixes):
+    binarizer = ListFeatureBinarizer(prefixes=prefixes).fit(train_features)
+    binarized = binarizer.transform(train_features)
+    assert(binarized.columns.tolist() == [
+        'alumnus_of_Caltech', 'alumnus_of_Princeton_University',
+        'alumnus_of_University_of_Cambridge', 'citizen_of_GBR', 'citizen_of_USA'])
+    assert(binarized.index.tolist() == train_features.index.tolist())
+    assert(binarized.matrix.dtype == 'int8')
+    assert(np.array_equal(binarized.matrix.toarray(), [
+        [1, 1, 0, 0, 1],
+        [0, 1, 0, 1, 1],
+        [0, 0, 0, 0, 1],
+        [0, 0, 1, 0, 0]
+    ]))
+
+
+def test_list_feature_binarizer_presence_threshold(train_features, prefixes):
+    binarizer = ListFeatureBinarizer(
+        prefixes=prefixes, presence_threshold=0.5).fit(train_features)
+    binarized = binarizer.transform(train_features)
+    assert(binarized.columns.tolist() == [
+        'alumnus_of_Princeton_University', 'alumnus_of_*',
+        'citizen_of_USA', 'citizen_of_***'])
+    assert(np.array_equal(binarized.matrix.toarray(), [
+        [1, 1, 1, 0],
+        [1, 0, 1, 1],
+        [0, 0, 1, 0],
+        [0, 1, 0, 0]
+    ]))
+
+
+def test_list_feature_binarizer_unseen_categories(train_features, prefixes):
+    binarizer = ListFeatureBinarizer(
+        prefixes=prefixes, presence_threshold=0.5).fit(train_features)
+    test_features = pd.DataFrame(data=[
+        ['MIT|Yale University', 'USA'],
+        [np.nan, 'FRA']
+    ],
+        index=['Barry Kripke', 'Leslie Winkle'],
+        columns=['alma_mater', 'citizenship_country_alpha_3_codes'])
+    binarized = binarizer.transform(test_features)
+    assert(binarized.columns.tolist() == binarizer.get_feature_names())
+    assert(np.array_equal(binarized.matrix.toarray(), [
+        [0, 1, 1, 0],
+        [0, 0, 0, 1]
+    ]))
+
+    binarizer = ListFeatureBinarizer(prefixes=prefixes).fit(train_features)
+    binarized = binarizer.transform(test_features)
+    assert(binarized.matrix.shape == (2, 5))
+    assert(binarized.matrix.toarray()[0].tolist() == [0, 0, 0, 0, 1])
+    assert(binarized.matrix.nnz == 1)
+
+
+def test_list_feature_binarizer_vocabulary(train_features, prefixes):
+    vocabulary = EntityVocabulary.from_frame(train_features, list(prefixes))
+    encoded_features = train_features.apply(vocabulary.encode_lists)
+    assert(encoded_features.alma_mater[0].dtype == 'int32')
+
+    for presence_threshold in [0.0, 0.5]:
+        expected = ListFeatureBinarizer(
+            prefixes=prefixes, presence_threshold=presence_threshold).fit(
+                train_features).transform(train_features)
+        binarizer = ListFeatureBinarizer(
+            prefixes=prefixes, presence_threshold=presence_threshold,
+            vocabulary=vocabulary).fit(encoded_features)
+        binarized = binarizer.transform(encoded_features)
+        assert(binarized.columns.tolist() == expected.columns.tolist())
+        assert((binarized.matrix != expected.matrix).nnz == 0)
+
+    # unseen categories are in the vocabulary but not in the fitted binarizer
+    test_features = pd.DataFrame(data=[[['MIT', 'Caltech'], ['FRA']]],
+                                 columns=['alma_mater',
+                                          'citizenship_country_alpha_3_codes'])
+    binarized = binarizer.transform(test_features.apply(vocabulary.encode_lists))
+    assert(binarized.matrix.toarray().tolist() == [[0, 1, 0, 1]])
+
+
+def test_list_feature_binarizer_save_load(tmp_path, train_features, prefixes):
+    binarizer = ListFeatureBinarizer(
+        prefixes=prefixes, presence_threshold=0.5).fit(train_features)
+    path = str(tmp_path / 'vocabulary.json')
+    binarizer.save(path)
+    loaded = ListFeatureBinarizer.load(path)
+    assert(loaded.get_feature_names() == binarizer.get_feature_names())
+    assert((loaded.transform(train_features).matrix !=
+            binarizer.transform(train_features).matrix).nnz == 0)
+
+
+def test_list_feature_binarizer_not_fitted(train_features, prefixes):
+    with pytest.raises(ValueError):
+        ListFeatureBinarizer(prefixes=prefixes).transform(train_features)
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.features.feature_store import (build_feature_store, read_features,
+                                        read_table, read_target)
+from src.features.features_utils import (convert_categoricals_to_numerical,
+                                         convert_target_to_numerical)
+
+PROCESSED_DIR = 'nobel_physics_prizes/data/processed'
+
+
+@pytest.fixture(scope='module')
+def store_dir(tmp_path_factory):
+    store_dir = str(tmp_path_factory.mktemp('feature-store'))
+    build_feature_store(PROCESSED_DIR, store_dir)
+    return store_dir
+
+
+@pytest.mark.parametrize('partition', ['train', 'validation', 'test'])
+def test_read_features(store_dir, partition):
+    expected = convert_categoricals_to_numerical(pd.read_csv(
+        '{}/{}-features.csv'.format(PROCESSED_DIR, partition)))
+    features = read_features(store_dir, partition)
+    assert((features.dtypes == 'int8').all())
+    assert(features.index.tolist() == expected.index.tolist())
+    assert(features.columns.tolist() == expected.columns.tolist())
+    assert(np.array_equal(features.values, expected.values))
+
+
+@pytest.mark.parametrize('partition', ['train', 'validation', 'test'])
+def test_read_features_topics(store_dir, partition):
+    expected = convert_categoricals_to_numerical(pd.read_csv(
+        '{}/{}-features-topics.csv'.format(PROCESSED_DIR, partition)))
+    features = read_features(store_dir, partition, topics=True)
+    assert(features.columns.tolist() == expected.columns.tolist())
+    assert(np.array_equal(features.values, expected.values))
+
+
+def test_read_target(store_dir):
+    expected = convert_target_to_numerical(pd.read_csv(
+        PROCESSED_DIR + '/train-target.csv', index_col='full_name').iloc[:, 0])
+    target = read_target(store_dir, 'train')
+    assert(target.dtype == 'int8')
+    assert(target.name == 'physics_laureate')
+    assert(target.index.tolist() == expected.index.tolist())
+    assert(np.array_equal(target.values, expected.values))
+
+
+def test_read_table_columns(store_dir):
+    features = read_table(store_dir, 'train', 'features',
+                          columns=['gender', 'is_astronomer'])
+    assert(features.columns.tolist() == ['gender', 'is_astronomer'])
+    assert(features.index.name == 'full_name')
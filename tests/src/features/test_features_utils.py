@@ -1,9 +1,16 @@
+import numpy as np
 import pandas as pd
 import pytest
 from sklearn.preprocessing import OneHotEncoder
 
-from src.features.features_utils import (convert_categoricals_to_numerical,
-                                         convert_target_to_numerical, rank_hot_encode)
+from src.features.features_utils import (binarize_list_feature,
+                                         convert_categoricals_to_numerical,
+                                         convert_categoricals_to_sparse,
+                                         convert_target_to_numerical,
+                                         hstack_sparse_features,
+                                         infer_categorical_schema,
+                                         load_sparse_features, rank_hot_encode,
+                                         save_sparse_features)
 
 
 @pytest.fixture()
@@ -15,6 +22,8 @@ def expected_features():
     ],
         index=['Sheldon Cooper', 'Amy Fowler', 'Mandark'],
         columns=['ratio_num_workplaces', 'gender', 'worked_in_USA'])
+    expected = expected.astype({'gender': 'int8', 'worked_in_USA': 'int8'})
+    expected.index.name = 'full_name'
     return expected
 
 
@@ -79,6 +88,65 @@ def test_convert_categoricals_to_numerical(expected_features):
     assert(features_numerical.equals(expected_features))
 
 
+def test_convert_categoricals_to_numerical_inplace(expected_features):
+    features = pd.DataFrame(data=[
+        ['Sheldon Cooper', 1.4, 'male', 'yes'],
+        ['Amy Fowler', 2.0, 'female', 'yes'],
+        ['Mandark', 2.8, 'male', 'no']
+    ],
+        columns=['full_name', 'ratio_num_workplaces', 'gender', 'worked_in_USA'])
+    assert(convert_categoricals_to_numerical(features, inplace=True) is None)
+    assert(features.equals(expected_features))
+
+
+def test_convert_categoricals_to_numerical_unexpected_value():
+    features = pd.DataFrame(data=[
+        ['Sheldon Cooper', 'yes'],
+        ['Amy Fowler', 'maybe']
+    ],
+        columns=['full_name', 'worked_in_USA'])
+    with pytest.raises(ValueError):
+        convert_categoricals_to_numerical(features)
+    features_numerical = convert_categoricals_to_numerical(
+        features, validate=False)
+    assert(features_numerical.worked_in_USA.tolist() == [1, 0])
+
+
+def test_infer_categorical_schema():
+    features = pd.DataFrame(data=[
+        ['Sheldon Cooper', 1.4, 'male', 'yes'],
+        ['Amy Fowler', 2.0, 'female', None]
+    ],
+        columns=['full_name', 'ratio_num_workplaces', 'gender', 'worked_in_USA'])
+    schema = infer_categorical_schema(features)
+    assert(schema == {'ratio_num_workplaces': 'numeric', 'gender': 'gender',
+                      'worked_in_USA': 'binary'})
+
+
+def test_infer_categorical_schema_ambiguous():
+    features = pd.DataFrame(data=[
+        ['Sheldon Cooper', 'no', 'male', None],
+        ['Amy Fowler', 'female', 'female', None]
+    ],
+        columns=['full_name', 'mixed', 'gender', 'missing'])
+    with pytest.raises(ValueError, match='mixed'):
+        infer_categorical_schema(features[['full_name', 'mixed', 'gender']])
+    with pytest.raises(ValueError, match='missing'):
+        infer_categorical_schema(features[['full_name', 'gender', 'missing']])
+
+
+def test_convert_categoricals_to_numerical_missing_values():
+    features = pd.DataFrame(data=[
+        ['Sheldon Cooper', 'yes'],
+        ['Amy Fowler', np.nan],
+        ['Mandark', 'no']
+    ],
+        columns=['full_name', 'worked_in_USA'])
+    features_numerical = convert_categoricals_to_numerical(features)
+    assert(features_numerical.worked_in_USA.iloc[[0, 2]].tolist() == [1, 0])
+    assert(np.isnan(features_numerical.worked_in_USA.iloc[1]))
+
+
 def test_convert_target_to_numerical(expected_target):
     target = expected_target.map({1: 'yes', 0: 'no'})
     target_numerical = convert_target_to_numerical(target)
@@ -102,3 +170,61 @@ def test_rank_hot_encode_columns(binary_features, ordinal_features,
     rank_hot = rank_hot_encode(
         mixed_features, enc, columns=ordinal_features.columns.tolist())
     assert(rank_hot.equals(expected_rank_hot_encode_columns))
+
+
+def test_convert_categoricals_to_sparse(expected_features):
+    features = pd.DataFrame(data=[
+        ['Sheldon Cooper', 'male', 'yes'],
+        ['Amy Fowler', 'female', 'yes'],
+        ['Mandark', 'male', 'no']
+    ],
+        columns=['full_name', 'gender', 'worked_in_USA'])
+    sparse_features = convert_categoricals_to_sparse(features)
+    expected = expected_features[['gender', 'worked_in_USA']]
+    assert(sparse_features.matrix.dtype == 'int8')
+    assert(sparse_features.matrix.nnz == 4)
+    assert(np.array_equal(sparse_features.matrix.toarray(), expected.values))
+    assert(sparse_features.index.tolist() == expected.index.tolist())
+    assert(sparse_features.columns.tolist() == expected.columns.tolist())
+
+
+def test_convert_categoricals_to_sparse_numerical(expected_features):
+    features = expected_features.reset_index()
+    features[['gender', 'worked_in_USA']] = features[
+        ['gender', 'worked_in_USA']].replace({1: 'yes', 0: 'no'})
+    sparse_features = convert_categoricals_to_sparse(features)
+    assert(sparse_features.matrix.dtype == 'float64')
+    assert(np.array_equal(sparse_features.matrix.toarray(),
+                          expected_features.values))
+
+
+def test_binarize_list_feature():
+    series = pd.Series([['Harvard University', 'MIT'], [], 'MIT|Yale'],
+                       index=['Sheldon Cooper', 'Amy Fowler', 'Mandark'])
+    sparse_features = binarize_list_feature(series, 'alumnus_of_')
+    assert(sparse_features.columns.tolist() == [
+        'alumnus_of_Harvard_University', 'alumnus_of_MIT', 'alumnus_of_Yale'])
+    assert(np.array_equal(sparse_features.matrix.toarray(),
+                          [[1, 1, 0], [0, 0, 0], [0, 1, 1]]))
+    assert(sparse_features.index.tolist() == series.index.tolist())
+
+
+def test_hstack_sparse_features_different_index():
+    left = binarize_list_feature(pd.Series([['a']], index=['x']), 'l_')
+    right = binarize_list_feature(pd.Series([['b']], index=['y']), 'r_')
+    with pytest.raises(ValueError):
+        hstack_sparse_features([left, right])
+
+
+def test_save_load_sparse_features(tmp_path):
+    series = pd.Series([['a', 'b'], ['b']], index=['Sheldon Cooper', 'Amy Fowler'])
+    left = binarize_list_feature(series, 'l_')
+    right = binarize_list_feature(series, 'r_')
+    sparse_features = hstack_sparse_features([left, right])
+    file = str(tmp_path / 'features.npz')
+    save_sparse_features(file, sparse_features)
+    loaded = load_sparse_features(file)
+    assert((loaded.matrix != sparse_features.matrix).nnz == 0)
+    assert(loaded.matrix.dtype == 'int8')
+    assert(loaded.index.tolist() == sparse_features.index.tolist())
+    assert(loaded.columns.tolist() == ['l_a', 'l_b', 'r_a', 'r_b'])
@@ -0,0 +1,108 @@
+import pandas as pd
+import pytest
+
+from src.features.incremental_utils import build_features_incremental
+
+
+@pytest.fixture
+def physicists():
+    physicists = pd.DataFrame(data=[
+        ['Sheldon Cooper', 'Leonard Hofstadter', 'male'],
+        ['Amy Fowler', None, 'female'],
+        ['Mandark', None, 'male']
+    ],
+        columns=['fullName', 'doctoralStudent', 'gender'])
+    return physicists
+
+
+@pytest.fixture
+def laureates():
+    return pd.DataFrame(data=[['Leonard Hofstadter']], columns=['Laureate'])
+
+
+class CountingBuilder:
+    """Feature builder that records the physicists it is called with."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, physicists, laureates):
+        self.calls.append(physicists.fullName.tolist())
+        features = physicists[['fullName', 'gender']].rename(
+            columns={'fullName': 'full_name'})
+        features['num_laureate_students'] = physicists.doctoralStudent.isin(
+            laureates.Laureate).astype('int64')
+        # drop columns where the counts are all zeros
+        if not features.num_laureate_students.any():
+            features = features.drop('num_laureate_students', axis='columns')
+        return features
+
+
+def test_build_features_incremental_reuses_cache(tmp_path, physicists, laureates):
+    cache_path = str(tmp_path / 'features.pkl')
+    builder = CountingBuilder()
+    features = build_features_incremental(
+        physicists, builder, cache_path, args=(laureates,))
+    expected = builder(physicists, laureates)
+    assert(features.equals(expected))
+
+    features = build_features_incremental(
+        physicists, builder, cache_path, args=(laureates,))
+    assert(len(builder.calls) == 2)
+    assert(features.equals(expected))
+
+
+def test_build_features_incremental_changed_and_new_rows(
+        tmp_path, physicists, laureates):
+    cache_path = str(tmp_path / 'features.pkl')
+    builder = CountingBuilder()
+    build_features_incremental(
+        physicists, builder, cache_path, args=(laureates,))
+
+    physicists.loc[1, 'gender'] = 'male'
+    physicists = pd.concat([physicists, pd.DataFrame(
+        data=[['Barry Kripke', None, 'male']], columns=physicists.columns)],
+        ignore_index=True)
+    features = build_features_incremental(
+        physicists, builder, cache_path, args=(laureates,))
+    assert(builder.calls[-1] == ['Amy Fowler', 'Barry Kripke'])
+    assert(features.gender.tolist() == ['male', 'male', 'male', 'male'])
+    assert(features.index.tolist() == physicists.index.tolist())
+
+
+def test_build_features_incremental_column_drift(tmp_path, physicists, laureates):
+    cache_path = str(tmp_path / 'features.pkl')
+    builder = CountingBuilder()
+    validation_features = build_features_incremental(
+        physicists[1:], builder, cache_path, args=(laureates,))
+    assert('num_laureate_students' not in validation_features)
+
+    features = build_features_incremental(
+        physicists, builder, cache_path, args=(laureates,))
+    assert(builder.calls[-1] == ['Sheldon Cooper'])
+    assert(features.num_laureate_students.tolist() == [1, 0, 0])
+    assert(features.num_laureate_students.dtype == 'int64')
+
+    validation_features = build_features_incremental(
+        physicists[1:], builder, cache_path, args=(laureates,),
+        columns=['full_name', 'num_laureate_students', 'num_laureate_spouses'])
+    assert(validation_features.num_laureate_students.tolist() == [0, 0])
+    assert(validation_features.num_laureate_spouses.tolist() == [0, 0])
+
+
+def test_build_features_incremental_args_change(tmp_path, physicists, laureates):
+    cache_path = str(tmp_path / 'features.pkl')
+    builder = CountingBuilder()
+    build_features_incremental(
+        physicists, builder, cache_path, args=(laureates,))
+    features = build_features_incremental(
+        physicists, builder, cache_path, args=(laureates[:0],))
+    assert(len(builder.calls[-1]) == 3)
+    assert('num_laureate_students' not in features)
+
+
+def test_build_features_incremental_duplicate_key(tmp_path, physicists, laureates):
+    with pytest.raises(ValueError):
+        build_features_incremental(
+            pd.concat([physicists, physicists]), CountingBuilder(),
+            str(tmp_path / 'features.pkl'), args=(laureates,))
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as ss
+
+from src.features.features_utils import SparseFeatures
+from src.features.schema_utils import FeatureSchema
+
+
+@pytest.fixture
+def train_features():
+    return pd.DataFrame({'a': [1, 0], 'b': [0, 1], 'c': [1, 1]},
+                        index=['x', 'y'], dtype='int8')
+
+
+@pytest.fixture
+def test_features():
+    return pd.DataFrame({'d': [1, 1, 0], 'c': [0, 1, 1], 'a': [1, 0, 1]},
+                        index=['p', 'q', 'r'])
+
+
+@pytest.fixture
+def expected_features():
+    return pd.DataFrame({'a': [1, 0, 1], 'b': [0, 0, 0], 'c': [0, 1, 1]},
+                        index=['p', 'q', 'r'], dtype='int8')
+
+
+def test_align_frame(train_features, test_features, expected_features):
+    schema = FeatureSchema.from_features(train_features)
+    assert(schema.columns == ['a', 'b', 'c'])
+    assert(schema.dtypes == {'a': 'int8', 'b': 'int8', 'c': 'int8'})
+    pd.testing.assert_frame_equal(schema.align(test_features), expected_features)
+
+
+def test_align_matrix(train_features, test_features, expected_features):
+    schema = FeatureSchema.from_features(train_features)
+    matrix = ss.csr_matrix(test_features.values)
+    aligned = schema.align_matrix(matrix, test_features.columns)
+    assert(aligned.shape == (3, 3))
+    assert(aligned.has_sorted_indices)
+    assert(np.array_equal(aligned.toarray(), expected_features.values))
+
+
+def test_align_sparse_features(train_features, test_features, expected_features):
+    schema = FeatureSchema(['c', 'b', 'a', 'e'])
+    sparse_features = SparseFeatures(
+        ss.csr_matrix(test_features.values), test_features.index.values,
+        test_features.columns.values)
+    aligned = schema.align(sparse_features)
+    assert(aligned.columns.tolist() == ['c', 'b', 'a', 'e'])
+    assert(np.array_equal(aligned.index, ['p', 'q', 'r']))
+    expected = expected_features[['c', 'b', 'a']].values
+    assert(np.array_equal(aligned.matrix.toarray()[:, :3], expected))
+    assert(aligned.matrix[:, 3].nnz == 0)
+
+
+def test_align_matrix_empty_rows():
+    schema = FeatureSchema(['a', 'b'])
+    matrix = ss.csr_matrix(np.array([[0, 0, 1], [1, 0, 0], [0, 0, 0], [0, 1, 1]]))
+    aligned = schema.align_matrix(matrix, ['c', 'a', 'b'])
+    assert(np.array_equal(aligned.toarray(), [[0, 1], [0, 0], [0, 0], [1, 1]]))
+    with pytest.raises(ValueError):
+        schema.align_matrix(matrix, ['a', 'b'])
+
+
+def test_feature_schema_save_load(train_features, tmpdir):
+    path = str(tmpdir.join('schema.json'))
+    schema = FeatureSchema.from_features(train_features)
+    schema.save(path)
+    loaded = FeatureSchema.load(path)
+    assert(loaded.columns == schema.columns)
+    assert(loaded.dtypes == schema.dtypes)
+    with pytest.raises(ValueError):
+        FeatureSchema(['a', 'a'])
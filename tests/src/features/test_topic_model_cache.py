@@ -0,0 +1,80 @@
+import pickle
+
+import numpy as np
+import pytest
+import scipy.sparse as ss
+
+from src.features.topic_model_cache import TopicModelCache, hash_topic_model_data
+
+
+@pytest.fixture
+def X():
+    return ss.csr_matrix(np.array([[0, 1, 1], [1, 0, 0]]))
+
+
+def test_hash_topic_model_data(X):
+    assert(hash_topic_model_data(X) == hash_topic_model_data(X.copy()))
+    assert(hash_topic_model_data(X) != hash_topic_model_data(X.T.tocsr()))
+    assert(hash_topic_model_data(X) !=
+           hash_topic_model_data(X, words=['a', 'b', 'c']))
+
+
+def test_topic_model_cache_put_get(X, tmpdir):
+    cache = TopicModelCache(str(tmpdir))
+    data_hash = hash_topic_model_data(X)
+    key = cache.key(data_hash, 2, 1, 200, 1e-05)
+    assert(cache.get(key) is None)
+    assert(cache.load_model(key) is None)
+
+    cache.put(key, data_hash, 2, 1, 200, 1e-05, 1.5, False,
+              model_bytes=pickle.dumps({'n_hidden': 2}))
+    cache = TopicModelCache(str(tmpdir))
+    entry = cache.get(key)
+    assert(entry['tc'] == 1.5)
+    assert(not entry['has_empty_topics'])
+    assert(cache.load_model(key) == {'n_hidden': 2})
+
+
+def test_topic_model_cache_evicts_models(X, tmpdir):
+    model_bytes = pickle.dumps(list(range(100)))
+    cache = TopicModelCache(str(tmpdir), max_model_bytes=2 * len(model_bytes))
+    data_hash = hash_topic_model_data(X)
+    keys = [cache.key(data_hash, n_hidden, 1, 200, 1e-05)
+            for n_hidden in range(1, 4)]
+    for n_hidden, key in enumerate(keys, 1):
+        cache.put(key, data_hash, n_hidden, 1, 200, 1e-05, float(n_hidden),
+                  False, model_bytes=model_bytes)
+
+    # the least recently used model is evicted but its score is kept
+    assert(cache.load_model(keys[0]) is None)
+    assert(cache.get(keys[0])['tc'] == 1.0)
+    assert(cache.load_model(keys[1]) == list(range(100)))
+    assert(cache.load_model(keys[2]) == list(range(100)))
+    assert(len(tmpdir.listdir(lambda path: path.ext == '.pkl')) == 2)
+
+
+def test_topic_model_cache_appends_index(X, tmpdir):
+    model_bytes = pickle.dumps(list(range(100)))
+    cache = TopicModelCache(str(tmpdir), max_model_bytes=2 * len(model_bytes))
+    data_hash = hash_topic_model_data(X)
+    keys = [cache.key(data_hash, n_hidden, 1, 200, 1e-05)
+            for n_hidden in range(1, 4)]
+    for n_hidden, key in enumerate(keys[:2], 1):
+        cache.put(key, data_hash, n_hidden, 1, 200, 1e-05, float(n_hidden),
+                  False, model_bytes=model_bytes)
+    cache.load_model(keys[0])
+    index_path = tmpdir.join('index.csv')
+    # a header and a row per put and load
+    assert(len(index_path.readlines()) == 4)
+
+    last_used = cache.get(keys[0])['last_used']
+    assert(TopicModelCache(str(tmpdir)).get(keys[0])['last_used'] == last_used)
+
+    # the eviction rewrites the index with a row per key
+    cache.put(keys[2], data_hash, 3, 1, 200, 1e-05, 3.0, False,
+              model_bytes=model_bytes)
+    assert(len(index_path.readlines()) == 4)
+    cache = TopicModelCache(str(tmpdir))
+    assert(cache.load_model(keys[1]) is None)
+    assert(cache.get(keys[1])['tc'] == 2.0)
+    assert(cache.load_model(keys[0]) == list(range(100)))
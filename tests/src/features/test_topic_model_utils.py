@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as ss
+
+ct = pytest.importorskip('corextopic.corextopic')
+
+from src.features.topic_model_cache import TopicModelCache  # noqa: E402
+from src.features.features_utils import SparseFeatures  # noqa: E402
+from src.features.topic_model_utils import (find_best_topic_model,  # noqa: E402
+                                            has_empty_topics,
+                                            iter_topic_model_scores,
+                                            iter_topic_space_batches,
+                                            project_features_to_topic_space)
+
+
+@pytest.fixture(scope='module')
+def binary_features():
+    random_state = np.random.RandomState(0)
+    features = pd.DataFrame(
+        random_state.randint(0, 2, size=(60, 12)),
+        columns=['feature_' + str(i) for i in range(12)])
+    return features
+
+
+def test_iter_topic_model_scores_in_grid_order(binary_features):
+    X = ss.csr_matrix(binary_features.values)
+    scores = list(iter_topic_model_scores(
+        X, num_topic_models=2, num_topics_range=range(1, 4), max_iter=20,
+        max_workers=2))
+    assert([(score.n_hidden, score.seed) for score in scores] ==
+           [(1, 1), (1, 2), (2, 1), (2, 2), (3, 1), (3, 2)])
+
+    topic_model = ct.Corex(n_hidden=2, max_iter=20, seed=2).fit(X)
+    assert(scores[3].tc == pytest.approx(topic_model.tc))
+    assert(scores[3].has_empty_topics == has_empty_topics(topic_model))
+
+
+def test_iter_topic_model_scores_patience(binary_features):
+    X = ss.csr_matrix(binary_features.values)
+    scores = list(iter_topic_model_scores(
+        X, num_topic_models=1, num_topics_range=range(1, 10), max_iter=20,
+        max_workers=2, patience=1))
+    n_hiddens = [score.n_hidden for score in scores]
+    assert(n_hiddens == list(range(1, len(n_hiddens) + 1)))
+    valid_tcs = [score.tc if not score.has_empty_topics else -np.inf
+                 for score in scores]
+    if len(scores) < 9:
+        assert(valid_tcs[-1] <= max(valid_tcs[:-1]))
+
+
+def test_find_best_topic_model(binary_features):
+    X = ss.csr_matrix(binary_features.values)
+    scores = list(iter_topic_model_scores(
+        X, num_topic_models=2, num_topics_range=range(1, 4), max_iter=20,
+        max_workers=2))
+    best = max((score for score in scores if not score.has_empty_topics),
+               key=lambda score: score.tc)
+    topic_model = find_best_topic_model(
+        binary_features, num_topic_models=2, num_topics_range=range(1, 4),
+        max_iter=20, max_workers=2)
+    assert(topic_model.n_hidden == best.n_hidden)
+    assert(topic_model.tc == pytest.approx(best.tc))
+
+
+def test_iter_topic_model_scores_cache(binary_features, tmpdir):
+    X = ss.csr_matrix(binary_features.values)
+    cache = TopicModelCache(str(tmpdir))
+    first_scores = list(iter_topic_model_scores(
+        X, num_topic_models=2, num_topics_range=range(1, 3), max_iter=20,
+        max_workers=2, cache=cache))
+    first_entries = {key: dict(entry) for key, entry in cache._index.items()}
+    assert(len(first_entries) == 4)
+
+    # a new cache object reads the checkpoint written by the first sweep
+    cache = TopicModelCache(str(tmpdir))
+    scores = list(iter_topic_model_scores(
+        X, num_topic_models=2, num_topics_range=range(1, 4), max_iter=20,
+        max_workers=2, cache=cache))
+    assert(scores[:4] == first_scores)
+    assert(len(cache._index) == 6)
+    for key, entry in first_entries.items():
+        assert(cache.get(key)['last_used'] == entry['last_used'])
+
+
+def test_find_best_topic_model_cache(binary_features, tmpdir):
+    topic_model = find_best_topic_model(
+        binary_features, num_topic_models=2, num_topics_range=range(1, 4),
+        max_iter=20, max_workers=2)
+    cached_topic_model = find_best_topic_model(
+        binary_features, num_topic_models=2, num_topics_range=range(1, 4),
+        max_iter=20, max_workers=2, cache=str(tmpdir))
+    assert(cached_topic_model.n_hidden == topic_model.n_hidden)
+    assert(cached_topic_model.tc == pytest.approx(topic_model.tc))
+    assert(list(cached_topic_model.words) == list(binary_features.columns))
+
+
+@pytest.fixture(scope='module')
+def topic_model(binary_features):
+    return ct.Corex(n_hidden=3, max_iter=20, seed=1).fit(
+        ss.csr_matrix(binary_features.values))
+
+
+def test_project_features_to_topic_space(binary_features, topic_model):
+    expected = topic_model.transform(ss.csr_matrix(binary_features.values))
+    columns = ['topic_a', 'topic_b', 'topic_c']
+    features_topics = project_features_to_topic_space(
+        binary_features, topic_model, columns=columns)
+    assert((features_topics.dtypes == 'int8').all())
+    assert(features_topics.columns.tolist() == columns)
+    assert(features_topics.index.equals(binary_features.index))
+    assert(np.array_equal(features_topics.values, expected))
+
+    features_topics = project_features_to_topic_space(
+        binary_features, topic_model, dtype='bool', batch_size=7)
+    assert((features_topics.dtypes == 'bool').all())
+    assert(np.array_equal(features_topics.values, expected))
+
+
+def test_project_features_to_topic_space_as_strings(binary_features, topic_model):
+    expected = topic_model.transform(ss.csr_matrix(binary_features.values))
+    sparse_features = SparseFeatures(
+        ss.csr_matrix(binary_features.values), binary_features.index.values,
+        binary_features.columns.values)
+    features_topics = project_features_to_topic_space(
+        sparse_features, topic_model, as_strings=True)
+    assert(np.array_equal(features_topics.values,
+                          np.where(expected, 'yes', 'no')))
+
+
+def test_iter_topic_space_batches(binary_features, topic_model):
+    X = ss.csr_matrix(binary_features.values)
+    batches = list(iter_topic_space_batches(X, topic_model, batch_size=25))
+    assert([len(batch) for batch in batches] == [25, 25, 10])
+    assert(np.array_equal(np.vstack(batches), topic_model.transform(X)))
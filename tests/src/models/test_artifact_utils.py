@@ -0,0 +1,90 @@
+import os
+import subprocess
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from src.models.artifact_utils import (convert_model_to_artifact,
+                                       read_model_artifact,
+                                       write_model_artifact)
+from src.models.scoring_utils import BatchScorer
+
+
+@pytest.fixture(scope='module')
+def data():
+    random_state = np.random.RandomState(0)
+    X = pd.DataFrame(random_state.randint(0, 2, size=(100, 5)).astype('float64'),
+                     columns=['feature_' + str(i) for i in range(5)])
+    y = (X.feature_0 + random_state.normal(scale=0.5, size=100) > 0.5).astype('int64')
+    return X, y
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_write_read_model_artifact(tmpdir, mmap):
+    path = str(tmpdir.join('LR.model'))
+    write_model_artifact(path, np.array([[0.5, -1.0, 2.0]]), np.array([0.25]),
+                         ['a', 'b', 'é'], threshold=0.4, metadata=dict(name='LR'))
+    artifact = read_model_artifact(path, mmap=mmap)
+    assert(np.array_equal(artifact.coef, [0.5, -1.0, 2.0]))
+    assert(not artifact.coef.flags.writeable)
+    assert(artifact.intercept == 0.25)
+    assert(artifact.threshold == 0.4)
+    assert(artifact.columns == ['a', 'b', 'é'])
+    assert(artifact.metadata == dict(name='LR'))
+
+
+def test_write_model_artifact_aligns_coefficients(tmpdir):
+    path = str(tmpdir.join('LR.model'))
+    write_model_artifact(path, np.ones(3), 0.0, ['a', 'b', 'c'], dtype='float32')
+    artifact = read_model_artifact(path)
+    assert(artifact.coef.dtype == np.float32)
+    assert(artifact.coef.offset % 64 == 0)
+    assert(os.path.getsize(path) == artifact.coef.offset + 3 * 4)
+
+
+def test_model_artifact_errors(tmpdir):
+    with pytest.raises(ValueError):
+        write_model_artifact(str(tmpdir.join('LR.model')), np.ones(3), 0.0, ['a'])
+    path = tmpdir.join('not-a-model')
+    path.write_binary(b'0' * 64)
+    with pytest.raises(ValueError):
+        read_model_artifact(str(path))
+
+
+def test_convert_model_to_artifact(tmpdir, data):
+    X, y = data
+    classifier = LogisticRegression(solver='liblinear').fit(X.values, y)
+    model_path = str(tmpdir.join('LR.joblib'))
+    params_path = str(tmpdir.join('LR.csv'))
+    artifact_path = str(tmpdir.join('LR.model'))
+    joblib.dump(classifier, model_path)
+    params = pd.Series(type(classifier), name='LR', index=['estimator'])
+    params['params'] = classifier.get_params()
+    params['threshold'] = 0.45
+    params.to_csv(params_path, header=True)
+
+    with pytest.raises(ValueError):
+        convert_model_to_artifact(model_path, params_path, artifact_path)
+    artifact = convert_model_to_artifact(model_path, params_path, artifact_path,
+                                         columns=X.columns)
+    assert(artifact.threshold == 0.45)
+    assert(artifact.metadata['name'] == 'LR')
+
+    scorer = BatchScorer.from_artifact(artifact_path)
+    expected = classifier.predict_proba(X.values)[:, 1]
+    np.testing.assert_allclose(scorer.predict_proba(X[X.columns[::-1]]), expected)
+    assert(np.array_equal(scorer.predict(X), (expected > 0.45).astype('int64')))
+
+
+def test_from_artifact_does_not_import_heavy_modules(tmpdir):
+    path = str(tmpdir.join('LR.model'))
+    write_model_artifact(path, np.ones(2), 0.0, ['a', 'b'])
+    code = ('import sys; from src.models.scoring_utils import BatchScorer; '
+            'scorer = BatchScorer.from_artifact({!r}); scorer.predict([[1, 0]]); '
+            "assert not {{'sklearn', 'pandas', 'scipy'}} & set(sys.modules)").format(path)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    subprocess.check_call([sys.executable, '-c', code], env=env)
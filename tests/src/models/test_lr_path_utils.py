@@ -0,0 +1,89 @@
+import warnings
+
+import numpy as np
+import pytest
+import scipy.sparse as ss
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import matthews_corrcoef
+
+from src.models.lr_path_utils import (decision_function_path,
+                                      logistic_regression_path, score_path)
+
+
+@pytest.fixture(scope='module')
+def data():
+    random_state = np.random.RandomState(0)
+    X = random_state.randint(0, 2, size=(150, 10)).astype('float64')
+    y = (X[:, 0] + X[:, 1] - X[:, 2] +
+         random_state.normal(scale=0.5, size=150) > 0.5).astype('int64')
+    sample_weight = random_state.uniform(0.5, 1.5, size=150)
+    return X, y, sample_weight
+
+
+@pytest.fixture
+def Cs():
+    return np.array([4.0, 0.01, 1.0, 0.1])
+
+
+@pytest.mark.parametrize('class_weight', [None, 'balanced', {0: 0.3, 1: 0.7}])
+def test_logistic_regression_path_l2(data, Cs, class_weight):
+    X, y, sample_weight = data
+    coefs, intercepts = logistic_regression_path(
+        ss.csr_matrix(X), y, Cs, class_weight=class_weight,
+        sample_weight=sample_weight, tol=1e-8)
+    assert(coefs.shape == (len(Cs), X.shape[1]))
+    for C, coef, intercept in zip(Cs, coefs, intercepts):
+        classifier = LogisticRegression(C=C, class_weight=class_weight, tol=1e-8,
+                                        max_iter=1000)
+        classifier.fit(X, y, sample_weight=sample_weight)
+        np.testing.assert_allclose(coef, classifier.coef_.ravel(), atol=1e-3)
+        assert(intercept == pytest.approx(classifier.intercept_[0], abs=1e-3))
+
+
+def test_logistic_regression_path_l2_weak_regularization(data):
+    X, y, sample_weight = data
+    Cs = np.logspace(-5, 15, 21, base=2.0)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', ConvergenceWarning)
+        coefs, intercepts = logistic_regression_path(X, y, Cs,
+                                                     sample_weight=sample_weight)
+    # the default tolerance is the one of LogisticRegression for every C
+    for C, coef in zip(Cs[-6:], coefs[-6:]):
+        classifier = LogisticRegression(C=C, max_iter=1000)
+        classifier.fit(X, y, sample_weight=sample_weight)
+        np.testing.assert_allclose(coef, classifier.coef_.ravel(), atol=5e-2)
+
+
+def test_logistic_regression_path_l1(data, Cs):
+    X, y, _ = data
+    coefs, intercepts = logistic_regression_path(
+        X, y, Cs, penalty='l1', tol=1e-6, max_iter=5000, random_state=0)
+    for C, coef, intercept in zip(Cs, coefs, intercepts):
+        classifier = LogisticRegression(C=C, penalty='l1', solver='saga', tol=1e-6,
+                                        max_iter=5000, random_state=0)
+        classifier.fit(X, y)
+        np.testing.assert_allclose(coef, classifier.coef_.ravel(), atol=1e-3)
+        assert(intercept == pytest.approx(classifier.intercept_[0], abs=1e-3))
+    # the strongest regularization zeroes the coefficients
+    assert(np.all(coefs[1] == 0))
+
+
+def test_logistic_regression_path_errors(data, Cs):
+    X, y, _ = data
+    with pytest.raises(ValueError):
+        logistic_regression_path(X, y, Cs, penalty='elasticnet')
+    with pytest.raises(ValueError):
+        logistic_regression_path(X, np.zeros_like(y), Cs)
+
+
+def test_score_path(data, Cs):
+    X, y, _ = data
+    coefs, intercepts = logistic_regression_path(X[:100], y[:100], Cs)
+    decisions = decision_function_path(coefs, intercepts, ss.csr_matrix(X[100:]))
+    assert(decisions.shape == (50, len(Cs)))
+
+    scores = score_path(coefs, intercepts, X[100:], y[100:])
+    for i, (coef, intercept) in enumerate(zip(coefs, intercepts)):
+        y_pred = (X[100:] @ coef + intercept > 0).astype('int64')
+        assert(scores[i] == pytest.approx(matthews_corrcoef(y[100:], y_pred)))
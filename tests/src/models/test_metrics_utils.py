@@ -7,7 +7,8 @@ from sklearn.metrics import auc, confusion_matrix, matthews_corrcoef, roc_curve
 from sklearn.preprocessing import binarize
 
 from src.models.metrics_utils import (confusion_matrix_to_dataframe,
-                                      mcc_auc_score, mcc_curve)
+                                      max_mcc_threshold, mcc_auc_score,
+                                      mcc_curve)
 
 
 @pytest.fixture
@@ -159,3 +160,13 @@ def test_mcc_auc_score_probability(y_true_y_score, expected_mcc_curve_probabilit
 
     mcc_auc = mcc_auc_score(y_true, y_score, probability=True, normalize=True)
     np.testing.assert_allclose(mcc_auc, expected_mcc_auc)
+
+
+def test_max_mcc_threshold():
+    y_true = np.array([0, 0, 1, 1, 1])
+    y_score = np.array([0.1, 0.6, 0.4, 0.8, 0.9])
+    threshold = max_mcc_threshold(y_true, y_score)
+    # scores above the threshold are predicted positive
+    y_pred = (y_score > threshold).astype('int64')
+    assert(threshold in y_score)
+    assert(matthews_corrcoef(y_true, y_pred) == pytest.approx(2.0 / 3.0))
@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import matthews_corrcoef
+from sklearn.model_selection import ParameterGrid
+from sklearn.svm import SVC
+
+import src.models.model_selection_utils as model_selection_utils
+from src.models.model_selection_utils import evaluate_classifier
+
+
+@pytest.fixture(scope='module')
+def data():
+    random_state = np.random.RandomState(0)
+    X = random_state.randint(0, 2, size=(120, 8)).astype('float64')
+    y = (X[:, 0] + X[:, 1] + random_state.normal(scale=0.5, size=120) > 1).astype('int64')
+    return X[:80], y[:80], X[80:], y[80:]
+
+
+@pytest.fixture(scope='module')
+def param_grid():
+    return ParameterGrid(dict(penalty=['l1', 'l2'], C=np.logspace(-3, 3, 5),
+                              class_weight=[None, 'balanced']))
+
+
+def test_evaluate_classifier_matches_cold_fits(data, param_grid):
+    X_train, y_train, X_validation, y_validation = data
+    results = evaluate_classifier(
+        X_train, y_train, X_validation, y_validation, clf=LogisticRegression(),
+        param_grid=param_grid, solver='liblinear', random_state=0, name='LR',
+        max_workers=2)
+
+    assert(list(results['validation_scores'].keys()) ==
+           [str(params) for params in param_grid])
+    for params in param_grid:
+        classifier = LogisticRegression(
+            solver='liblinear', random_state=0, max_iter=1000, **params)
+        classifier.fit(X_train, y_train)
+        assert(results['train_scores'][str(params)] == pytest.approx(
+            matthews_corrcoef(y_train, classifier.predict(X_train))))
+        assert(results['validation_scores'][str(params)] == pytest.approx(
+            matthews_corrcoef(y_validation, classifier.predict(X_validation))))
+
+    best_score = max(results['validation_scores'].values())
+    assert(results['best_score'] == best_score)
+    assert(results['validation_scores'][str(results['best_params'])] == best_score)
+    assert(not results['best_classifier'].warm_start)
+
+
+def test_evaluate_classifier_warm_start(data):
+    X_train, y_train, X_validation, y_validation = data
+    param_grid = ParameterGrid(dict(C=np.logspace(-3, 3, 7)))
+    results = evaluate_classifier(
+        X_train, y_train, X_validation, y_validation, param_grid=param_grid,
+        max_workers=2)
+
+    classifier = LogisticRegression(
+        C=results['best_params']['C'], max_iter=1000).fit(X_train, y_train)
+    np.testing.assert_allclose(results['best_classifier'].coef_, classifier.coef_,
+                               rtol=1e-3, atol=1e-4)
+
+
+def test_evaluate_classifier_other_classifier(data):
+    X_train, y_train, X_validation, y_validation = data
+    param_grid = ParameterGrid(dict(kernel=['linear'], C=[0.1, 1.0]))
+    results = evaluate_classifier(
+        X_train, y_train, X_validation, y_validation, clf=SVC(),
+        param_grid=param_grid, max_iter=-1, random_state=0, max_workers=2)
+    assert(isinstance(results['best_classifier'], SVC))
+    assert(len(results['validation_scores']) == 2)
+
+
+def test_evaluate_classifier_cache(data, param_grid, tmpdir, monkeypatch):
+    X_train, y_train, X_validation, y_validation = data
+    kwargs = dict(param_grid=param_grid, solver='liblinear', random_state=0,
+                  max_workers=2, cache_dir=str(tmpdir))
+    results = evaluate_classifier(X_train, y_train, X_validation, y_validation,
+                                  **kwargs)
+    assert(len(tmpdir.listdir()) == len(param_grid))
+
+    sample_weight = np.linspace(0.5, 1.5, len(y_train))
+    evaluate_classifier(X_train, y_train, X_validation, y_validation,
+                        sample_weight=sample_weight, **kwargs)
+    assert(len(tmpdir.listdir()) == 2 * len(param_grid))
+
+    # all the parameter sets are cached so no process pool is needed
+    def raise_error(*args, **kwargs):
+        raise AssertionError('The classifiers should not be refitted.')
+    monkeypatch.setattr(model_selection_utils, 'ProcessPoolExecutor', raise_error)
+    cached_results = evaluate_classifier(X_train, y_train, X_validation,
+                                         y_validation, **kwargs)
+    assert(cached_results['validation_scores'] == results['validation_scores'])
+    assert(cached_results['train_scores'] == results['train_scores'])
+    assert(cached_results['best_params'] == results['best_params'])
+
+
+def test_evaluate_classifier_cache_seeds(data, param_grid, tmpdir, monkeypatch):
+    X_train, y_train, X_validation, y_validation = data
+    kwargs = dict(param_grid=param_grid, max_workers=2, cache_dir=str(tmpdir))
+    evaluate_classifier(X_train, y_train, X_validation, y_validation,
+                        solver='liblinear', random_state=0, **kwargs)
+    evaluate_classifier(X_train, y_train, X_validation, y_validation,
+                        solver='liblinear', random_state=1, **kwargs)
+    # liblinear shuffles the data so each seed has its own fits
+    assert(len(tmpdir.listdir()) == 2 * len(param_grid))
+
+    kwargs['param_grid'] = ParameterGrid(dict(C=[0.1, 1.0, 10.0]))
+    results = evaluate_classifier(X_train, y_train, X_validation, y_validation,
+                                  solver='lbfgs', random_state=0, **kwargs)
+    assert(len(tmpdir.listdir()) == 2 * len(param_grid) + 3)
+
+    # lbfgs does not use the seed so its fits are shared
+    def raise_error(*args, **kwargs):
+        raise AssertionError('The classifiers should not be refitted.')
+    monkeypatch.setattr(model_selection_utils, 'ProcessPoolExecutor', raise_error)
+    cached_results = evaluate_classifier(X_train, y_train, X_validation, y_validation,
+                                         solver='lbfgs', random_state=1, **kwargs)
+    assert(cached_results['validation_scores'] == results['validation_scores'])
+    assert(cached_results['best_classifier'].random_state == 1)
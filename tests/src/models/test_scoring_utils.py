@@ -0,0 +1,107 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.sparse as ss
+from sklearn.linear_model import LogisticRegression
+
+from src.models.scoring_utils import (BatchScorer, Score,
+                                      benchmark_batch_scorer)
+
+
+@pytest.fixture(scope='module')
+def data():
+    random_state = np.random.RandomState(0)
+    X = random_state.randint(0, 2, size=(200, 6)).astype('float64')
+    y = (X[:, 0] + X[:, 1] + random_state.normal(scale=0.5, size=200) > 1).astype('int64')
+    return pd.DataFrame(X, columns=['feature_' + str(i) for i in range(6)]), y
+
+
+@pytest.fixture(scope='module')
+def classifier(data):
+    X, y = data
+    return LogisticRegression(solver='liblinear').fit(X, y)
+
+
+@pytest.mark.parametrize('dtype', ['float32', 'float64'])
+def test_batch_scorer_matches_estimator(data, classifier, dtype):
+    X, _ = data
+    scorer = BatchScorer.from_estimator(classifier, threshold=0.4,
+                                        columns=X.columns, dtype=dtype)
+    assert(scorer.coef.flags.c_contiguous)
+    assert(not scorer.coef.flags.writeable)
+    assert(scorer.coef.dtype == dtype)
+
+    expected = classifier.predict_proba(X)[:, 1]
+    rtol = 1e-5 if dtype == 'float32' else 1e-10
+    np.testing.assert_allclose(scorer.predict_proba(X), expected, rtol=rtol)
+    np.testing.assert_allclose(scorer.predict_proba(ss.csr_matrix(X.values)),
+                               expected, rtol=rtol)
+    np.testing.assert_allclose(scorer.predict_proba(X.iloc[0]), expected[:1],
+                               rtol=rtol)
+    assert(np.array_equal(scorer.predict(X), (expected > 0.4).astype('int64')))
+
+
+def test_batch_scorer_reorders_columns(data, classifier):
+    X, _ = data
+    scorer = BatchScorer.from_estimator(classifier, columns=X.columns)
+    reordered = X[X.columns[::-1]]
+    np.testing.assert_allclose(scorer.predict_proba(reordered),
+                               scorer.predict_proba(X))
+    with pytest.raises(ValueError):
+        scorer.predict_proba(X.drop(columns='feature_0'))
+    with pytest.raises(ValueError):
+        scorer.predict_proba(np.ones((2, 5)))
+
+
+def test_batch_scorer_queue(data, classifier):
+    X, _ = data
+    expected = classifier.predict_proba(X)[:, 1]
+    scores = [None] * len(X)
+
+    with BatchScorer.from_estimator(classifier, threshold=0.5, max_batch_size=16,
+                                    max_delay=0.01) as scorer:
+        def submit_rows(indices):
+            for index in indices:
+                row = X.values[index]
+                if index % 2:
+                    row = ss.csr_matrix(row)
+                scores[index] = scorer.submit(row).result()
+
+        threads = [threading.Thread(target=submit_rows, args=(range(i, len(X), 4),))
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert(all(isinstance(score, Score) for score in scores))
+    np.testing.assert_allclose([score.probability for score in scores], expected)
+    assert([score.label for score in scores] == list((expected > 0.5).astype(int)))
+
+
+def test_batch_scorer_queue_error(classifier):
+    with BatchScorer.from_estimator(classifier) as scorer:
+        future = scorer.submit(np.ones(5))
+        with pytest.raises(ValueError):
+            future.result()
+
+
+def test_batch_scorer_close_scores_pending_rows(data, classifier):
+    X, _ = data
+    scorer = BatchScorer.from_estimator(classifier, max_delay=1.0)
+    futures = [scorer.submit(X.values[i]) for i in range(10)]
+    scorer.close()
+    assert(all(future.done() for future in futures))
+
+
+def test_benchmark_batch_scorer(data, classifier):
+    X, _ = data
+    scorer = BatchScorer.from_estimator(classifier)
+    results = benchmark_batch_scorer(scorer, X.values, batch_sizes=(1, 64),
+                                     num_repeats=5, num_requests=40, num_threads=2)
+    scorer.close()
+    assert(results['mode'].tolist() == ['batch', 'batch', 'queue'])
+    assert((results['rows_per_second'] > 0).all())
+    assert((results['latency_p99_ms'] >= results['latency_p50_ms']).all())
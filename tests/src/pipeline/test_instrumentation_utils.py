@@ -0,0 +1,111 @@
+import json
+import threading
+
+import numpy as np
+import pytest
+
+from src.pipeline.instrumentation_utils import (compare_traces, instrument, read_trace,
+                                                span, tracing)
+
+
+@instrument(count='X')
+def _sum_rows(X):
+    return X.sum(axis=1)
+
+
+@instrument()
+def _squares(values):
+    return [value ** 2 for value in values]
+
+
+@instrument(name='failing_stage')
+def _fail():
+    raise RuntimeError('failed')
+
+
+def _write_trace(path, spans):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(dict(spans=spans), file)
+
+
+def test_instrument_without_tracer():
+    assert(_squares([1, 2, 3]) == [1, 4, 9])
+    assert(_squares.__name__ == '_squares')
+
+
+def test_tracing(tmp_path):
+    trace_path = str(tmp_path / 'trace.json')
+    with tracing(trace_path) as tracer:
+        with span('build_features') as record:
+            _sum_rows(np.ones((5, 3)))
+            _squares(range(4))
+            record['items'] = 7
+        with pytest.raises(RuntimeError):
+            _fail()
+    _squares([1])  # not traced
+
+    spans = {record['name']: record for record in tracer.spans}
+    assert(sorted(spans) == ['_squares', '_sum_rows', 'build_features', 'failing_stage'])
+    assert(spans['_sum_rows']['items'] == 5)
+    assert(spans['_squares']['items'] == 4)
+    assert(spans['build_features']['items'] == 7)
+    assert(spans['_sum_rows']['parent'] == 'build_features')
+    assert(spans['build_features']['parent'] is None)
+    assert(spans['failing_stage']['error'] == "RuntimeError('failed')")
+    for record in spans.values():
+        assert(record['wall_time'] >= 0)
+        assert(record['cpu_time'] >= 0)
+        assert(record['peak_rss_mb'] > 0)
+        assert('allocated_mb' not in record)
+    assert(spans['build_features']['wall_time'] >=
+           spans['_sum_rows']['wall_time'] + spans['_squares']['wall_time'])
+
+    trace = read_trace(trace_path)
+    assert(len(trace) == 4)
+    assert(set(trace.name) == set(spans))
+
+
+def test_tracing_allocations():
+    with tracing(trace_allocations=True) as tracer:
+        with span('allocate'):
+            data = bytearray(4 * 2 ** 20)
+    assert(len(data) == 4 * 2 ** 20)
+    assert(tracer.spans[0]['allocated_mb'] >= 4)
+
+
+def test_tracing_threads():
+    with tracing() as tracer:
+        with span('outer'):
+            threads = [threading.Thread(target=_squares, args=(range(i),))
+                       for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+    spans = [record for record in tracer.spans if record['name'] == '_squares']
+    assert(sorted(record['items'] for record in spans) == [0, 1, 2, 3])
+    # spans of other threads are not nested in the spans of the main thread
+    assert(all(record['parent'] is None for record in spans))
+
+
+def test_compare_traces(tmp_path):
+    baseline_path = str(tmp_path / 'baseline.json')
+    current_path = str(tmp_path / 'current.json')
+    _write_trace(baseline_path, [dict(name='fetch', wall_time=1.0),
+                                 dict(name='fetch', wall_time=1.0),
+                                 dict(name='fit', wall_time=4.0),
+                                 dict(name='removed', wall_time=1.0)])
+    _write_trace(current_path, [dict(name='fetch', wall_time=3.0),
+                                dict(name='fit', wall_time=4.4),
+                                dict(name='added', wall_time=1.0)])
+
+    comparison = compare_traces(baseline_path, current_path, tolerance=0.2)
+    assert(comparison.index[0] == 'fetch')
+    assert(comparison.loc['fetch', 'baseline'] == 2.0)
+    assert(comparison.loc['fetch', 'ratio'] == 1.5)
+    assert(comparison.loc['fetch', 'regression'])
+    assert(not comparison.loc['fit', 'regression'])
+    assert(np.isnan(comparison.loc['added', 'baseline']))
+    assert(np.isnan(comparison.loc['removed', 'current']))
+    assert(not comparison.loc['added', 'regression'])
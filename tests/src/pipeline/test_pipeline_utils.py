@@ -0,0 +1,128 @@
+import json
+import os
+import threading
+
+import pytest
+
+from src.pipeline.pipeline_utils import (NOTEBOOK_STAGES, Stage, notebook_stages,
+                                         run_pipeline)
+
+
+class Pipeline:
+    """A diamond pipeline raw -> (left, right) -> merged of text files."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.calls = []
+        self.barrier = None
+        self.fail = set()
+
+    def path(self, name):
+        return os.path.join(self.directory, name + '.txt')
+
+    def stage(self, name, inputs, func):
+        def run():
+            self.calls.append(name)
+            if name in self.fail:
+                raise RuntimeError(name)
+            if self.barrier and name in ['left', 'right']:
+                self.barrier.wait()
+            contents = [open(self.path(input_)).read() for input_ in inputs]
+            with open(self.path(name), 'w') as file:
+                file.write(func(contents))
+        return Stage(name, run, [self.path(input_) for input_ in inputs],
+                     [self.path(name)], [])
+
+    def stages(self):
+        return [self.stage('merged', ['left', 'right'], lambda c: c[0] + c[1]),
+                self.stage('left', ['raw'], lambda c: c[0].upper()),
+                self.stage('right', ['raw'], lambda c: str(len(c[0])))]
+
+
+@pytest.fixture
+def pipeline(tmpdir):
+    pipeline = Pipeline(str(tmpdir))
+    with open(pipeline.path('raw'), 'w') as file:
+        file.write('abc')
+    return pipeline
+
+
+def test_run_pipeline(pipeline):
+    state_path = pipeline.path('state')
+    pipeline.barrier = threading.Barrier(2, timeout=10)  # left and right run together
+    statuses = run_pipeline(pipeline.stages(), state_path, max_workers=2)
+    assert(list(statuses.items()) ==
+           [('merged', 'ran'), ('left', 'ran'), ('right', 'ran')])
+    assert(pipeline.calls[-1] == 'merged')
+    assert(open(pipeline.path('merged')).read() == 'ABC3')
+
+    pipeline.barrier = None
+    pipeline.calls = []
+    statuses = run_pipeline(pipeline.stages(), state_path)
+    assert(set(statuses.values()) == {'skipped'})
+    assert(pipeline.calls == [])
+
+    statuses = run_pipeline(pipeline.stages(), state_path, force=True)
+    assert(set(statuses.values()) == {'ran'})
+
+
+def test_run_pipeline_reruns_changed_stages(pipeline):
+    state_path = pipeline.path('state')
+    run_pipeline(pipeline.stages(), state_path)
+
+    with open(pipeline.path('raw'), 'w') as file:
+        file.write('xyz')
+    pipeline.calls = []
+    statuses = run_pipeline(pipeline.stages(), state_path)
+    assert(dict(statuses) == dict(left='ran', right='ran', merged='ran'))
+
+    # the outputs of left and right are unchanged so merged is not rerun
+    with open(pipeline.path('raw'), 'w') as file:
+        file.write('XYZ')
+    pipeline.calls = []
+    statuses = run_pipeline(pipeline.stages(), state_path)
+    assert(dict(statuses) == dict(left='ran', right='ran', merged='skipped'))
+
+    os.remove(pipeline.path('merged'))
+    statuses = run_pipeline(pipeline.stages(), state_path)
+    assert(statuses['merged'] == 'ran')
+
+
+def test_run_pipeline_failure(pipeline):
+    pipeline.fail = {'left'}
+    errors = {}
+    statuses = run_pipeline(pipeline.stages(), pipeline.path('state'), errors=errors)
+    assert(dict(statuses) == dict(left='failed', right='ran', merged='blocked'))
+    assert(list(errors) == ['left'])
+    assert(isinstance(errors['left'], RuntimeError))
+    assert(errors['left'].__traceback__ is not None)
+    with open(pipeline.path('state')) as file:
+        state_errors = json.load(file)['errors']
+    assert(list(state_errors) == ['left'])
+    assert(state_errors['left'].startswith('Traceback'))
+    assert("raise RuntimeError(name)" in state_errors['left'])
+
+    pipeline.fail = set()
+    pipeline.calls = []
+    statuses = run_pipeline(pipeline.stages(), pipeline.path('state'))
+    assert(dict(statuses) == dict(left='ran', right='skipped', merged='ran'))
+    with open(pipeline.path('state')) as file:
+        assert(json.load(file)['errors'] == {})
+
+
+def test_run_pipeline_errors(pipeline):
+    stages = pipeline.stages()
+    with pytest.raises(ValueError):
+        run_pipeline(stages + stages[:1], pipeline.path('state'))
+    cycle = [Stage('a', None, ['b'], ['a'], []), Stage('b', None, ['a'], ['b'], [])]
+    with pytest.raises(ValueError):
+        run_pipeline(cycle, pipeline.path('state'))
+
+
+def test_notebook_stages():
+    project_dir = os.path.join(os.path.dirname(__file__), '..', '..', '..',
+                               'nobel_physics_prizes')
+    stages = notebook_stages(project_dir)
+    assert(len(stages) == len(NOTEBOOK_STAGES))
+    for stage in stages:
+        assert(os.path.exists(stage.sources[0]))